@@ -0,0 +1,30 @@
+import tempfile
+import time
+from pathlib import Path
+from core.constants import DATA_FORMATS
+from core.storage import load_records, save_records
+from benchmarks.models import sample_records
+
+def run(count: int = 5000, notes: int = 5, repeat: int = 3) -> dict:
+    """Save and load the same tickets in every data format and compare time and file size."""
+    records = sample_records(count, notes)
+    results = {"tickets": count, "notes_per_ticket": notes}
+    with tempfile.TemporaryDirectory() as folder:
+        for data_format in DATA_FORMATS:
+            path = Path(folder) / f"tickets.{data_format}"
+            save_ms = load_ms = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                save_records(path, records, data_format)
+                elapsed = (time.perf_counter() - started) * 1000
+                save_ms = elapsed if save_ms is None else min(save_ms, elapsed)
+
+                started = time.perf_counter()
+                loaded = load_records(path)
+                elapsed = (time.perf_counter() - started) * 1000
+                load_ms = elapsed if load_ms is None else min(load_ms, elapsed)
+            if loaded != records:
+                raise ValueError(f"{data_format} didn't load back the records it saved")
+            results[data_format] = {"save_ms": round(save_ms, 1), "load_ms": round(load_ms, 1), # type: ignore[arg-type]
+                                    "bytes": path.stat().st_size}
+    return results
@@ -0,0 +1,106 @@
+import dataclasses
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from enum import Enum
+from core.models import Ticket, Equipment, TicketNote, TicketState
+
+def unslotted(cls):
+    """The same dataclass without slots or codecs, the way the models used to be."""
+    fields = [(f.name, f.type, dataclasses.field(default=f.default, default_factory=f.default_factory))
+              for f in dataclasses.fields(cls)]
+    return dataclasses.make_dataclass(cls.__name__, fields)
+
+PlainTicket = unslotted(Ticket)
+PlainEquipment = unslotted(Equipment)
+PlainTicketNote = unslotted(TicketNote)
+
+def old_encode(ticket) -> dict:
+    """How tickets were turned into records before the codecs: asdict, then fix up every value."""
+    return plain_value(dataclasses.asdict(ticket))
+
+def plain_value(value):
+    # The old storage.plain_value, which asdict output had to go through
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_value(item) for item in value]
+    return value
+
+def old_decode(ticket_dict: dict):
+    """How tickets were loaded before the codecs: dates stayed strings."""
+    fields = dict(ticket_dict)
+    fields["ticket_state"] = TicketState(fields["ticket_state"])
+    fields["equipment_list"] = [PlainEquipment(**eq) for eq in fields["equipment_list"]]
+    fields["notes_list"] = [PlainTicketNote(**note) for note in fields["notes_list"]]
+    return PlainTicket(**fields)
+
+def sample_records(count: int, notes: int) -> list[dict]:
+    """Ticket records shaped like the real data, each with two pieces of equipment and some notes."""
+    start = datetime(2024, 1, 1, 9, 30)
+    records = []
+    for number in range(count):
+        created = start + timedelta(hours=number)
+        ticket = Ticket(ticket_number=number + 1, date_created=created, created_by="tech",
+                        ticket_state=TicketState.IN_PROGRESS, date_started=created,
+                        ticket_type="inhouse", customer_id="customer-id", priority=3,
+                        description=f"Laptop {number} will not boot after an update",
+                        equipment_list=[Equipment("Laptop", "ThinkPad T14", f"SN{number}", "Charger included"),
+                                        Equipment("Dock", "USB-C Dock", f"DK{number}", "")],
+                        notes_list=[TicketNote(technician="tech", date_created=created + timedelta(minutes=note),
+                                               notes="Ran diagnostics and replaced the drive", ticket_time=0.5, mileage=0)
+                                    for note in range(notes)])
+        records.append(ticket.to_dict())
+    return records
+
+def time_it(func, records: list, repeat: int) -> float:
+    """Best time of repeat runs of func over every record, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            func(record)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best # type: ignore[return-value]
+
+def memory_per_object(func, records: list) -> float:
+    """
+    Bytes still held per record after func has built an object from each one.
+    Every record is parsed from JSON first and then dropped, like loading from a data file,
+    so strings the objects keep are counted too.
+    """
+    lines = [json.dumps(record) for record in records]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [func(json.loads(line)) for line in lines]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / len(records)
+
+def run(count: int = 5000, notes: int = 5, repeat: int = 3) -> dict:
+    """Compare the slotted models and their codecs with plain dataclasses, asdict and **dict loading."""
+    records = sample_records(count, notes)
+    old_tickets = [old_decode(record) for record in records]
+    new_tickets = [Ticket.from_dict(record) for record in records]
+
+    # Both ways must store exactly the same records
+    if [old_encode(ticket) for ticket in old_tickets] != records or [t.to_dict() for t in new_tickets] != records:
+        raise ValueError("Encoded tickets don't match the source records")
+
+    return {
+        "tickets": count,
+        "notes_per_ticket": notes,
+        "bytes_per_ticket": {"old": round(memory_per_object(old_decode, records)),
+                             "new": round(memory_per_object(Ticket.from_dict, records))},
+        "encode_ms": {"old": round(time_it(old_encode, old_tickets, repeat), 1),
+                      "new": round(time_it(Ticket.to_dict, new_tickets, repeat), 1)},
+        "decode_ms": {"old": round(time_it(old_decode, records, repeat), 1),
+                      "new": round(time_it(Ticket.from_dict, records, repeat), 1)},
+    }
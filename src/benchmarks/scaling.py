@@ -0,0 +1,280 @@
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tomllib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+from core.constants import DATA_FORMAT, STORAGE_BACKEND, TICKET_STORE
+from core.importer import BulkImporter
+from core.indexes import get_indexes
+from core.manager import SearchType, TicketSystemManager
+from core.models import Equipment, TicketState
+from core.storage import collection_cache, create_backend, get_backend, initialize_files
+
+# Scale name -> how many tickets, with a customer for every five tickets and about three notes per ticket
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+TECHNICIANS = 8
+# Generated dates count back from here rather than from today, so a seed always gives the same data
+EPOCH = datetime(2025, 1, 1)
+
+FIRST_NAMES = ["James", "Maria", "Robert", "Linda", "Michael", "Susan", "David", "Karen", "Daniel", "Nancy",
+               "Carlos", "Mei", "Ahmed", "Olga", "Kevin", "Priya", "Thomas", "Grace", "Luis", "Hannah"]
+LAST_NAMES = ["Smith", "Garcia", "Johnson", "Nguyen", "Brown", "Martinez", "Lee", "Walker", "Patel", "Young",
+              "Hernandez", "King", "Lopez", "Wright", "Kim", "Scott", "Green", "Baker", "Adams", "Nelson"]
+BUSINESSES = ["Dental", "Law Office", "Auto Repair", "Bakery", "Realty", "Accounting", "Insurance", "Salon"]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Maple Dr", "Cedar Ln", "Elm St", "Lakeview Blvd", "Hillcrest Way"]
+CITIES = ["Springfield", "Riverside", "Fairview", "Georgetown", "Salem", "Madison", "Clinton", "Ashland"]
+EQUIPMENT = {"Desktop": ["Optiplex 3080", "ThinkCentre M70q", "ProDesk 400 G7", "Custom build"],
+             "Laptop": ["Latitude 5420", "ThinkPad T14", "MacBook Air M1", "Inspiron 15", "Pavilion 15"],
+             "Printer": ["LaserJet Pro M404", "WorkForce WF-3820", "Brother HL-L2350"],
+             "Router": ["Archer AX55", "Nighthawk R7000", "EdgeRouter X"],
+             "Phone": ["iPhone 13", "Galaxy S22", "Pixel 7"]}
+PROBLEMS = ["won't boot past the logo", "running very slow", "blue screen on startup", "no internet connection",
+            "shows offline when printing", "virus popups in the browser", "needs data moved to a new machine",
+            "cracked screen", "battery won't charge", "email stopped syncing", "fan is loud and it overheats",
+            "keeps dropping wifi", "wants a RAM and SSD upgrade", "forgot the login password"]
+NOTE_LINES = ["Booted to Windows and got system specs", "Ran hardware diagnostics, all passed",
+              "Replaced the SSD and cloned the old drive", "Reinstalled drivers", "Spoke with customer about options",
+              "Ordered parts, waiting on delivery", "Updated BIOS", "Cleaned the dust out and replaced thermal paste",
+              "Backed up user data", "Removed malware and reset the browser", "Tested and working, ready for pickup",
+              "Customer picked up and paid"]
+
+class DatasetGenerator:
+    """
+    Realistic customers and tickets (with equipment and notes) made from a seed, so every run
+    at the same seed and scale builds the same data. Rows come out shaped for BulkImporter.
+    """
+    def __init__(self, tickets: int, seed: int):
+        self.tickets = tickets
+        self.customers = max(10, tickets // 5)
+        self.notes = 0 # Counted as the tickets are made
+        self.rng = random.Random(seed)
+
+    def technician_rows(self) -> list[dict]:
+        return [{"name": f"Tech {number}", "username": f"tech{number}", "email": f"tech{number}@example.com"}
+                for number in range(TECHNICIANS)]
+
+    def customer_code(self, number: int) -> str:
+        return f"C{number:05d}"
+
+    def customer_rows(self) -> Iterator[tuple[int, dict, str]]:
+        rng = self.rng
+        for number in range(self.customers):
+            last = rng.choice(LAST_NAMES)
+            is_business = rng.random() < 0.3
+            name = f"{last} {rng.choice(BUSINESSES)}" if is_business else f"{rng.choice(FIRST_NAMES)} {last}"
+            yield number + 1, {"code": self.customer_code(number),
+                               "name": name,
+                               "phone": self.phone(),
+                               "email": f"{name.lower().replace(' ', '.')}{number}@example.com",
+                               "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+                               "is_business": is_business}, ""
+
+    def ticket_rows(self, technician_ids: list[str]) -> Iterator[tuple[int, dict, str]]:
+        rng = self.rng
+        for number in range(self.tickets):
+            created = EPOCH - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+            equipment = [self.equipment() for _ in range(rng.choice([1, 1, 1, 2, 2, 3]))]
+            row = {"customer_code": self.customer_code(rng.randrange(self.customers)),
+                   "ticket_type": rng.choice(["inhouse", "inhouse", "onsite", "remote"]),
+                   "priority": rng.randint(1, 5),
+                   "description": f"{equipment[0]['eq_type']} {rng.choice(PROBLEMS)}",
+                   "created_by": f"tech{rng.randrange(TECHNICIANS)}",
+                   "contact_name": rng.choice(FIRST_NAMES) if rng.random() < 0.2 else "",
+                   "contact_phone": self.phone() if rng.random() < 0.2 else "",
+                   "date_created": created.isoformat(),
+                   "equipment_list": equipment,
+                   "notes_list": []}
+            # Most tickets older than a month are closed, newer ones are still being worked
+            if EPOCH - created > timedelta(days=30) and rng.random() < 0.95:
+                row["ticket_state"] = TicketState.CLOSED.value
+            else:
+                row["ticket_state"] = rng.choice([state.value for state in TicketState])
+            when = created
+            for _ in range(rng.randint(0, 6)):
+                when += timedelta(minutes=rng.randint(10, 3 * 24 * 60))
+                row["notes_list"].append({"technician": rng.choice(technician_ids),
+                                          "date_created": when.isoformat(),
+                                          "notes": "\n".join(rng.sample(NOTE_LINES, rng.randint(1, 3))),
+                                          "ticket_time": rng.choice([0.25, 0.5, 0.75, 1, 1.5, 2]),
+                                          "mileage": rng.randint(5, 40) if row["ticket_type"] == "onsite" else 0})
+            self.notes += len(row["notes_list"])
+            if row["ticket_state"] != TicketState.OPEN.value:
+                row["date_started"] = (created + timedelta(hours=rng.randint(1, 48))).isoformat()
+            if row["ticket_state"] == TicketState.CLOSED.value:
+                row["date_completed"] = max(when, created + timedelta(hours=49)).isoformat()
+            yield number + 1, row, ""
+
+    def equipment(self) -> dict:
+        eq_type = self.rng.choice(list(EQUIPMENT))
+        return {"eq_type": eq_type,
+                "model": self.rng.choice(EQUIPMENT[eq_type]),
+                "serial_number": f"{self.rng.getrandbits(40):010X}",
+                "notes": self.rng.choice(["", "", "", "Charger included", "Has a case", "Password on sticky note"])}
+
+    def phone(self) -> str:
+        return f"{self.rng.randint(200, 999)}{self.rng.randint(200, 999)}{self.rng.randint(0, 9999):04d}"
+
+def timed(operation: Callable[[int], object], repeat: int) -> dict:
+    """Run operation(run number) repeat times. Times are in milliseconds."""
+    times = []
+    for run_number in range(repeat):
+        started = time.perf_counter()
+        operation(run_number)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {"runs": repeat,
+            "median_ms": round(statistics.median(times), 3),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+            "max_ms": round(times[-1], 3)}
+
+def measure(tickets: int, seed: int, repeat: int) -> dict:
+    """
+    Generate the dataset into this process's data directory (TAVERN_DATA_DIR), then time the
+    manager methods and storage calls against it. Runs in its own process, see run.
+    """
+    initialize_files()
+    manager = TicketSystemManager()
+    generator = DatasetGenerator(tickets, seed)
+    rng = random.Random(seed + 1) # Picks what each timed call works on, apart from the data
+
+    started = time.perf_counter()
+    for tech in generator.technician_rows():
+        manager.technicians.create_technician(**tech)
+    usernames = {tech.username: tech.id for tech in manager.technicians.list_technicians()}
+    technician_ids = [usernames[tech["username"]] for tech in generator.technician_rows()]
+    customer_report = BulkImporter("customers").run(generator.customer_rows())
+    ticket_report = BulkImporter("tickets").run(generator.ticket_rows(technician_ids))
+    generate_seconds = time.perf_counter() - started
+    if customer_report.rejected or ticket_report.rejected:
+        raise ValueError(f"The generated data didn't import: {(customer_report.rejected + ticket_report.rejected)[:3]}")
+
+    backend = get_backend()
+    customer_ids = [customer["id"] for customer in backend.iter_records("customers")]
+    ticket_ids = [ticket["id"] for ticket in backend.iter_records("tickets")]
+    ticket_numbers = [ticket["ticket_number"] for ticket in backend.get_fields("tickets", ticket_ids[:1000], ["ticket_number"])]
+    customers, techs = manager.customers, manager.technicians
+    ticket_manager = manager.tickets
+    pick_customers = [rng.choice(customer_ids) for _ in range(repeat)]
+    pick_tickets = [rng.choice(ticket_ids) for _ in range(repeat)]
+    pick_numbers = [rng.choice(ticket_numbers) for _ in range(repeat)]
+    pick_codes = [generator.customer_code(rng.randrange(generator.customers)) for _ in range(repeat)]
+    pick_names = [rng.choice(LAST_NAMES) for _ in range(repeat)]
+    pick_words = [rng.choice(["boot", "slow", "printer", "wifi", "ssd", "malware", "battery"]) for _ in range(repeat)]
+    equipment = [Equipment(eq_type="Laptop", model="ThinkPad T14", serial_number="BENCH0001")]
+
+    operations: dict[str, dict] = {}
+    def time_operation(name: str, operation: Callable[[int], object], runs: int = repeat) -> None:
+        operations[name] = timed(operation, runs)
+
+    # Opening the data: the indexes as the app would find them, then from scratch
+    time_operation("indexes.ensure_current", lambda run: get_indexes().ensure_current(), 1)
+    time_operation("indexes.rebuild", lambda run: get_indexes().rebuild(), min(repeat, 3))
+
+    time_operation("customers.create_customer", lambda run: customers.create_customer(
+        f"B{run:05d}", f"Bench Customer {run}", generator.phone(), "bench@example.com", "1 Bench St", False))
+    time_operation("customers.update_customer", lambda run: customers.update_customer(
+        pick_customers[run], f"U{run:05d}", f"Updated Customer {run}", generator.phone(), "", "", True))
+    time_operation("customers.find_by_id", lambda run: customers.find_by_id(pick_customers[run]))
+    time_operation("customers.search_customers_page.name",
+                   lambda run: customers.search_customers_page(pick_names[run], SearchType.NAME))
+    time_operation("customers.prefix_search.code", lambda run: customers.prefix_search(pick_codes[run][:4], SearchType.CODE))
+    time_operation("customers.get_customer_tickets", lambda run: customers.get_customer_tickets(pick_customers[run]))
+
+    time_operation("tickets.create_ticket", lambda run: ticket_manager.create_ticket(
+        pick_customers[run], "inhouse", "3", "Laptop running very slow", equipment, "tech0"))
+    time_operation("tickets.update_ticket", lambda run: ticket_manager.update_ticket(
+        pick_tickets[run], pick_customers[run], "onsite", "2", "Updated: printer offline", equipment))
+    time_operation("tickets.add_time_entry", lambda run: ticket_manager.add_time_entry(
+        pick_tickets[run], technician_ids[0], "Ran hardware diagnostics, all passed", "0.5", "0"))
+    time_operation("tickets.search_by_id", lambda run: ticket_manager.search_by_id(pick_tickets[run]))
+    time_operation("tickets.get_ticket_notes", lambda run: ticket_manager.get_ticket_notes(pick_tickets[run]))
+    time_operation("tickets.search_by_ticket_number", lambda run: ticket_manager.search_by_ticket_number(str(pick_numbers[run])))
+    time_operation("tickets.search_tickets_page.code",
+                   lambda run: ticket_manager.search_tickets_page(pick_codes[run], SearchType.CODE))
+    time_operation("tickets.search_tickets_page.text",
+                   lambda run: ticket_manager.search_tickets_page(pick_words[run], SearchType.TEXT))
+    time_operation("tickets.count_tickets.text", lambda run: ticket_manager.count_tickets(pick_words[run], SearchType.TEXT))
+
+    time_operation("technicians.create_technician", lambda run: techs.create_technician(
+        f"Bench Tech {run}", f"bench{run}", f"bench{run}@example.com"))
+    time_operation("technicians.update_technician", lambda run: techs.update_technician(
+        technician_ids[run % TECHNICIANS], f"Tech {run}", f"tech{run % TECHNICIANS}", f"tech{run}@example.com", True))
+    time_operation("technicians.login", lambda run: techs.login(f"tech{run % TECHNICIANS}"))
+    time_operation("technicians.list_technicians", lambda run: techs.list_technicians())
+
+    # Whole collections last, saving one resets the change feed and so the indexes
+    whole = min(repeat, 3)
+    loaded = {}
+    def load_cold(collection: str) -> None:
+        # A new backend with nothing cached reads the files the way a freshly started copy of Tavern does
+        collection_cache.invalidate()
+        loaded[collection] = create_backend(STORAGE_BACKEND).load_all(collection)
+    for collection in ("customers", "tickets"):
+        time_operation(f"storage.load_all.{collection}", lambda run, collection=collection: load_cold(collection), whole)
+    for collection in ("customers", "tickets"):
+        time_operation(f"storage.save_all.{collection}",
+                       lambda run, collection=collection: backend.save_all(collection, loaded[collection]), whole)
+
+    return {"customers": generator.customers,
+            "tickets": tickets,
+            "notes": generator.notes,
+            "generate_seconds": round(generate_seconds, 2),
+            "generate_rows_per_second": round((generator.customers + tickets) / generate_seconds),
+            "operations": operations}
+
+def tavern_version() -> str:
+    pyproject = Path(__file__).resolve().parent.parent.parent / "pyproject.toml"
+    try:
+        with pyproject.open("rb") as f:
+            return tomllib.load(f)["project"]["version"]
+    except (OSError, KeyError, tomllib.TOMLDecodeError):
+        return "unknown"
+
+def run(scales: list[str] = ["1k", "10k"], seed: int = 1, repeat: int = 20) -> dict:
+    """
+    Time the managers and storage at each scale, each in a fresh process with its own temporary
+    data directory (the data paths are fixed when core.constants is imported). The report is
+    plain JSON, so two saved reports can be diffed, or checked with compare.
+    """
+    report = {"tavern": tavern_version(),
+              "python": platform.python_version(),
+              "storage": STORAGE_BACKEND,
+              "ticket_store": TICKET_STORE,
+              "data_format": DATA_FORMAT,
+              "seed": seed,
+              "repeat": repeat,
+              "scales": {}}
+    context = multiprocessing.get_context("spawn") # A fork would keep this process's data paths
+    for scale in scales:
+        if scale not in SCALES:
+            raise ValueError(f"Unknown scale {scale}, choose from {', '.join(SCALES)}")
+        previous = os.environ.get("TAVERN_DATA_DIR")
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["TAVERN_DATA_DIR"] = directory # Read by the new process as it imports core.constants
+            try:
+                with context.Pool(1) as pool:
+                    report["scales"][scale] = pool.apply(measure, (SCALES[scale], seed, repeat))
+            finally:
+                if previous is None:
+                    os.environ.pop("TAVERN_DATA_DIR", None)
+                else:
+                    os.environ["TAVERN_DATA_DIR"] = previous
+    return report
+
+def compare(before: dict, after: dict, threshold: float = 0.2) -> list[str]:
+    """Operations whose median got more than threshold (20%) slower from one report to the next."""
+    slower = []
+    for scale, results in after["scales"].items():
+        old_operations = before.get("scales", {}).get(scale, {}).get("operations", {})
+        for name, timing in results["operations"].items():
+            old = old_operations.get(name)
+            if old and old["median_ms"] > 0 and timing["median_ms"] > old["median_ms"] * (1 + threshold):
+                slower.append(f"{scale} {name}: {old['median_ms']}ms -> {timing['median_ms']}ms "
+                              f"({timing['median_ms'] / old['median_ms'] - 1:+.0%})")
+    return slower
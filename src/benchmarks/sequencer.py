@@ -0,0 +1,49 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from core.sequencer import TicketSequencer, read_counter
+
+def take_numbers(path: str, block_size: int, count: int, release: bool) -> tuple[list[int], list[int]]:
+    """One process's share: count numbers, then what was left of its block."""
+    sequencer = TicketSequencer(Path(path), block_size)
+    numbers = [sequencer.next_number() for _ in range(count)]
+    leftover = list(range(sequencer._next, sequencer._end + 1))
+    if release:
+        sequencer.release()
+    # Processes that don't release are like ones that crashed, their leftovers become gaps
+    return numbers, leftover
+
+def run(count: int = 5000, processes: int = 8, block_size: int = 10) -> dict:
+    """
+    Have several processes take count numbers between them from one counter file at the same time.
+    Every number must be unique, and the only numbers missing may be block leftovers: those of
+    processes that exited without releasing them, or that couldn't be given back because
+    another process had reserved numbers after them.
+    """
+    per_process = max(1, count // processes)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "maxticket.txt"
+        jobs = [(str(path), block_size, per_process, index % 2 == 0) for index in range(processes)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(take_numbers, jobs)
+        elapsed = time.perf_counter() - started
+        last = read_counter(path)
+
+    numbers = [number for taken, leftover in results for number in taken]
+    leftovers = set(number for taken, leftover in results for number in leftover)
+    missing = set(range(1, last + 1)) - set(numbers)
+    report = {
+        "processes": processes,
+        "block_size": block_size,
+        "numbers": len(numbers),
+        "duplicates": len(numbers) - len(set(numbers)),
+        "gaps": len(missing),
+        "unexplained_gaps": len(missing - leftovers),
+        "last_number": last,
+        "numbers_per_second": round(len(numbers) / elapsed),
+    }
+    if report["duplicates"] or report["unexplained_gaps"]:
+        raise ValueError(f"Ticket numbers went wrong: {report}")
+    return report
@@ -0,0 +1,135 @@
+import argparse
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from core.constants import DATA_FORMATS, ARCHIVE_AFTER_DAYS, IMPORT_BATCH_SIZE
+from core.exporter import EXPORT_COLUMNS, EXPORT_FORMATS
+from core.models import TicketState
+from core.storage import migrate_json_to_sqlite, compact_journals, convert_data_files
+
+def migrate_sqlite(args):
+    counts = migrate_json_to_sqlite(force=args.force)
+    for collection, count in counts.items():
+        print(f"Copied {count} {collection}")
+
+def compact(args):
+    for collection, folded in compact_journals().items():
+        print(f"Compacted {collection}: folded {folded} journal bytes into the snapshot")
+
+def convert(args):
+    for collection, (old_size, new_size) in convert_data_files(args.format).items():
+        print(f"Converted {collection} to {args.format}: {old_size} -> {new_size} bytes")
+    print(f"Set TAVERN_FORMAT={args.format} so saves keep using it")
+
+def archive(args):
+    from core.archive import archive_closed_tickets
+    counts = archive_closed_tickets(days=args.days)
+    for year, count in counts.items():
+        print(f"Archived {count} tickets closed in {year}")
+    if not counts:
+        print(f"No tickets have been closed for more than {args.days} days")
+
+def import_data(args):
+    from core.importer import import_file
+    def progress(report):
+        print(f"  {report.imported} {args.collection} so far, {report.rows_per_second:.0f} rows/s")
+    report = import_file(Path(args.file), args.collection, batch_size=args.batch_size, on_batch=progress)
+    for line, reason in report.rejected:
+        print(f"Line {line}: {reason}")
+    print(f"Imported {report.imported} {args.collection} and rejected {len(report.rejected)} rows "
+          f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)")
+
+def export_data(args):
+    from core.exporter import ExportFilter, export_data as export_files
+    from core.indexes import get_indexes
+    export_filter = ExportFilter(states=args.state, include_archived=args.include_archived)
+    if args.since:
+        export_filter.since = datetime.fromisoformat(args.since)
+    if args.until:
+        export_filter.until = datetime.fromisoformat(args.until) + timedelta(days=1) # The until day is included
+    if args.customer:
+        get_indexes().ensure_current()
+        ids = get_indexes().customer_ids_for_code(args.customer)
+        if not ids:
+            raise ValueError(f"Customer code {args.customer} not found.")
+        export_filter.customer_id = ids[0]
+    for kind, (path, count) in export_files(Path(args.directory), args.only, args.format, export_filter).items():
+        print(f"Exported {count} {kind} to {path}")
+
+def benchmark(args):
+    from benchmarks import models, formats, sequencer, scaling
+    if args.suite != "scaling":
+        suites = {"models": models, "formats": formats, "sequencer": sequencer}
+        print(json.dumps(suites[args.suite].run(count=args.count), indent=2))
+        return
+    report = scaling.run(args.scales, seed=args.seed, repeat=args.repeat)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote the report to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        slower = scaling.compare(json.loads(Path(args.compare).read_text(encoding="utf-8")), report)
+        for line in slower:
+            print(f"Slower: {line}")
+        if not slower:
+            print(f"Nothing got more than 20% slower than {args.compare}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tavern data maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate-sqlite", help="Copy the JSON data files into the SQLite database")
+    migrate_parser.add_argument("--force", action="store_true", help="Overwrite a database that already has data")
+    migrate_parser.set_defaults(func=migrate_sqlite)
+
+    compact_parser = subparsers.add_parser("compact", help="Fold the change journals into the data files")
+    compact_parser.set_defaults(func=compact)
+
+    convert_parser = subparsers.add_parser("convert", help="Rewrite the data files in another format")
+    convert_parser.add_argument("format", choices=DATA_FORMATS)
+    convert_parser.set_defaults(func=convert)
+
+    archive_parser = subparsers.add_parser("archive", help="Move long-closed tickets into the compressed archive")
+    archive_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                                help=f"Archive tickets closed more than this many days ago (default {ARCHIVE_AFTER_DAYS})")
+    archive_parser.set_defaults(func=archive)
+
+    import_parser = subparsers.add_parser("import", help="Add customers or tickets in bulk from a CSV or JSON lines file")
+    import_parser.add_argument("collection", choices=["customers", "tickets"])
+    import_parser.add_argument("file", help="A .csv file with a header line, or a .jsonl file")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                               help=f"Rows written at a time (default {IMPORT_BATCH_SIZE})")
+    import_parser.set_defaults(func=import_data)
+
+    export_parser = subparsers.add_parser("export", help="Write customers, tickets, equipment and notes out as CSV or JSON lines files")
+    export_parser.add_argument("directory", help="Where to write customers.csv, tickets.csv, equipment.csv and notes.csv")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    export_parser.add_argument("--only", nargs="+", choices=list(EXPORT_COLUMNS), help="Just these files")
+    export_parser.add_argument("--since", help="Tickets created on or after this date (YYYY-MM-DD)")
+    export_parser.add_argument("--until", help="Tickets created on or before this date (YYYY-MM-DD)")
+    export_parser.add_argument("--customer", help="Just this customer code's tickets")
+    export_parser.add_argument("--state", nargs="+", choices=[state.value for state in TicketState],
+                               help="Just tickets in these states")
+    export_parser.add_argument("--include-archived", action="store_true", help="Include archived tickets")
+    export_parser.set_defaults(func=export_data)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Time the model codecs, the data file formats or the managers as data grows, or stress the ticket numbers")
+    benchmark_parser.add_argument("suite", choices=["models", "formats", "sequencer", "scaling"])
+    benchmark_parser.add_argument("--count", type=int, default=5000, help="How many tickets (or ticket numbers) to build")
+    benchmark_parser.add_argument("--scales", nargs="+", choices=["1k", "10k", "100k", "1m"], default=["1k", "10k"],
+                                  help="scaling: how many tickets to generate (default 1k 10k)")
+    benchmark_parser.add_argument("--seed", type=int, default=1, help="scaling: the same seed generates the same data")
+    benchmark_parser.add_argument("--repeat", type=int, default=20, help="scaling: times each operation is run")
+    benchmark_parser.add_argument("--output", help="scaling: write the JSON report to this file")
+    benchmark_parser.add_argument("--compare", help="scaling: list operations that got slower than in this earlier report")
+    benchmark_parser.set_defaults(func=benchmark)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+if __name__ == "__main__":
+    main()
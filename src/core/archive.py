@@ -0,0 +1,172 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+from core.constants import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS
+from core.fulltext import FullTextIndex, ticket_text
+from core.storage import get_backend, file_signature
+
+class TicketArchive:
+    """
+    Cold storage for closed tickets: gzipped JSON lines with one shard per year the ticket was
+    closed, plus index.json saying which shard each archived ticket (by id and number) is in.
+    Shards are only read when something in them is asked for, then kept in memory until the
+    file changes. Archived tickets are whole tickets, notes included, and are read-only.
+    """
+    def __init__(self, directory: Path = ARCHIVE_DIR):
+        self.directory = directory
+        self.index_path = directory / "index.json"
+        self.tickets: dict[str, tuple[int, str]] = {} # ticket id -> (ticket number, shard year)
+        self.numbers: dict[int, str] = {} # ticket number -> ticket id
+        self._index_signature: Optional[tuple] = None
+        self._shards: dict[str, tuple[Optional[tuple], dict[str, dict]]] = {} # year -> (file signature, id -> ticket)
+        self._text: Optional[FullTextIndex] = None
+        self._text_signature: Optional[tuple] = None
+        self._lock = threading.RLock()
+
+    def add(self, tickets: list[dict]) -> dict[str, int]:
+        """Append whole tickets to their year's shard. Returns how many went into each shard."""
+        by_year: dict[str, list[dict]] = {}
+        for ticket in tickets:
+            by_year.setdefault(archive_year(ticket), []).append(ticket)
+        with self._lock:
+            self._refresh()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for year, year_tickets in sorted(by_year.items()):
+                lines = "".join(json.dumps(ticket, separators=(",", ":"), ensure_ascii=False) + "\n"
+                                for ticket in year_tickets)
+                # Appending adds another gzip member, gzip reads them back as one stream
+                with gzip.open(self.shard_path(year), "ab") as f:
+                    f.write(lines.encode("utf-8"))
+                for ticket in year_tickets:
+                    self.tickets[ticket["id"]] = (int(ticket["ticket_number"]), year)
+                    self.numbers[int(ticket["ticket_number"])] = ticket["id"]
+            self._save_index()
+        return {year: len(year_tickets) for year, year_tickets in sorted(by_year.items())}
+
+    def contains(self, ticket_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return ticket_id in self.tickets
+
+    def id_for_number(self, ticket_number: int) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            return self.numbers.get(ticket_number)
+
+    def ticket_numbers(self) -> dict[str, tuple[int, str]]:
+        """Archived ticket id -> (ticket number, shard year). Shared, so don't change it."""
+        with self._lock:
+            self._refresh()
+            return self.tickets
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        """A whole archived ticket, reading only the shard it's in."""
+        with self._lock:
+            self._refresh()
+            if ticket_id not in self.tickets:
+                return None
+            return self._shard(self.tickets[ticket_id][1]).get(ticket_id)
+
+    def iter_tickets(self) -> Iterator[dict]:
+        """Every archived ticket, oldest shard first."""
+        with self._lock:
+            self._refresh()
+            years = sorted(set(year for number, year in self.tickets.values()))
+        for year in years:
+            with self._lock:
+                shard = self._shard(year)
+            yield from shard.values()
+
+    def text_scores(self, query: str) -> list[tuple[str, float]]:
+        """(ticket id, BM25 score) for archived tickets matching query, built the first time it's needed."""
+        with self._lock:
+            self._refresh()
+            if self._text is None or self._text_signature != self._index_signature:
+                self._text = FullTextIndex()
+                for ticket in self.iter_tickets():
+                    self._text.add(ticket["id"], ticket_text(ticket))
+                self._text_signature = self._index_signature
+            return self._text.search(query)
+
+    def shard_path(self, year: str) -> Path:
+        return self.directory / f"tickets-{year}.jsonl.gz"
+
+    def _shard(self, year: str) -> dict[str, dict]:
+        path = self.shard_path(year)
+        signature = file_signature(path)
+        cached = self._shards.get(year)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        tickets = {}
+        if signature is not None:
+            with gzip.open(path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        ticket = json.loads(line)
+                        tickets[ticket["id"]] = ticket # A ticket archived twice keeps its last copy
+        self._shards[year] = (signature, tickets)
+        return tickets
+
+    def _refresh(self) -> None:
+        """Re-read index.json if it changed, e.g. because cli.py archive ran in another process."""
+        signature = file_signature(self.index_path)
+        if signature == self._index_signature:
+            return
+        data = {}
+        if signature is not None:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        self.tickets = {id: (number, year) for id, (number, year) in data.get("tickets", {}).items()}
+        self.numbers = {number: id for id, (number, year) in self.tickets.items()}
+        self._index_signature = signature
+
+    def _save_index(self) -> None:
+        temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump({"tickets": self.tickets}, f, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+        self._index_signature = file_signature(self.index_path)
+
+def closed_date(ticket: dict) -> datetime:
+    """When a ticket was closed, or when it was created if it was closed without a completed date."""
+    return datetime.fromisoformat(ticket.get("date_completed") or ticket["date_created"])
+
+def archive_year(ticket: dict) -> str:
+    return str(closed_date(ticket).year)
+
+def archive_closed_tickets(days: int = ARCHIVE_AFTER_DAYS, now: Optional[datetime] = None) -> dict[str, int]:
+    """
+    Move tickets that have been closed for more than days into the archive.
+    They're written to the archive before they're removed, so a crash in between leaves a
+    ticket in both places rather than neither. Returns how many went into each year's shard.
+    The data lock is held exclusively throughout, so other sessions can't reopen a ticket or
+    write to the archive in the middle of it.
+    """
+    if days < 0:
+        raise ValueError("Archive age can't be negative")
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    backend = get_backend()
+    with backend.data_lock.hold():
+        due = [ticket["id"] for ticket in backend.load_all("tickets")
+               if ticket["ticket_state"] == "closed" and closed_date(ticket) < cutoff]
+        tickets = [ticket for ticket in (backend.get("tickets", id) for id in due) if ticket is not None]
+        if not tickets:
+            return {}
+        counts = get_archive().add(tickets)
+        backend.remove("tickets", [ticket["id"] for ticket in tickets])
+    return counts
+
+_archive: Optional[TicketArchive] = None
+_archive_lock = threading.Lock() # Worker threads may ask for the archive at the same time
+
+def get_archive() -> TicketArchive:
+    """The process-wide ticket archive."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = TicketArchive()
+    return _archive
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+from core.constants import CHANGES_FILE, CHANGES_MAX_BYTES
+from core.locking import file_lock, lock_path
+
+# Tells this process's changes apart from other sessions' in the feed
+SESSION_ID = uuid.uuid4().hex
+
+class ChangeFeed:
+    """
+    Every write to the data, from every session sharing the data directory, as one JSON line
+    with a sequence number one higher than the line before. A session catches up on everyone
+    else's writes by reading the lines past the last sequence number it saw, instead of
+    re-reading all the data:
+        {"seq": 7, "session": ..., "collection": "tickets", "op": "update", "id": ..., "old": {...}, "new": {...}}
+    ops: insert (new), update (old and new), remove (old), note (the note added to ticket id),
+    compact (the files changed but the records didn't) and reset (the whole collection was
+    replaced, so there's nothing to catch up from).
+    Records are the same as load_all gives, so tickets leave out their notes.
+    Once the file passes max_bytes the older half is dropped, and anyone that hadn't read that
+    far gets None from since() and has to reload everything.
+    """
+    def __init__(self, path: Path = CHANGES_FILE, max_bytes: int = CHANGES_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._last: tuple[Optional[tuple], int] = (None, 0) # (file signature, last seq in it) from the last look
+        self._positions: dict[int, tuple[int, int]] = {} # seq -> (inode, offset just past its line), to read on from
+        self._lock = threading.RLock()
+
+    def record(self, changes: list[dict]) -> int:
+        """Append changes with the next sequence numbers. Returns the last one used."""
+        if not changes:
+            return self.last_seq()
+        with self._lock, file_lock(lock_path(self.path)):
+            seq = self.last_seq()
+            lines = []
+            for change in changes:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, "session": SESSION_ID, **change},
+                                        separators=(",", ":"), ensure_ascii=False) + "\n")
+            with self.path.open("ab") as f:
+                f.write("".join(lines).encode("utf-8"))
+            if self.path.stat().st_size > self.max_bytes:
+                self._trim()
+            self._last = (self._signature(), seq)
+            return seq
+
+    def last_seq(self) -> int:
+        """The newest change's sequence number, 0 if there are none. Only reads the file if it changed."""
+        with self._lock:
+            signature = self._signature()
+            if signature != self._last[0]:
+                self._last = (signature, self._read_last_seq() if signature else 0)
+            return self._last[1]
+
+    def since(self, seq: int) -> Optional[list[dict]]:
+        """Changes after seq, oldest first, or None if some of them have been dropped."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return [] if seq == 0 else None # No file, but someone saw changes: it was deleted
+            start = 0
+            position = self._positions.get(seq)
+            if position is not None and position[0] == stat.st_ino and position[1] <= stat.st_size:
+                start = position[1]
+            with self.path.open("rb") as f:
+                f.seek(start)
+                data = f.read()
+            end = data.rfind(b"\n") + 1 # A line still being written by another process waits for the next read
+            changes = []
+            offset = start
+            for line in data[:end].splitlines(keepends=True):
+                offset += len(line)
+                if not line.strip():
+                    continue
+                change = json.loads(line)
+                if start == 0 and not changes and change["seq"] > seq + 1:
+                    return None # The file starts after seq, the ones in between were dropped
+                if change["seq"] > seq:
+                    changes.append(change)
+                    last_offset = offset
+            if changes:
+                if len(self._positions) > 32:
+                    self._positions.clear() # Only the last few readers' places are worth keeping
+                self._positions[changes[-1]["seq"]] = (stat.st_ino, last_offset)
+            return changes
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _read_last_seq(self) -> int:
+        """The seq of the last whole line, reading back from the end only as far as needed."""
+        with self.path.open("rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            chunk = 4096
+            while True:
+                start = max(0, size - chunk)
+                f.seek(start)
+                data = f.read(size - start)
+                end = data.rfind(b"\n")
+                if end == -1:
+                    if start == 0:
+                        return 0 # Not even one whole line yet
+                    chunk *= 2
+                    continue
+                line_start = data.rfind(b"\n", 0, end) + 1
+                if line_start == 0 and start > 0:
+                    chunk *= 2 # The last line is longer than what was read
+                    continue
+                return json.loads(data[line_start:end])["seq"]
+
+    def _trim(self) -> None:
+        """Keep the newer half of the file. Called while holding the file lock."""
+        data = self.path.read_bytes()
+        cut = data.find(b"\n", len(data) // 2) + 1
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        temp_path.write_bytes(data[cut:])
+        os.replace(temp_path, self.path)
+
+_feed: Optional[ChangeFeed] = None
+_feed_lock = threading.Lock() # Worker threads may ask for the feed at the same time
+
+def get_feed() -> ChangeFeed:
+    """The process-wide change feed."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = ChangeFeed()
+    return _feed
+
+def record_changes(changes: list[dict]) -> None:
+    """Called by the storage backends after each write."""
+    get_feed().record(changes)
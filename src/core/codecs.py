@@ -0,0 +1,85 @@
+import dataclasses
+import typing
+from datetime import datetime
+from enum import Enum
+
+def _field_kind(hint) -> tuple:
+    """Work out how a field is stored from its type hint: ("datetime",), ("enum", E), ("models", M) or ("plain",)."""
+    args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+    if typing.get_origin(hint) is typing.Union and len(args) == 1:
+        hint = args[0] # Optional[X] is stored the same way as X
+    if hint is datetime:
+        return ("datetime",)
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        return ("enum", hint)
+    if typing.get_origin(hint) is list:
+        item = typing.get_args(hint)[0]
+        if dataclasses.is_dataclass(item):
+            return ("models", item)
+    return ("plain",)
+
+def add_codec(cls):
+    """
+    Class decorator for the dataclass models. Writes to_dict/from_dict functions for the class's
+    own fields once, instead of looking at every value's type on every call like asdict does.
+    to_dict gives the plain dict stored in the data files (dates as ISO strings, enums as values,
+    nested models as dicts) and from_dict turns one back into an object with real datetimes.
+    Keys missing from the dict get the field's default, and unknown keys are ignored.
+    from_dict first tries reading every key straight out of the dict, which is what the stored
+    records have, and only falls back to the defaults if one is missing.
+    """
+    hints = typing.get_type_hints(cls)
+    namespace: dict = {"datetime": datetime, "Enum": Enum, "fromisoformat": datetime.fromisoformat}
+    encode_parts = []
+    decode_parts = []
+    fast_parts = [] # Decoding with every key present
+    for f in dataclasses.fields(cls):
+        kind = _field_kind(hints[f.name])
+        name = f.name
+        # A missing key gets the field's default, or a fresh value from its default_factory
+        if f.default_factory is not dataclasses.MISSING:
+            namespace[f"factory_{name}"] = f.default_factory
+            value = f"(d[{name!r}] if {name!r} in d else factory_{name}())"
+        else:
+            namespace[f"default_{name}"] = f.default
+            value = f"d.get({name!r}, default_{name})"
+        if kind[0] == "datetime":
+            encode = f"(v.isoformat() if isinstance(v := self.{name}, datetime) else v)"
+            decode = f"(datetime.fromisoformat(v) if isinstance(v := {value}, str) else v)"
+            fast = f"(fromisoformat(v) if isinstance(v := d[{name!r}], str) else v)"
+        elif kind[0] == "enum":
+            namespace[f"type_{name}"] = kind[1]
+            # A dict lookup instead of the Enum call, an unknown value is a KeyError and takes the slow way
+            namespace[f"members_{name}"] = {member.value: member for member in kind[1]}
+            encode = f"(v.value if isinstance(v := self.{name}, Enum) else v)"
+            decode = f"type_{name}({value})"
+            fast = f"members_{name}[d[{name!r}]]"
+        elif kind[0] == "models":
+            namespace[f"type_{name}"] = kind[1]
+            namespace[f"from_dict_{name}"] = kind[1].from_dict
+            encode = f"[item.to_dict() for item in self.{name}]"
+            decode = f"[type_{name}.from_dict(item) for item in {value}]"
+            fast = f"[from_dict_{name}(item) for item in d[{name!r}]]"
+        else:
+            encode = f"self.{name}"
+            decode = value
+            fast = f"d[{name!r}]"
+        encode_parts.append(f"{name!r}: {encode}")
+        decode_parts.append((name, decode))
+        fast_parts.append(fast)
+
+    source = ("def to_dict(self) -> dict:\n"
+              f"    return {{{', '.join(encode_parts)}}}\n"
+              "def decode_fields(d: dict) -> dict:\n"
+              f"    return {{{', '.join(f'{name!r}: {decode}' for name, decode in decode_parts)}}}\n"
+              "def from_dict(klass, d: dict):\n"
+              "    try:\n"
+              f"        return klass({', '.join(fast_parts)})\n"
+              "    except KeyError:\n"
+              f"        return klass({', '.join(decode for name, decode in decode_parts)})\n")
+    exec(compile(source, f"<codec {cls.__name__}>", "exec"), namespace)
+
+    cls.to_dict = namespace["to_dict"]
+    cls.decode_fields = staticmethod(namespace["decode_fields"]) # Stored dict -> constructor arguments
+    cls.from_dict = classmethod(namespace["from_dict"])
+    return cls
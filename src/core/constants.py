@@ -1,6 +1,8 @@
+import os
 from pathlib import Path
 
-DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# TAVERN_DATA_DIR points a copy of Tavern (or a benchmark) at another data directory
+DATA_DIR = Path(os.environ.get("TAVERN_DATA_DIR") or Path(__file__).resolve().parent.parent / "data")
 
 CUSTOMERS_FILE = DATA_DIR / "customers.json"
 TICKETS_FILE = DATA_DIR / "tickets.json"
@@ -13,4 +15,60 @@ FILE_MAP = {
     'technicians': TECHS_FILE
 }
 
-COUNTER_FILE = DATA_DIR / "maxticket.txt"
\ No newline at end of file
+COUNTER_FILE = DATA_DIR / "maxticket.txt"
+# Ticket numbers are reserved from it this many at a time per process, unused ones are given back on exit
+TICKET_BLOCK_SIZE = int(os.environ.get("TAVERN_TICKET_BLOCK", "10"))
+
+# Shared while reading the data files, exclusive while writing them, so several copies of Tavern can use one data directory
+DATA_LOCK_FILE = DATA_DIR / "tavern.lock"
+
+# Ticket notes, kept out of tickets.json in an append-only file
+NOTES_FILE = DATA_DIR / "notes.jsonl"
+
+# Which storage engine sits behind load_data/save_data: "json" or "sqlite"
+STORAGE_BACKEND = os.environ.get("TAVERN_STORAGE", "json")
+
+SQLITE_FILE = DATA_DIR / "tavern.db"
+
+# How the json backend writes its data files: "json" (pretty-printed), "jsonl" (one minified
+# record per line) or "binary" (length-prefixed marshal records). Any of them can be read back.
+DATA_FORMAT = os.environ.get("TAVERN_FORMAT", "json")
+DATA_FORMATS = ["json", "jsonl", "binary"]
+
+# Collections that append changes to a journal (<name>.journal) instead of rewriting their file
+JOURNALED_COLLECTIONS = ["tickets"]
+# Fold the journal into the snapshot once it gets this big
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+# How the json backend keeps the tickets: "journal" (the snapshot read whole) or "mmap" (one JSON
+# line per ticket, read through mmap with an offset table so one ticket is read without the rest)
+TICKET_STORE = os.environ.get("TAVERN_TICKETS", "journal")
+
+# Fields besides id that get an O(1) lookup index, the first record wins if two share a value
+UNIQUE_KEYS = {
+    'technicians': ['username']
+}
+
+# Closed tickets move to gzipped shards here (one per year) once they've been closed this long
+ARCHIVE_DIR = DATA_DIR / "archive"
+ARCHIVE_AFTER_DAYS = int(os.environ.get("TAVERN_ARCHIVE_DAYS", "365"))
+
+# Rows per write when bulk importing customers or tickets
+IMPORT_BATCH_SIZE = int(os.environ.get("TAVERN_IMPORT_BATCH", "1000"))
+
+# Saved search indexes, rebuilt automatically if they no longer match the data
+INDEX_FILE = DATA_DIR / "indexes.json"
+
+# Every write, so other sessions sharing DATA_DIR can catch up on just what changed
+CHANGES_FILE = DATA_DIR / "changes.jsonl"
+# Drop the older half of the changes file once it gets this big
+CHANGES_MAX_BYTES = 4 * 1024 * 1024
+# How often the app checks the changes file for other sessions' writes
+CHANGE_POLL_SECONDS = float(os.environ.get("TAVERN_CHANGE_POLL", "1"))
+
+# TAVERN_INSTRUMENT=1 times every manager method and data file read and write, shown on the Diagnostics screen.
+# Left off, the decorators hand back the methods unchanged so there's nothing to pay.
+INSTRUMENTATION = os.environ.get("TAVERN_INSTRUMENT", "") not in ("", "0")
+
+# Profiles captured from the app (a .prof for pstats/snakeviz and a .txt of the top functions by cumulative time)
+PROFILES_DIR = DATA_DIR / "profiles"
+PROFILE_TOP_FUNCTIONS = 40
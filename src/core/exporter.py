@@ -0,0 +1,152 @@
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+from core.archive import get_archive
+from core.indexes import get_indexes
+from core.storage import get_backend, load_data
+
+# The columns of each export, in order. Tickets, their equipment and their notes each get their
+# own flat file, joined back up by ticket_id (and ticket_number, for people reading them).
+EXPORT_COLUMNS = {
+    "customers": ["id", "code", "name", "phone", "email", "address", "is_business", "version"],
+    "tickets": ["id", "ticket_number", "customer_code", "customer_id", "date_created", "created_by", "ticket_state",
+                "date_started", "date_completed", "ticket_type", "contact_name", "contact_phone", "priority",
+                "description", "version"],
+    "equipment": ["ticket_id", "ticket_number", "position", "eq_type", "model", "serial_number", "notes"],
+    "notes": ["id", "ticket_id", "ticket_number", "technician", "date_created", "notes", "ticket_time", "mileage"],
+}
+EXPORT_FORMATS = ["csv", "jsonl"]
+
+@dataclass
+class ExportFilter:
+    """
+    Which tickets to export: created in [since, until), for one customer, in one of states.
+    Equipment and notes go with their ticket, customers are only narrowed down by customer_id.
+    """
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    customer_id: Optional[str] = None
+    states: Optional[list[str]] = None
+    include_archived: bool = False
+
+    def narrows_tickets(self) -> bool:
+        return bool(self.since or self.until or self.customer_id or self.states)
+
+    def matches(self, ticket: dict) -> bool:
+        if self.customer_id and ticket.get("customer_id") != self.customer_id:
+            return False
+        if self.states and ticket.get("ticket_state") not in self.states:
+            return False
+        if self.since or self.until:
+            created = datetime.fromisoformat(ticket["date_created"])
+            if self.since and created < self.since:
+                return False
+            if self.until and created >= self.until:
+                return False
+        return True
+
+class Exporter:
+    """
+    Streams customers, tickets, equipment and notes out of the store as flat rows. Records are
+    read one at a time (see StorageBackend.iter_records and iter_notes) and written as they
+    come, so memory doesn't grow with the amount of data; only the customer codes, technician
+    usernames and, when tickets are filtered, the matching ticket ids are held.
+    """
+    def __init__(self, export_filter: Optional[ExportFilter] = None):
+        self.filter = export_filter or ExportFilter()
+        indexes = get_indexes()
+        indexes.ensure_current()
+        self.customer_codes = {id: code for code, id in indexes.customer_codes().items()}
+        self.usernames = {tech["id"]: tech["username"] for tech in load_data("technicians")}
+        self._ticket_ids: Optional[set[str]] = None
+
+    def rows(self, kind: str) -> Iterator[dict]:
+        if kind not in EXPORT_COLUMNS:
+            raise ValueError(f"Can't export {kind}, choose from {', '.join(EXPORT_COLUMNS)}")
+        return getattr(self, f"{kind}_rows")()
+
+    def customers_rows(self) -> Iterator[dict]:
+        for customer in get_backend().iter_records("customers"):
+            if not self.filter.customer_id or customer["id"] == self.filter.customer_id:
+                yield customer
+
+    def tickets_rows(self) -> Iterator[dict]:
+        for ticket in self.iter_tickets():
+            yield {**ticket,
+                   "customer_code": self.customer_codes.get(ticket.get("customer_id"), ""),
+                   # Usernames rather than ids, so the file can be read, or imported again
+                   "created_by": self.usernames.get(ticket.get("created_by"), ticket.get("created_by"))}
+
+    def equipment_rows(self) -> Iterator[dict]:
+        for ticket in self.iter_tickets():
+            for position, equipment in enumerate(ticket.get("equipment_list") or []):
+                yield {**equipment, "ticket_id": ticket["id"], "ticket_number": ticket["ticket_number"],
+                       "position": position}
+
+    def notes_rows(self) -> Iterator[dict]:
+        ticket_ids = self._matching_ticket_ids() if self.filter.narrows_tickets() else None
+        indexes = get_indexes()
+        for ticket_id, note in get_backend().iter_notes():
+            if ticket_ids is None or ticket_id in ticket_ids:
+                yield self._note_row(ticket_id, indexes.ticket_sort_key(ticket_id)[0], note)
+        if self.filter.include_archived:
+            # Archived tickets carry their own notes
+            for ticket in get_archive().iter_tickets():
+                if self.filter.matches(ticket):
+                    for note in ticket.get("notes_list") or []:
+                        yield self._note_row(ticket["id"], ticket["ticket_number"], note)
+
+    def iter_tickets(self) -> Iterator[dict]:
+        """Tickets that pass the filter, without their notes."""
+        for ticket in get_backend().iter_records("tickets"):
+            if self.filter.matches(ticket):
+                yield ticket
+        if self.filter.include_archived:
+            for ticket in get_archive().iter_tickets():
+                if self.filter.matches(ticket):
+                    yield {key: value for key, value in ticket.items() if key != "notes_list"}
+
+    def _note_row(self, ticket_id: str, ticket_number: int, note: dict) -> dict:
+        return {**note, "ticket_id": ticket_id, "ticket_number": ticket_number,
+                "technician": self.usernames.get(note.get("technician"), note.get("technician"))}
+
+    def _matching_ticket_ids(self) -> set[str]:
+        # The notes are stored apart from their tickets, so the filter is checked against the tickets first
+        if self._ticket_ids is None:
+            self._ticket_ids = {ticket["id"] for ticket in get_backend().iter_records("tickets")
+                                if self.filter.matches(ticket)}
+        return self._ticket_ids
+
+def write_rows(rows: Iterator[dict], path: Path, columns: list[str], format: str) -> int:
+    """Write rows to path as CSV (with a header line) or JSON lines, keeping just columns. Returns how many were written."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    count = 0
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8", newline="") as f:
+        if format == "csv":
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False) + "\n")
+                count += 1
+    temp_path.replace(path) # A half-written export never takes the place of a whole one
+    return count
+
+def export_data(directory: Path, kinds: Optional[list[str]] = None, format: str = "csv",
+                export_filter: Optional[ExportFilter] = None) -> dict[str, tuple[Path, int]]:
+    """Write each kind (all of them by default) to directory/<kind>.<format>. Returns kind -> (file, rows written)."""
+    exporter = Exporter(export_filter)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = {}
+    for kind in kinds or list(EXPORT_COLUMNS):
+        path = directory / f"{kind}.{format}"
+        written[kind] = (path, write_rows(exporter.rows(kind), path, EXPORT_COLUMNS[kind], format))
+    return written
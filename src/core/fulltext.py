@@ -0,0 +1,92 @@
+import math
+import re
+from collections import Counter
+from core.instrumentation import record_io
+
+# Standard BM25 tuning: k1 controls how fast repeated words stop adding score,
+# b how much long documents are penalised
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text) -> list[str]:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+def ticket_text(ticket: dict) -> list[str]:
+    """The searchable text of a ticket: description, equipment notes and every note (if it has notes_list)."""
+    parts = [ticket.get("description", "")]
+    parts.extend(equipment.get("notes", "") for equipment in ticket.get("equipment_list", []))
+    parts.extend(note.get("notes", "") for note in ticket.get("notes_list", []))
+    return parts
+
+class FullTextIndex:
+    """
+    Inverted index from words to the documents (tickets) that use them, ranked with BM25.
+    Documents can be added, replaced, or have text appended to them (for new notes).
+    """
+    def __init__(self):
+        self.postings: dict[str, dict[str, int]] = {} # word -> {document id: times it appears}
+        self.lengths: dict[str, int] = {} # document id -> number of words
+        self.total_length = 0
+
+    def add(self, doc_id: str, parts: list[str]) -> None:
+        """Add text to a document, creating it if needed."""
+        words = Counter()
+        for part in parts:
+            words.update(tokenize(part))
+        for word, count in words.items():
+            documents = self.postings.setdefault(word, {})
+            documents[doc_id] = documents.get(doc_id, 0) + count
+        added_length = sum(words.values())
+        self.lengths[doc_id] = self.lengths.get(doc_id, 0) + added_length
+        self.total_length += added_length
+
+    def remove(self, doc_id: str, parts: list[str]) -> None:
+        """Remove a document, given the text it was indexed with."""
+        if doc_id not in self.lengths:
+            return
+        for word in set(word for part in parts for word in tokenize(part)):
+            documents = self.postings.get(word)
+            if documents is not None:
+                documents.pop(doc_id, None)
+                if not documents:
+                    del self.postings[word]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def replace(self, doc_id: str, old_parts: list[str], new_parts: list[str]) -> None:
+        """Swap some of a document's text for new text, keeping the rest (its notes, say)."""
+        if doc_id in self.lengths:
+            words = Counter()
+            for part in old_parts:
+                words.update(tokenize(part))
+            for word, count in words.items():
+                documents = self.postings.get(word)
+                if documents is None or doc_id not in documents:
+                    continue
+                documents[doc_id] -= count
+                if documents[doc_id] <= 0:
+                    del documents[doc_id]
+                    if not documents:
+                        del self.postings[word]
+            removed_length = sum(words.values())
+            self.lengths[doc_id] -= removed_length
+            self.total_length -= removed_length
+        self.add(doc_id, new_parts)
+
+    def search(self, query: str) -> list[tuple[str, float]]:
+        """Documents containing any word of the query, best BM25 score first."""
+        if not self.lengths:
+            return []
+        document_count = len(self.lengths)
+        average_length = self.total_length / document_count or 1
+        scores: dict[str, float] = {}
+        for word in set(tokenize(query)):
+            documents = self.postings.get(word)
+            if not documents:
+                continue
+            idf = math.log(1 + (document_count - len(documents) + 0.5) / (len(documents) + 0.5))
+            record_io(scanned=len(documents))
+            for doc_id, frequency in documents.items():
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[doc_id] / average_length
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+from core.constants import IMPORT_BATCH_SIZE
+from core.indexes import clean_phone, get_indexes
+from core.manager import manager_lock
+from core.models import Customer, Ticket
+from core.sequencer import get_sequencer
+from core.storage import DuplicateKey, get_backend, load_data, to_record
+
+TICKET_TYPES = ["inhouse", "onsite", "remote"]
+# Ticket fields that may be left out or blank, everything else is filled in or checked by the importer
+OPTIONAL_TICKET_FIELDS = ["date_created", "ticket_state", "date_started", "date_completed", "contact_name",
+                          "equipment_list", "notes_list"]
+
+@dataclass
+class ImportReport:
+    """How an import went. rejected has (line number, reason) for every row that was left out."""
+    collection: str
+    imported: int = 0
+    rejected: list[tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.imported + len(self.rejected)
+        return rows / self.seconds if self.seconds else 0.0
+
+class BulkImporter:
+    """
+    Adds customers or tickets from a stream of rows a batch at a time. Each batch is checked
+    against what's already stored (read once up front into sets and dicts, not looked up per
+    row) and written with one insert_many, and a batch of tickets takes its numbers in one block.
+    A row that doesn't pass is left out and reported with its line number, the rest still go in.
+    Customer codes are checked again by the write itself, so a code another session added since
+    the import started is rejected too.
+        customers: code, name, phone, email, address, is_business
+        tickets: customer_code (or customer_id), ticket_type, priority, description, created_by
+                 (a technician username), contact_name, contact_phone, and optionally
+                 date_created, ticket_state, date_started, date_completed, and in JSON lines
+                 equipment_list and notes_list
+    """
+    def __init__(self, collection: str, batch_size: int = IMPORT_BATCH_SIZE):
+        if collection not in ("customers", "tickets"):
+            raise ValueError(f"Can't import {collection}, only customers and tickets")
+        if batch_size < 1:
+            raise ValueError("The batch size has to be at least 1")
+        self.collection = collection
+        self.batch_size = batch_size
+        indexes = get_indexes()
+        indexes.ensure_current()
+        self.customer_codes = indexes.customer_codes()
+        self.customer_ids = set(self.customer_codes.values())
+        self.technician_ids = {tech["username"]: tech["id"] for tech in load_data("technicians")}
+
+    def run(self, rows: Iterable[tuple[int, Optional[dict], str]],
+            on_batch: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+        """Import (line number, row, problem reading it) rows, calling on_batch(report) after each batch is written."""
+        report = ImportReport(self.collection)
+        started = time.perf_counter()
+        batch: list[tuple[int, dict]] = [] # (line number, record)
+        for line, row, problem in rows:
+            try:
+                if problem:
+                    raise ValueError(problem)
+                batch.append((line, self._customer(row) if self.collection == "customers" else self._ticket(row))) # type: ignore[arg-type]
+            except (ValueError, TypeError, AttributeError) as e: # Bad values, or a nested model that isn't a dict
+                report.rejected.append((line, str(e)))
+                continue
+            if len(batch) >= self.batch_size:
+                self._write(batch, report, started, on_batch)
+                batch = []
+        if batch:
+            self._write(batch, report, started, on_batch)
+        report.rejected.sort() # Rows rejected when their batch was written come after the rest
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _write(self, batch: list[tuple[int, dict]], report: ImportReport, started: float,
+               on_batch: Optional[Callable[[ImportReport], None]]) -> None:
+        if self.collection == "tickets":
+            for (line, ticket), number in zip(batch, get_sequencer().reserve(len(batch))):
+                ticket["ticket_number"] = number
+        unique = "code" if self.collection == "customers" else None
+        with manager_lock: # Keeps the app's own writes from landing in the middle of a batch
+            while batch:
+                try:
+                    get_backend().insert_many(self.collection, [record for line, record in batch], unique=unique)
+                    break
+                except DuplicateKey as e:
+                    # Nothing was written, so leave out the rows with the code that's taken and go again
+                    report.rejected.extend((line, str(e)) for line, record in batch if record.get(e.field) == e.value)
+                    batch = [(line, record) for line, record in batch if record.get(e.field) != e.value]
+            # Each batch is taken in from the change feed, before a big import has it trimmed
+            get_indexes().ensure_current()
+        report.imported += len(batch)
+        report.seconds = time.perf_counter() - started
+        if on_batch:
+            on_batch(report)
+
+    def _customer(self, row: dict) -> dict:
+        code = text(row.get("code"))
+        name = text(row.get("name"))
+        phone = clean_phone(text(row.get("phone")))
+        if not code or not name or not phone:
+            raise ValueError("Customer Code, Name, and Phone are required.")
+        if code in self.customer_codes:
+            raise ValueError(f"Customer code {code} already exists.")
+        customer = Customer(code=code,
+                            name=name,
+                            phone=phone,
+                            email=text(row.get("email")),
+                            address=text(row.get("address")),
+                            is_business=flag(row.get("is_business")))
+        self.customer_codes[code] = customer.id # Later rows with the same code are duplicates too
+        return to_record(customer)
+
+    def _ticket(self, row: dict) -> dict:
+        customer_id = text(row.get("customer_id"))
+        if customer_id:
+            if customer_id not in self.customer_ids:
+                raise ValueError(f"Customer ID {customer_id} not found.")
+        else:
+            code = text(row.get("customer_code"))
+            if code not in self.customer_codes:
+                raise ValueError(f"Customer code {code} not found." if code else "A customer_code is required.")
+            customer_id = self.customer_codes[code]
+        ticket_type = text(row.get("ticket_type")).lower()
+        if ticket_type not in TICKET_TYPES:
+            raise ValueError(f"Ticket type must be one of {', '.join(TICKET_TYPES)}.")
+        try:
+            priority = int(text(row.get("priority")))
+        except ValueError:
+            priority = 0
+        if not 1 <= priority <= 5:
+            raise ValueError("Priority must be a whole number from 1 to 5.")
+        description = text(row.get("description"))
+        if not description:
+            raise ValueError("A problem description is required.")
+        username = text(row.get("created_by"))
+        created_by = self.technician_ids.get(username)
+        if created_by is None:
+            raise ValueError(f"Technician {username} not found." if username else "created_by (a technician username) is required.")
+        fields = {name: row[name] for name in OPTIONAL_TICKET_FIELDS if row.get(name) not in (None, "")}
+        # from_dict parses the dates and ticket state, raising ValueError for ones that aren't valid
+        ticket = Ticket.from_dict({**fields,
+                                   "customer_id": customer_id,
+                                   "ticket_type": ticket_type,
+                                   "priority": priority,
+                                   "description": description,
+                                   "created_by": created_by,
+                                   "contact_phone": clean_phone(text(row.get("contact_phone")))})
+        return to_record(ticket)
+
+def text(value) -> str:
+    return str(value).strip() if value is not None else ""
+
+def flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return text(value).lower() in ("1", "true", "yes", "y")
+
+def read_rows(path: Path) -> Iterator[tuple[int, Optional[dict], str]]:
+    """
+    (line number, row, problem) for each record in a .csv file (with a header line) or a
+    .jsonl file, read as they're needed. problem is empty unless the line couldn't be read.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with path.open("r", encoding="utf-8-sig", newline="") as f: # utf-8-sig drops the BOM spreadsheets add
+            reader = csv.DictReader(f)
+            line = 2
+            for row in reader:
+                yield line, row, ""
+                line = reader.line_num + 1 # A quoted value can run over several lines
+    elif suffix in (".jsonl", ".ndjson"):
+        with path.open("r", encoding="utf-8") as f:
+            for line, content in enumerate(f, start=1):
+                if not content.strip():
+                    continue
+                try:
+                    row = json.loads(content)
+                except ValueError as e:
+                    yield line, None, f"Not valid JSON: {e}"
+                    continue
+                yield line, row, "" if isinstance(row, dict) else "Each line has to be a JSON object."
+    else:
+        raise ValueError(f"Can't import {path.name}, use a .csv or .jsonl file")
+
+def import_file(path: Path, collection: str, batch_size: int = IMPORT_BATCH_SIZE,
+                on_batch: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Import customers or tickets from a CSV or JSON lines file. See BulkImporter for the columns."""
+    if not path.exists():
+        raise ValueError(f"{path} not found")
+    return BulkImporter(collection, batch_size).run(read_rows(path), on_batch)
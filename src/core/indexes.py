@@ -0,0 +1,424 @@
+import atexit
+import bisect
+import json
+import os
+import re
+import threading
+from typing import Optional
+from core.constants import INDEX_FILE
+from core.changes import get_feed
+from core.storage import get_backend, temp_path_for
+from core.fulltext import FullTextIndex, ticket_text
+from core.instrumentation import record_io
+
+def clean_phone(phone) -> str:
+    return re.sub(r'\D', '', phone or "") # Strips everything but digits
+
+class MultiIndex:
+    """Maps a value to the ids of every record that has it, in the order they were added."""
+    def __init__(self, entries: Optional[dict] = None):
+        self.entries: dict[str, list[str]] = entries or {}
+
+    def get(self, value) -> list[str]:
+        return self.entries.get(value, [])
+
+    def add(self, value, id: str) -> None:
+        if value in (None, ""):
+            return
+        ids = self.entries.setdefault(value, [])
+        if id not in ids: # Already there if a change is applied on top of data that had it
+            ids.append(id)
+
+    def remove(self, value, id: str) -> None:
+        ids = self.entries.get(value)
+        if ids and id in ids:
+            ids.remove(id)
+            if not ids:
+                del self.entries[value]
+
+class TrigramIndex:
+    """
+    Substring search over one text field. Every lowercased value is split into overlapping
+    3 character pieces (trigrams) and each trigram maps to the ids whose value contains it.
+    A query only has to check the ids that contain all of its trigrams instead of every record.
+    """
+    def __init__(self):
+        self.postings: dict[str, set[str]] = {}
+        self.values: dict[str, str] = {} # id -> lowercased value, so queries don't lowercase every record
+        self.order: dict[str, int] = {} # id -> when it was added, to return results in the usual order
+        self._next = 0
+
+    def add(self, id: str, value: str) -> None:
+        value = (value or "").lower()
+        self.values[id] = value
+        if id not in self.order:
+            self.order[id] = self._next
+            self._next += 1
+        for gram in trigrams(value):
+            self.postings.setdefault(gram, set()).add(id)
+
+    def remove(self, id: str) -> None:
+        value = self.values.pop(id, None)
+        if value is None:
+            return
+        for gram in trigrams(value):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, query: str) -> list[str]:
+        """Ids whose value contains query, ignoring case."""
+        query = query.lower()
+        grams = trigrams(query)
+        if not grams:
+            # Too short to have a trigram, check the stored values directly
+            candidates = self.values.keys()
+        else:
+            posting_sets = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*posting_sets) if posting_sets[0] else set()
+        matches = [id for id in candidates if query in self.values[id]]
+        record_io(scanned=len(candidates))
+        matches.sort(key=self.order.__getitem__)
+        return matches
+
+def trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+def customer_key(id: str, name, code) -> tuple:
+    return ((name or "").lower(), (code or "").lower(), id)
+
+class PrefixIndex:
+    """
+    (lowercased value, id) pairs kept sorted, so every value starting with a prefix sits in one
+    run that a binary search finds. Used for search-as-you-type on customer code and name.
+    """
+    def __init__(self, pairs: Optional[list[tuple[str, str]]] = None):
+        self.keys: list[tuple[str, str]] = sorted(pairs or [])
+
+    def add(self, id: str, value: str) -> None:
+        key = ((value or "").lower(), id)
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            self.keys.insert(position, key)
+
+    def remove(self, id: str, value: str) -> None:
+        key = ((value or "").lower(), id)
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def search(self, prefix: str, limit: int) -> list[str]:
+        """Up to limit ids whose value starts with prefix, ignoring case, in alphabetical order."""
+        prefix = prefix.lower()
+        position = bisect.bisect_left(self.keys, (prefix, ""))
+        ids = []
+        while position < len(self.keys) and len(ids) < limit:
+            value, id = self.keys[position]
+            if not value.startswith(prefix):
+                break
+            ids.append(id)
+            position += 1
+        return ids
+
+class SecondaryIndexes:
+    """
+    Lookup tables for the fields the managers search on, so searches don't scan every
+    customer and ticket:
+        customer code -> customer ids
+        customer name -> customer ids
+        digits-only customer phone -> customer ids
+        digits-only ticket contact phone -> ticket ids
+        ticket number -> ticket ids
+        customer id -> ticket ids
+    The tables are saved to INDEX_FILE along with the storage version and change feed sequence
+    number they were built from. Writes, from this session or any other, are applied from the
+    change feed, so the tables are only rebuilt when the feed can't account for a change (it was
+    trimmed, a whole collection was replaced, or the data changed outside of Tavern).
+    The trigram and prefix indexes for customer search, the full text index over tickets and the
+    sort keys used to page through results are only kept in memory and are built the first time
+    they are needed.
+    """
+    TEXT_FIELDS = ["code", "name", "email"]
+    PREFIX_FIELDS = ["code", "name"]
+    INDEX_NAMES = ["customers_by_code", "customers_by_name", "customers_by_phone",
+                   "tickets_by_phone", "tickets_by_number", "tickets_by_customer"]
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.stamp: Optional[dict] = None # Storage versions the tables match
+        self.seq = 0 # Last change feed entry applied to the tables
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.text_indexes: Optional[dict[str, TrigramIndex]] = None
+        self.ticket_text: Optional[FullTextIndex] = None
+        self.prefix_indexes: Optional[dict[str, PrefixIndex]] = None
+        self.customer_keys: Optional[dict[str, tuple]] = None # customer id -> (name, code, id), lowercased
+        self.ticket_keys: Optional[dict[str, tuple]] = None # ticket id -> (ticket number, id)
+        self._reset()
+
+    def ensure_current(self) -> None:
+        """Make sure the tables match what's in storage, loading or rebuilding them if not."""
+        # The shared data lock keeps other sessions from writing between the feed, the versions and
+        # the data being read, so a rebuild never holds records newer than the seq it's stamped with
+        with self._lock, get_backend().data_lock.hold(shared=True):
+            seq = get_feed().last_seq()
+            versions = self._versions()
+            if versions == self.stamp and seq == self.seq:
+                return
+            if self.stamp is None and self._load():
+                if self.stamp == versions and self.seq == seq:
+                    return
+            if self.stamp is not None and self._catch_up():
+                return
+            self.rebuild(versions, seq)
+
+    def rebuild(self, versions: Optional[dict] = None, seq: Optional[int] = None) -> None:
+        with self._lock, get_backend().data_lock.hold(shared=True):
+            seq = get_feed().last_seq() if seq is None else seq
+            versions = versions or self._versions()
+            self._reset()
+            customers = get_backend().load_all("customers")
+            for customer in customers:
+                self._add_customer(customer)
+            tickets = get_backend().load_all("tickets")
+            for ticket in tickets:
+                self._add_ticket(ticket)
+            record_io(scanned=len(customers) + len(tickets))
+            self.stamp = versions
+            self.seq = seq
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            if self.stamp is None:
+                return
+            data = {"stamp": self.stamp, "seq": self.seq}
+            for name in self.INDEX_NAMES:
+                data[name] = getattr(self, name).entries
+            temp_path = temp_path_for(self.path) # Every session saves its indexes on exit, so they mustn't share one
+            temp_path.parent.mkdir(parents=True, exist_ok=True)
+            with temp_path.open("w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+    def save_if_dirty(self) -> None:
+        if self.dirty:
+            self.save()
+
+    # Lookups, callers should run ensure_current first
+    def customer_ids_for_code(self, code: str) -> list[str]:
+        return self.customers_by_code.get(code)
+
+    def customer_ids_for_name(self, name: str) -> list[str]:
+        return self.customers_by_name.get(name)
+
+    def customer_ids_for_phone(self, phone: str) -> list[str]:
+        return self.customers_by_phone.get(clean_phone(phone))
+
+    def ticket_ids_for_phone(self, phone: str) -> list[str]:
+        return self.tickets_by_phone.get(clean_phone(phone))
+
+    def ticket_ids_for_number(self, ticket_number: int) -> list[str]:
+        return self.tickets_by_number.get(str(ticket_number)) # JSON object keys are strings
+
+    def ticket_ids_for_customer(self, customer_id: str) -> list[str]:
+        return self.tickets_by_customer.get(customer_id)
+
+    def customer_codes(self) -> dict[str, str]:
+        """Every customer code and the id of the (first) customer with it."""
+        return {code: ids[0] for code, ids in self.customers_by_code.entries.items()}
+
+    def customer_ids_containing(self, field: str, query: str) -> list[str]:
+        """Customers whose code, name or email contains query, ignoring case."""
+        with self._lock:
+            if self.text_indexes is None:
+                self.text_indexes = {field: TrigramIndex() for field in self.TEXT_FIELDS}
+                for customer in get_backend().load_all("customers"):
+                    for text_field in self.TEXT_FIELDS:
+                        self.text_indexes[text_field].add(customer["id"], customer[text_field])
+            return self.text_indexes[field].search(query)
+
+    def customer_ids_with_prefix(self, field: str, prefix: str, limit: int) -> list[str]:
+        """Customers whose code or name starts with prefix, ignoring case, alphabetically."""
+        with self._lock:
+            if self.prefix_indexes is None:
+                customers = get_backend().load_all("customers")
+                self.prefix_indexes = {
+                    field: PrefixIndex([((customer[field] or "").lower(), customer["id"]) for customer in customers])
+                    for field in self.PREFIX_FIELDS
+                }
+            return self.prefix_indexes[field].search(prefix, limit)
+
+    def ticket_ids_matching_text(self, query: str) -> list[str]:
+        """Tickets whose description, equipment notes or notes use any word of query, best match first."""
+        return [ticket_id for ticket_id, score in self.ticket_text_scores(query)]
+
+    def ticket_text_scores(self, query: str) -> list[tuple[str, float]]:
+        """(ticket id, BM25 score) for every ticket matching query, best match first."""
+        with self._lock:
+            if self.ticket_text is None:
+                self.ticket_text = FullTextIndex()
+                for ticket in get_backend().load_all("tickets"):
+                    self.ticket_text.add(ticket["id"], ticket_text(ticket))
+                # load_all leaves the notes out, they're read straight from where they're stored
+                for ticket_id, note in get_backend().iter_notes():
+                    self.ticket_text.add(ticket_id, [note.get("notes", "")])
+            return self.ticket_text.search(query)
+
+    def customer_sort_key(self, customer_id: str) -> tuple:
+        """Where a customer goes in search results: by name, then code."""
+        with self._lock:
+            if self.customer_keys is None:
+                # Built from the name and code tables, no need to read the customers
+                names = {id: name for name, ids in self.customers_by_name.entries.items() for id in ids}
+                codes = {id: code for code, ids in self.customers_by_code.entries.items() for id in ids}
+                # Either table can be missing a customer whose value is empty, so go over both
+                self.customer_keys = {id: customer_key(id, names.get(id), codes.get(id, "")) for id in names.keys() | codes.keys()}
+            return self.customer_keys.get(customer_id) or customer_key(customer_id, "", "")
+
+    def ticket_sort_key(self, ticket_id: str) -> tuple:
+        """Where a ticket goes in search results: by ticket number."""
+        with self._lock:
+            if self.ticket_keys is None:
+                self.ticket_keys = {id: (int(number), id) for number, ids in self.tickets_by_number.entries.items()
+                                    for id in ids}
+            return self.ticket_keys.get(ticket_id) or (0, ticket_id)
+
+    def _catch_up(self) -> bool:
+        """Apply the feed's changes since the tables were last current. False if they can't be trusted to add up."""
+        changes = get_feed().since(self.seq)
+        if not changes or any(change["op"] == "reset" for change in changes):
+            # No changes but a different version means something outside of Tavern wrote the data
+            return False
+        for change in changes:
+            self._apply(change)
+        self.stamp = self._versions()
+        self.seq = changes[-1]["seq"]
+        self.dirty = True
+        return True
+
+    def _apply(self, change: dict) -> None:
+        op = change["op"]
+        if change["collection"] == "customers":
+            if op in ("update", "remove"):
+                self._remove_customer(change["old"])
+            if op in ("insert", "update"):
+                self._add_customer(change["new"])
+        elif change["collection"] == "tickets":
+            if op == "insert":
+                self._add_ticket(change["new"])
+            elif op == "update":
+                self._update_ticket(change["old"], change["new"])
+            elif op == "remove":
+                self._remove_ticket(change["old"])
+            elif op == "note" and self.ticket_text is not None:
+                self.ticket_text.add(change["id"], [change["note"].get("notes", "")])
+
+    def _add_customer(self, customer: dict) -> None:
+        self.customers_by_code.add(customer["code"], customer["id"])
+        self.customers_by_name.add(customer["name"], customer["id"])
+        self.customers_by_phone.add(clean_phone(customer["phone"]), customer["id"])
+        self._add_customer_text(customer)
+        if self.customer_keys is not None:
+            self.customer_keys[customer["id"]] = customer_key(customer["id"], customer["name"], customer["code"])
+
+    def _add_customer_text(self, customer: dict) -> None:
+        if self.text_indexes is not None:
+            for field in self.TEXT_FIELDS:
+                self.text_indexes[field].add(customer["id"], customer[field])
+        if self.prefix_indexes is not None:
+            for field in self.PREFIX_FIELDS:
+                self.prefix_indexes[field].add(customer["id"], customer[field])
+
+    def _remove_customer(self, customer: dict) -> None:
+        self.customers_by_code.remove(customer["code"], customer["id"])
+        self.customers_by_name.remove(customer["name"], customer["id"])
+        self.customers_by_phone.remove(clean_phone(customer["phone"]), customer["id"])
+        if self.customer_keys is not None:
+            self.customer_keys.pop(customer["id"], None)
+        if self.text_indexes is not None:
+            for field in self.TEXT_FIELDS:
+                self.text_indexes[field].remove(customer["id"])
+        if self.prefix_indexes is not None:
+            for field in self.PREFIX_FIELDS:
+                self.prefix_indexes[field].remove(customer["id"], customer[field])
+
+    def _add_ticket(self, ticket: dict) -> None:
+        self.tickets_by_phone.add(clean_phone(ticket.get("contact_phone")), ticket["id"])
+        self.tickets_by_number.add(str(ticket["ticket_number"]), ticket["id"])
+        self.tickets_by_customer.add(ticket["customer_id"], ticket["id"])
+        if self.ticket_keys is not None:
+            self.ticket_keys[ticket["id"]] = (int(ticket["ticket_number"]), ticket["id"])
+        if self.ticket_text is not None:
+            self.ticket_text.add(ticket["id"], ticket_text(ticket))
+
+    def _remove_ticket(self, ticket: dict) -> None:
+        self._remove_ticket_fields(ticket)
+        # The feed's tickets don't carry their notes, so the words only the notes used can't be
+        # taken out. Removing tickets is rare (archiving), the full text index is rebuilt instead.
+        self.ticket_text = None
+
+    def _update_ticket(self, old: dict, new: dict) -> None:
+        self._remove_ticket_fields(old)
+        self.tickets_by_phone.add(clean_phone(new.get("contact_phone")), new["id"])
+        self.tickets_by_number.add(str(new["ticket_number"]), new["id"])
+        self.tickets_by_customer.add(new["customer_id"], new["id"])
+        if self.ticket_keys is not None:
+            self.ticket_keys[new["id"]] = (int(new["ticket_number"]), new["id"])
+        if self.ticket_text is not None:
+            self.ticket_text.replace(new["id"], ticket_text(old), ticket_text(new))
+
+    def _remove_ticket_fields(self, ticket: dict) -> None:
+        self.tickets_by_phone.remove(clean_phone(ticket.get("contact_phone")), ticket["id"])
+        self.tickets_by_number.remove(str(ticket["ticket_number"]), ticket["id"])
+        self.tickets_by_customer.remove(ticket["customer_id"], ticket["id"])
+        if self.ticket_keys is not None:
+            self.ticket_keys.pop(ticket["id"], None)
+
+    def _versions(self) -> dict:
+        return {collection: get_backend().version(collection) for collection in ("customers", "tickets")}
+
+    def _load(self) -> bool:
+        """Use the saved tables, to be caught up from the change feed if the data has moved on since."""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if not data.get("stamp") or "seq" not in data:
+            return False # Saved before the change feed, nothing to catch up from
+        for name in self.INDEX_NAMES:
+            setattr(self, name, MultiIndex(data.get(name, {})))
+        self.text_indexes = None
+        self.ticket_text = None
+        self.prefix_indexes = None
+        self.customer_keys = None
+        self.ticket_keys = None
+        self.stamp = data["stamp"]
+        self.seq = data.get("seq", 0)
+        return True
+
+    def _reset(self) -> None:
+        for name in self.INDEX_NAMES:
+            setattr(self, name, MultiIndex())
+        # Rebuilt from storage on the next search that needs them
+        self.text_indexes = None
+        self.ticket_text = None
+        self.prefix_indexes = None
+        self.customer_keys = None
+        self.ticket_keys = None
+
+_indexes: Optional[SecondaryIndexes] = None
+_indexes_lock = threading.Lock() # Worker threads may ask for the indexes at the same time
+
+def get_indexes() -> SecondaryIndexes:
+    """The process-wide secondary indexes, saved at exit if they changed."""
+    global _indexes
+    with _indexes_lock:
+        if _indexes is None:
+            _indexes = SecondaryIndexes()
+            atexit.register(_indexes.save_if_dirty)
+    return _indexes
@@ -0,0 +1,165 @@
+import inspect
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import wraps
+from typing import Optional
+from core.constants import INSTRUMENTATION
+
+# Upper bounds in milliseconds of the wall time histogram buckets, a last bucket takes anything slower
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000]
+# How many of the latest calls are kept to pick the slowest recent ones from
+RECENT_CALLS = 500
+
+@dataclass
+class OperationStats:
+    """Totals for one instrumented operation. The I/O counts include any instrumented calls it made."""
+    name: str
+    calls: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    histogram: list[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BOUNDS_MS) + 1))
+    bytes_read: int = 0
+    bytes_written: int = 0
+    records_scanned: int = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+@dataclass
+class RecentCall:
+    name: str
+    ms: float
+    finished: datetime
+    bytes_read: int
+    bytes_written: int
+    records_scanned: int
+    failed: bool
+
+class Instrumentation:
+    """
+    Call counts, wall time histograms and I/O for the instrumented operations (see instrumented
+    and timed). Storage reports bytes and records as it reads and writes them with record_io,
+    which are added to every operation running on that thread, so a slow search shows whether
+    it parsed a file or scanned a lot of records.
+    """
+    def __init__(self):
+        self.operations: dict[str, OperationStats] = {}
+        self.recent: deque[RecentCall] = deque(maxlen=RECENT_CALLS)
+        self.started = datetime.now()
+        self._running = threading.local() # The counters of the operations running on each thread, outermost first
+        self._lock = threading.Lock()
+
+    def begin(self) -> list[int]:
+        counters = [0, 0, 0] # bytes read, bytes written, records scanned
+        stack = getattr(self._running, "stack", None)
+        if stack is None:
+            stack = self._running.stack = []
+        stack.append(counters)
+        return counters
+
+    def end(self, name: str, started: float, counters: list[int], failed: bool) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        stack = getattr(self._running, "stack", [])
+        for index in range(len(stack) - 1, -1, -1): # By identity, another frame's counters may be equal
+            if stack[index] is counters:
+                del stack[index]
+                break
+        bucket = next((index for index, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound), len(HISTOGRAM_BOUNDS_MS))
+        with self._lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            stats.histogram[bucket] += 1
+            stats.bytes_read += counters[0]
+            stats.bytes_written += counters[1]
+            stats.records_scanned += counters[2]
+            self.recent.append(RecentCall(name, ms, datetime.now(), *counters, failed))
+
+    def add_io(self, read: int, written: int, scanned: int) -> None:
+        for counters in getattr(self._running, "stack", ()):
+            counters[0] += read
+            counters[1] += written
+            counters[2] += scanned
+
+    def snapshot(self) -> list[OperationStats]:
+        """A copy of every operation's totals, most total time first."""
+        with self._lock:
+            copies = [OperationStats(**{**vars(stats), "histogram": list(stats.histogram)})
+                      for stats in self.operations.values()]
+        return sorted(copies, key=lambda stats: stats.total_ms, reverse=True)
+
+    def slowest(self, limit: int = 20) -> list[RecentCall]:
+        """The slowest of the last RECENT_CALLS calls, slowest first."""
+        with self._lock:
+            recent = list(self.recent)
+        return sorted(recent, key=lambda call: call.ms, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations.clear()
+            self.recent.clear()
+            self.started = datetime.now()
+
+stats = Instrumentation()
+
+def instrumented(cls):
+    """Class decorator: every public method of cls is timed as ClassName.method. Does nothing unless INSTRUMENTATION is on."""
+    if not INSTRUMENTATION:
+        return cls
+    for name, method in list(vars(cls).items()):
+        if callable(method) and not name.startswith("_"):
+            setattr(cls, name, _timed(f"{cls.__name__}.{name}", method))
+    return cls
+
+def timed(name: Optional[str] = None):
+    """Function decorator: time calls to the function under name (its own name by default), if INSTRUMENTATION is on."""
+    def decorate(function):
+        if not INSTRUMENTATION:
+            return function
+        return _timed(name or function.__name__, function)
+    return decorate
+
+def record_io(read: int = 0, written: int = 0, scanned: int = 0) -> None:
+    """Count bytes read, bytes written and records scanned against the operations running on this thread."""
+    if INSTRUMENTATION:
+        stats.add_io(read, written, scanned)
+
+def _timed(name: str, function):
+    if inspect.isgeneratorfunction(function):
+        # Time the whole iteration, creating the generator doesn't do anything yet
+        @wraps(function)
+        def timed_generator(*args, **kwargs):
+            counters = stats.begin()
+            started = time.perf_counter()
+            failed = True
+            try:
+                yield from function(*args, **kwargs)
+                failed = False
+            except GeneratorExit:
+                failed = False # Closed early by the caller, not an error
+                raise
+            finally:
+                stats.end(name, started, counters, failed)
+        return timed_generator
+
+    @wraps(function)
+    def timed_call(*args, **kwargs):
+        counters = stats.begin()
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            stats.end(name, started, counters, failed)
+    return timed_call
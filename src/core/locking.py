@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError: # Windows has no fcntl, there the locks do nothing and only one process should use the data
+    fcntl = None # type: ignore[assignment]
+
+@contextmanager
+def file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    Hold an advisory lock on path for the with block, creating the file if needed.
+    Shared locks can be held by any number of holders at once, an exclusive lock waits for
+    everyone else. Every open gets its own lock, so threads in one process exclude each other too.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def lock_path(path: Path) -> Path:
+    """The lock file that goes with a data file. Data files get replaced by renames, so they can't hold the lock themselves."""
+    return path.with_name(path.name + ".lock")
+
+class DataLock:
+    """
+    A shared/exclusive lock on a lock file that can be taken again by the thread holding it,
+    so a write that reads along the way doesn't wait on itself. Other processes' readers share
+    it with ours and writers wait for everyone; threads in this process take turns.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._file: Optional[IO[bytes]] = None # Kept open, so taking the lock is just a flock call
+        self._depth = 0
+        self._exclusive = False
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def hold(self, shared: bool = False) -> Iterator[None]:
+        with self._lock:
+            upgraded = False
+            if self._depth == 0:
+                self._flock(shared)
+                self._exclusive = not shared
+            elif not shared and not self._exclusive:
+                # A read that turns into a write. flock swaps the lock over rather than upgrading
+                # it in place, so another writer may get in first; writers re-read under the lock anyway.
+                self._flock(False)
+                self._exclusive = upgraded = True
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if upgraded:
+                    self._flock(True)
+                    self._exclusive = False
+                if self._depth == 0:
+                    self._unlock()
+
+    def _flock(self, shared: bool) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def _unlock(self) -> None:
+        if self._file is not None and fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
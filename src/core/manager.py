@@ -1,12 +1,36 @@
-from core.models import Ticket, Customer, TicketNote, Technician, Equipment
+from core.models import Ticket, TicketSummary, Customer, TicketNote, Technician, Equipment
 from typing import Optional
-from dataclasses import asdict
-from core.storage import load_data, save_data
-from core.constants import COUNTER_FILE
-from core.utils import hydrate_ticket
+from core.storage import load_data, get_backend, to_record
+from core.sequencer import get_sequencer
+from core.utils import hydrate_ticket, summarize_ticket, SUMMARY_FIELDS
+from core.indexes import get_indexes, clean_phone
+from core.archive import get_archive
+from core.paging import PAGE_SIZE, page
+from core.instrumentation import instrumented
 from enum import Enum
+from functools import wraps
+import threading
 import re
 
+# Screens run manager calls on worker threads. Each call holds this lock, so a check followed
+# by a write (like the username check before adding a technician) can't interleave with
+# another thread's write.
+manager_lock = threading.RLock()
+
+def synchronized(cls):
+    """Class decorator: every public method of cls runs while holding manager_lock."""
+    for name, method in list(vars(cls).items()):
+        if callable(method) and not name.startswith("_"):
+            setattr(cls, name, _hold_manager_lock(method))
+    return cls
+
+def _hold_manager_lock(method):
+    @wraps(method)
+    def locked(*args, **kwargs):
+        with manager_lock:
+            return method(*args, **kwargs)
+    return locked
+
 class TicketSystemManager:
     def __init__(self):        
         # Create individual managers
@@ -20,7 +44,10 @@ class SearchType(Enum):
     PHONE = "phone"
     EMAIL = "email"
     TICKET_NUMBER = "ticket_number"
+    TEXT = "text" # Full text over ticket descriptions and notes
 
+@synchronized
+@instrumented # Inside the lock, so waiting for another thread's call isn't counted as this one's time
 class CustomerManager:    
     def create_customer(self, 
                         code: str, 
@@ -29,10 +56,6 @@ class CustomerManager:
                         email: str, 
                         address: str, 
                         is_business: bool):
-        customer_dicts = load_data("customers")
-
-        self.check_unique_code(code)
-            
         cleaned_phone = re.sub(r'\D', '', phone) # Strips everything but digits
 
         customer = Customer(code=code,
@@ -42,9 +65,10 @@ class CustomerManager:
                             address=address,
                             is_business=is_business)
         
-        customer_dicts.append(asdict(customer))
-
-        save_data("customers", customer_dicts)
+        customer_dict = to_record(customer)
+        # Checked by the backend in the same write, so another session can't take the code in between
+        get_backend().insert("customers", customer_dict, unique="code")
+        get_indexes().ensure_current() # Picks our customer up from the change feed
     
     def update_customer(self,
                         id: str, 
@@ -53,84 +77,125 @@ class CustomerManager:
                         phone: str, 
                         email: str, 
                         address: str, 
-                        is_business: bool):
-        customer_dicts = load_data("customers")
-
+                        is_business: bool,
+                        version: Optional[int] = None):
+        """Save changes to a customer. Pass the version it was loaded with to fail instead of overwriting newer changes. Returns the new version."""
         if not code or not name or not phone:
             raise ValueError("Customer Code, Name, and Phone are required.")
 
-        for customer_dict in customer_dicts:
-            if customer_dict["id"] == id:
-                self.check_unique_code(code, id)
-                cleaned_phone = re.sub(r'\D', '', phone) # Strips everything but digits
-                customer_dict["code"] = code
-                customer_dict["name"] = name
-                customer_dict["phone"] = cleaned_phone
-                customer_dict["email"] = email
-                customer_dict["address"] = address
-                customer_dict["is_business"] = is_business
-                save_data("customers", customer_dicts)
-                return  # Exit early after successful update
-    
-        # If we get here, the ID wasn't found
-        # Should not be possible with proper UI, just here in case
-        raise ValueError(f"Customer with ID {id} not found")
-    
-    def check_unique_code(self, code, id: Optional[str] = ""):
-        customer_dicts = load_data("customers")
+        get_indexes().ensure_current()
+        # Should not be possible to miss with proper UI, just here in case
+        if get_backend().get("customers", id) is None:
+            raise ValueError(f"Customer with ID {id} not found")
 
-        for customer_dict in customer_dicts:
-            if customer_dict["code"] == code and customer_dict["id"] != id:
-                raise ValueError(f"Customer code {code} already exists.")
+        cleaned_phone = re.sub(r'\D', '', phone) # Strips everything but digits
+        get_backend().update("customers", id, {"code": code,
+                                               "name": name,
+                                               "phone": cleaned_phone,
+                                               "email": email,
+                                               "address": address,
+                                               "is_business": is_business}, expected_version=version, unique="code")
+        get_indexes().ensure_current()
+        return get_backend().get_fields("customers", [id], ["version"])[0]["version"]
     
     def search_customers(self, query_data, search_type: SearchType):
-        customer_dicts = load_data("customers")
-        results = []
-        field_name = search_type.value
-
-        for customer_dict in customer_dicts:
-            field_value = customer_dict[field_name]
-
-            if search_type == SearchType.PHONE:
-                cleaned_query = re.sub(r'\D', '', query_data) # Strips everything but digits
-                cleaned_field = re.sub(r'\D', '', field_value) # Just in case it managed to get saved with symbols or something
-                if cleaned_field == cleaned_query:
-                    results.append(Customer(**customer_dict))
-            else:
-                if query_data.lower() in field_value.lower():
-                    results.append(Customer(**customer_dict))
-        
-        return results
+        return list(self.iter_customers(query_data, search_type))
+
+    def iter_customers(self, query_data, search_type: SearchType):
+        """Matching customers sorted by name then code, each one only loaded when it's reached."""
+        for key in self._sorted_keys(query_data, search_type):
+            customer = self.find_by_id(key[-1])
+            if customer:
+                yield customer
+
+    def search_customers_page(self, query_data, search_type: SearchType,
+                              limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> tuple[list[Customer], Optional[str]]:
+        """
+        One page of search_customers results, plus the cursor to pass in for the next page
+        (None once there are no more). Only the customers on the page are loaded.
+        """
+        keys, next_cursor = page(self._sorted_keys(query_data, search_type), limit, cursor)
+        customers = [self.find_by_id(key[-1]) for key in keys]
+        return [customer for customer in customers if customer], next_cursor
+
+    def count_customers(self, query_data, search_type: SearchType) -> int:
+        """How many customers search_customers would return, without loading any of them."""
+        return len(self._matching_ids(query_data, search_type))
+
+    def _matching_ids(self, query_data, search_type: SearchType) -> list[str]:
+        indexes = get_indexes()
+        indexes.ensure_current()
+        if search_type == SearchType.PHONE:
+            return indexes.customer_ids_for_phone(query_data)
+        return indexes.customer_ids_containing(search_type.value, query_data)
+
+    def _sorted_keys(self, query_data, search_type: SearchType) -> list[tuple]:
+        indexes = get_indexes()
+        return sorted(indexes.customer_sort_key(customer_id)
+                      for customer_id in self._matching_ids(query_data, search_type))
     
+    def prefix_search(self, query_data, search_type: SearchType, limit: int = 50):
+        """
+        Search-as-you-type: customers whose code or name starts with the query, alphabetically.
+        Other search types fall back to search_customers.
+        """
+        if search_type not in (SearchType.CODE, SearchType.NAME):
+            return self.search_customers_page(query_data, search_type, limit)[0]
+        indexes = get_indexes()
+        indexes.ensure_current()
+        customer_ids = indexes.customer_ids_with_prefix(search_type.value, query_data, limit)
+        return [self.find_by_id(customer_id) for customer_id in customer_ids]
+
     def find_by_id(self, id: str):
-        customer_dicts = load_data("customers")
-        for customer_dict in customer_dicts:
-            if customer_dict["id"] == id:
-                return Customer(**customer_dict)
+        customer_dict = get_backend().get("customers", id)
+        if customer_dict:
+            return Customer.from_dict(customer_dict)
     
     def get_customer_id(self, code: str):
-        customer_dicts = load_data("customers")
-        for customer_dict in customer_dicts:
-            if customer_dict["code"] == code:
-                return customer_dict["id"]
+        indexes = get_indexes()
+        indexes.ensure_current()
+        for customer_id in indexes.customer_ids_for_code(code):
+            return customer_id
     
     def get_customer_code(self, id: str):
-        customer_dicts = load_data("customers")
-        for customer_dict in customer_dicts:
-            if customer_dict["id"] == id:
-                return customer_dict["code"]
+        customer_dict = get_backend().get("customers", id)
+        if customer_dict:
+            return customer_dict["code"]
 
     
-    def get_customer_tickets(self, customer_id: str):
-        ticket_dicts = load_data("tickets")
-        customer_tickets = []
-
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["customer_id"] == customer_id:
-                customer_tickets.append(hydrate_ticket(ticket_dict))
-
-        return customer_tickets
-
+    def get_customer_tickets(self, customer_id: str, full: bool = False):
+        """Summaries of a customer's tickets, or whole tickets with full=True."""
+        indexes = get_indexes()
+        indexes.ensure_current()
+        ticket_ids = indexes.ticket_ids_for_customer(customer_id)
+        return load_tickets(ticket_ids) if full else load_summaries(ticket_ids)
+
+def load_tickets(ticket_ids) -> list[Ticket]:
+    """Hydrate tickets by id, skipping any that no longer exist."""
+    tickets = []
+    for ticket_id in ticket_ids:
+        ticket_dict = get_backend().get("tickets", ticket_id)
+        if ticket_dict:
+            tickets.append(hydrate_ticket(ticket_dict))
+    return tickets
+
+def load_summaries(ticket_ids) -> list[TicketSummary]:
+    """Summaries of tickets by id, skipping any that no longer exist. Equipment and notes are never read."""
+    return summarize_tickets(get_backend().get_fields("tickets", ticket_ids, SUMMARY_FIELDS))
+
+def load_archived(ticket_ids, full: bool) -> list:
+    """Archived tickets by id as summaries, or whole tickets with full=True, skipping any not in the archive."""
+    archive = get_archive()
+    ticket_dicts = [ticket_dict for ticket_dict in (archive.get(ticket_id) for ticket_id in ticket_ids) if ticket_dict]
+    return [hydrate_ticket(ticket_dict) for ticket_dict in ticket_dicts] if full else summarize_tickets(ticket_dicts)
+
+def summarize_tickets(ticket_dicts: list[dict]) -> list[TicketSummary]:
+    customer_ids = list(dict.fromkeys(ticket_dict["customer_id"] for ticket_dict in ticket_dicts))
+    codes = {customer["id"]: customer["code"] for customer in get_backend().get_fields("customers", customer_ids, ["code"])}
+    return [summarize_ticket(ticket_dict, codes.get(ticket_dict["customer_id"], "")) for ticket_dict in ticket_dicts]
+
+@synchronized
+@instrumented
 class TicketManager:        
     def create_ticket(self, 
                       customer_id: str, 
@@ -141,25 +206,17 @@ class TicketManager:
                       created_by: str, 
                       contact_name: Optional[str] = "", 
                       contact_phone: Optional[str] = ""):
-        customer_dicts = load_data("customers")
-        valid_id = False
-        for customer_dict in customer_dicts:
-            if customer_dict["id"] == customer_id:
-                valid_id = True
-                break
-        if not valid_id:
+        get_indexes().ensure_current()
+        if get_backend().get("customers", customer_id) is None:
             raise ValueError("Customer ID not found.")
-        ticket_dicts = load_data("tickets")
         ticket_number = self.get_next_ticket_number()
         prio_int = int(priority)
         cleaned_phone = ""
 
         tech_id = ""
-        tech_dicts = load_data("technicians")
-        for tech_dict in tech_dicts:
-            if tech_dict["username"] == created_by:
-                tech_id = tech_dict["id"]
-                break
+        for tech_dict in get_backend().find("technicians", "username", created_by):
+            tech_id = tech_dict["id"]
+            break
         if not tech_id:
             raise ValueError("Technician ID not found.")
         
@@ -176,9 +233,9 @@ class TicketManager:
                         contact_name=contact_name,
                         contact_phone=cleaned_phone)
         
-        ticket_dicts.append(asdict(ticket))
-
-        save_data("tickets", ticket_dicts)
+        ticket_dict = to_record(ticket)
+        get_backend().insert("tickets", ticket_dict)
+        get_indexes().ensure_current() # Picks our ticket up from the change feed
         return ticket_number
     
     def update_ticket(self,
@@ -189,119 +246,166 @@ class TicketManager:
                       description: str, 
                       equipment_list: list,
                       contact_name: Optional[str] = "", 
-                      contact_phone: Optional[str] = ""):
-        ticket_dicts = load_data("tickets")
+                      contact_phone: Optional[str] = "",
+                      version: Optional[int] = None):
+        """Save changes to a ticket. Pass the version it was loaded with to fail instead of overwriting newer changes. Returns the new version."""
         prio_int = int(priority)
         cleaned_phone = ""
         if contact_phone:
             cleaned_phone = re.sub(r'\D', '', contact_phone) # Strips everything but digits
         
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["id"] == id:
-                ticket_dict["customer_id"] = customer_id
-                ticket_dict["ticket_type"] = ticket_type
-                ticket_dict["priority"] = prio_int
-                ticket_dict["description"] = description
-                ticket_dict["equipment_list"] = equipment_list
-                ticket_dict["contact_name"] = contact_name
-                ticket_dict["contact_phone"] = cleaned_phone
-                save_data("tickets", ticket_dicts)
-                return  # Exit early after successful update
-    
-        # If we get here, the ID wasn't found
-        # Should not be possible with proper UI, just here in case
-        raise ValueError(f"Ticket with ID {id} not found")
+        get_indexes().ensure_current()
+        updated = get_backend().update("tickets", id, {"customer_id": customer_id,
+                                                       "ticket_type": ticket_type,
+                                                       "priority": prio_int,
+                                                       "description": description,
+                                                       "equipment_list": [eq.to_dict() for eq in equipment_list],
+                                                       "contact_name": contact_name,
+                                                       "contact_phone": cleaned_phone}, expected_version=version)
+        # Should not be possible to miss with proper UI, just here in case
+        if not updated:
+            self._check_not_archived(id)
+            raise ValueError(f"Ticket with ID {id} not found")
+        get_indexes().ensure_current()
+        return get_backend().get_fields("tickets", [id], ["version"])[0]["version"]
+
+    def search_tickets(self, query_data, search_type: SearchType, full: bool = False, include_archived: bool = False):
+        """
+        Every matching ticket as a TicketSummary, or as a whole Ticket with full=True.
+        Archived tickets are only searched with include_archived=True, except by ticket number.
+        """
+        return list(self.iter_tickets(query_data, search_type, full, include_archived))
+
+    def iter_tickets(self, query_data, search_type: SearchType, full: bool = False, include_archived: bool = False):
+        """
+        Matching tickets in ticket number order (best match first for full text),
+        loaded a page at a time as the caller gets to them.
+        """
+        ticket_ids = [key[-1] for key in self._sorted_keys(query_data, search_type, include_archived)]
+        for start in range(0, len(ticket_ids), PAGE_SIZE):
+            yield from self._load(ticket_ids[start:start + PAGE_SIZE], full)
+
+    def search_tickets_page(self, query_data, search_type: SearchType, limit: int = PAGE_SIZE,
+                            cursor: Optional[str] = None, full: bool = False,
+                            include_archived: bool = False) -> tuple[list, Optional[str]]:
+        """
+        One page of search_tickets results, plus the cursor to pass in for the next page
+        (None once there are no more). Only the tickets on the page are loaded.
+        """
+        keys, next_cursor = page(self._sorted_keys(query_data, search_type, include_archived), limit, cursor)
+        return self._load([key[-1] for key in keys], full), next_cursor
+
+    def count_tickets(self, query_data, search_type: SearchType, include_archived: bool = False) -> int:
+        """How many tickets search_tickets would return, without loading any of them."""
+        return len(self._matching_ids(query_data, search_type, include_archived))
 
-    def search_tickets(self, query_data, search_type: SearchType):
-        if not query_data:
-            return []
-        results = []
-        if search_type == SearchType.PHONE:
-            results = self.search_by_phone(query_data)
-        elif search_type == SearchType.CODE:
-            results = self.search_by_code(query_data)
-        elif search_type == SearchType.NAME:
-            results = self.search_by_name(query_data)
-        elif search_type == SearchType.TICKET_NUMBER:
-            results = self.search_by_ticket_number(query_data)
-        return results
-    
     def search_by_phone(self, phone_number):
-        ticket_dicts = load_data("tickets")
-        customer_dicts = load_data("customers")
-        cleaned_query = re.sub(r'\D', '', phone_number) # Strips everything but digits
-        results = []
-        customer_ids = [] # customers that have this phone number
-
-        for customer_dict in customer_dicts:
-            field_value = customer_dict["phone"]
-            cleaned_field = re.sub(r'\D', '', field_value) # Just in case it managed to get saved with symbols or something
-            if cleaned_query and cleaned_field == cleaned_query: # Only match if query isn't empty
-                customer_ids.append(customer_dict["id"])
-
-        for ticket_dict in ticket_dicts:
-            field_value = ticket_dict["contact_phone"]
-            cleaned_field = re.sub(r'\D', '', field_value) # Just in case it managed to get saved with symbols or something
-            if cleaned_field == cleaned_query or ticket_dict["customer_id"] in customer_ids:
-                results.append(hydrate_ticket(ticket_dict))
-        return results
+        return self.search_tickets(phone_number, SearchType.PHONE)
     
     def search_by_code(self, customer_code):
-        ticket_dicts = load_data("tickets")
-        customer_dicts = load_data("customers")
-        customer_id = ""
-        results = []
-
-        for customer_dict in customer_dicts:
-            if customer_dict["code"] == customer_code:
-                customer_id = customer_dict["id"]
-                break
-        else:
-            return []
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["customer_id"] == customer_id:
-                results.append(hydrate_ticket(ticket_dict))
-        return results
+        return self.search_tickets(customer_code, SearchType.CODE)
     
     def search_by_name(self, customer_name):
-        ticket_dicts = load_data("tickets")
-        customer_dicts = load_data("customers")
-        customer_ids = []
-        results = []
-
-        for customer_dict in customer_dicts:
-            if customer_dict["name"] == customer_name:
-                customer_ids.append(customer_dict["id"])
-        
-        if not customer_ids:
-            return []
-        
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["customer_id"] in customer_ids:
-                results.append(hydrate_ticket(ticket_dict))
-        return results
+        return self.search_tickets(customer_name, SearchType.NAME)
     
     def search_by_ticket_number(self, ticket_number):
-        ticket_dicts = load_data("tickets")
-
-        # Convert to int if it's a string
-        try:
-            ticket_num = int(ticket_number)
-        except (ValueError, TypeError):
+        return self.search_tickets(ticket_number, SearchType.TICKET_NUMBER) # Finds archived tickets too
+    
+    def search_by_text(self, text):
+        return self.search_tickets(text, SearchType.TEXT) # Best match first
+
+    def _load(self, ticket_ids: list[str], full: bool) -> list:
+        tickets = load_tickets(ticket_ids) if full else load_summaries(ticket_ids)
+        if len(tickets) == len(ticket_ids):
+            return tickets
+        # The rest were archived (or removed since the search), keep the order of ticket_ids
+        found = {ticket.id: ticket for ticket in tickets}
+        missing = [ticket_id for ticket_id in ticket_ids if ticket_id not in found]
+        for ticket in load_archived(missing, full):
+            found[ticket.id] = ticket
+        return [found[ticket_id] for ticket_id in ticket_ids if ticket_id in found]
+
+    def _matching_ids(self, query_data, search_type: SearchType, include_archived: bool = False) -> list[str]:
+        """Ids of the tickets a search matches, without duplicates, in no particular order."""
+        if not query_data:
             return []
-        
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["ticket_number"] == ticket_num:
-                return [hydrate_ticket(ticket_dict)]
+        indexes = get_indexes()
+        indexes.ensure_current()
+        ticket_ids = []
+        if search_type == SearchType.PHONE:
+            ticket_ids.extend(indexes.ticket_ids_for_phone(query_data))
+            for customer_id in indexes.customer_ids_for_phone(query_data): # customers that have this phone number
+                ticket_ids.extend(indexes.ticket_ids_for_customer(customer_id))
+        elif search_type == SearchType.CODE:
+            for customer_id in indexes.customer_ids_for_code(query_data)[:1]:
+                ticket_ids.extend(indexes.ticket_ids_for_customer(customer_id))
+        elif search_type == SearchType.NAME:
+            for customer_id in indexes.customer_ids_for_name(query_data):
+                ticket_ids.extend(indexes.ticket_ids_for_customer(customer_id))
+        elif search_type == SearchType.TICKET_NUMBER:
+            # Convert to int if it's a string
+            try:
+                ticket_num = int(query_data)
+            except (ValueError, TypeError):
+                return []
+            ticket_ids.extend(indexes.ticket_ids_for_number(ticket_num)[:1])
+            archived_id = get_archive().id_for_number(ticket_num) # One dict lookup, so always checked
+            if not ticket_ids and archived_id:
+                ticket_ids.append(archived_id)
+        elif search_type == SearchType.TEXT:
+            ticket_ids.extend(indexes.ticket_ids_matching_text(query_data))
+        if include_archived and search_type != SearchType.TICKET_NUMBER:
+            ticket_ids.extend(self._archived_ids(query_data, search_type))
+        return list(dict.fromkeys(ticket_ids)) # dict.fromkeys drops duplicates but keeps the order
+
+    def _archived_ids(self, query_data, search_type: SearchType) -> list[str]:
+        """The same matching as _matching_ids over the archive, which reads the shards the first time."""
+        archive = get_archive()
+        if search_type == SearchType.TEXT:
+            return [ticket_id for ticket_id, score in archive.text_scores(query_data)]
+        indexes = get_indexes()
+        phone = ""
+        if search_type == SearchType.PHONE:
+            phone = clean_phone(query_data)
+            customer_ids = set(indexes.customer_ids_for_phone(query_data))
+        elif search_type == SearchType.CODE:
+            customer_ids = set(indexes.customer_ids_for_code(query_data)[:1])
+        elif search_type == SearchType.NAME:
+            customer_ids = set(indexes.customer_ids_for_name(query_data))
         else:
             return []
+        return [ticket["id"] for ticket in archive.iter_tickets()
+                if ticket["customer_id"] in customer_ids or (phone and clean_phone(ticket.get("contact_phone")) == phone)]
+
+    def _sorted_keys(self, query_data, search_type: SearchType, include_archived: bool = False) -> list[tuple]:
+        indexes = get_indexes()
+        archived = {}
+        if include_archived or search_type == SearchType.TICKET_NUMBER:
+            archived = get_archive().ticket_numbers()
+
+        def sort_key(ticket_id: str) -> tuple:
+            # Archived tickets sort by number the same as the others
+            if ticket_id in archived:
+                return (archived[ticket_id][0], ticket_id)
+            return indexes.ticket_sort_key(ticket_id)
+
+        if search_type == SearchType.TEXT and query_data:
+            indexes.ensure_current()
+            scores = indexes.ticket_text_scores(query_data)
+            if include_archived:
+                scores = scores + get_archive().text_scores(query_data)
+            # Best match first, equal scores in ticket number order
+            return sorted((-score, *sort_key(ticket_id)) for ticket_id, score in scores)
+        return sorted(sort_key(ticket_id) for ticket_id in self._matching_ids(query_data, search_type, include_archived))
+
+    def _check_not_archived(self, ticket_id: str) -> None:
+        if get_archive().contains(ticket_id):
+            raise ValueError("This ticket is archived and can't be changed.")
     
     def search_by_id(self, id):
-        ticket_dicts = load_data("tickets")
-
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["id"] == id:
-                return hydrate_ticket(ticket_dict)
+        ticket_dict = get_backend().get("tickets", id) or get_archive().get(id)
+        if ticket_dict:
+            return hydrate_ticket(ticket_dict)
 
 
     
@@ -311,7 +415,6 @@ class TicketManager:
                        notes: str, 
                        ticket_time: str, 
                        mileage: str):
-        ticket_dicts = load_data("tickets")
         try:
             hours = float(ticket_time)
             miles = int(mileage)
@@ -323,42 +426,26 @@ class TicketManager:
                                  ticket_time=hours,
                                  mileage=miles)
         
-        ticket = {}
-
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["id"] == ticket_id:
-                ticket = ticket_dict
-                break
-
-        if not ticket:
+        get_indexes().ensure_current()
+        note_dict = to_record(ticket_note)
+        if not get_backend().append_note(ticket_id, note_dict):
+            self._check_not_archived(ticket_id)
             raise ValueError(f"Ticket with ID {ticket_id} not found")
-        
-        ticket["notes_list"].append(asdict(ticket_note))
-
-        save_data("tickets", ticket_dicts)
+        get_indexes().ensure_current()
 
     def get_next_ticket_number(self):
-        try:
-            with open(COUNTER_FILE, 'r') as f:
-                current_max = int(f.read().strip())
-        except (FileNotFoundError, ValueError):
-            # Fallback or initialize to 0
-            current_max = 0
-        
-        next_number = current_max + 1
-        
-        with open(COUNTER_FILE, 'w') as f:
-            f.write(str(next_number))
-        
-        return next_number
+        return get_sequencer().next_number()
     
     def get_ticket_notes(self, id):
-        ticket_dicts = load_data("tickets")
-
-        for ticket_dict in ticket_dicts:
-            if ticket_dict["id"] == id:
-                return ticket_dict["notes_list"]
-
+        notes = get_backend().get_notes(id)
+        if notes is None:
+            archived = get_archive().get(id)
+            if archived:
+                return archived["notes_list"]
+        return notes
+
+@synchronized
+@instrumented
 class TechnicianManager:
     def create_technician(self, 
                           name: str, 
@@ -379,48 +466,37 @@ class TechnicianManager:
                                 username=username,
                                 email=email)
         
-        tech_dicts.append(asdict(technician))
-
-        save_data("technicians", tech_dicts)
-    
-    def update_technician(self, id: str, name: str, username: str, email: str, is_active: bool):
-        tech_dicts = load_data("technicians")
-        
-        for tech_dict in tech_dicts:
-            if tech_dict["id"] == id:
-                tech_dict["name"] = name
-                tech_dict["username"] = username
-                tech_dict["email"] = email
-                tech_dict["is_active"] = is_active
-                save_data("technicians", tech_dicts)
-                return  # Exit early after successful update
+        get_backend().insert("technicians", to_record(technician))
     
-        # If we get here, the ID wasn't found
-        # Should not be possible with proper UI, just here in case
-        raise ValueError(f"Technician with ID {id} not found")
+    def update_technician(self, id: str, name: str, username: str, email: str, is_active: bool,
+                          version: Optional[int] = None):
+        """Save changes to a technician. Pass the version it was loaded with to fail instead of overwriting newer changes. Returns the new version."""
+        updated = get_backend().update("technicians", id, {"name": name,
+                                                           "username": username,
+                                                           "email": email,
+                                                           "is_active": is_active}, expected_version=version)
+        # Should not be possible to miss with proper UI, just here in case
+        if not updated:
+            raise ValueError(f"Technician with ID {id} not found")
+        return get_backend().get("technicians", id)["version"] # type: ignore[index]
 
     def login(self, username):
         # Handle technician sessions
-        tech_dicts = load_data("technicians")
-        for tech_dict in tech_dicts:
-            if tech_dict["username"] == username:
-                return Technician(**tech_dict) # Convert the dict to a Technician object
+        for tech_dict in get_backend().find("technicians", "username", username):
+            return Technician.from_dict(tech_dict) # Convert the dict to a Technician object
 
     def list_technicians(self):
         tech_dicts = load_data("technicians")
         tech_objects = []
         for tech_dict in tech_dicts:
-            tech_objects.append(Technician(**tech_dict))
+            tech_objects.append(Technician.from_dict(tech_dict))
         return tech_objects
     
     def find_by_id(self, id: str):
-        tech_dicts = load_data("technicians")
-        for tech_dict in tech_dicts:
-            if tech_dict["id"] == id:
-                return Technician(**tech_dict)
+        tech_dict = get_backend().get("technicians", id)
+        if tech_dict:
+            return Technician.from_dict(tech_dict)
     
     def get_technician_id(self, username: str):
-        tech_dicts = load_data("technicians")
-        for tech_dict in tech_dicts:
-            if tech_dict["username"] == username:
-                return tech_dict["id"]
\ No newline at end of file
+        for tech_dict in get_backend().find("technicians", "username", username):
+            return tech_dict["id"]
\ No newline at end of file
@@ -0,0 +1,386 @@
+import json
+import marshal
+import mmap
+import os
+import threading
+from contextlib import nullcontext
+from array import array
+from pathlib import Path
+from typing import Iterator, Optional
+from core.changes import record_changes
+from core.constants import JOURNAL_COMPACT_BYTES
+from core.instrumentation import record_io
+from core.locking import DataLock
+from core.storage import BINARY_MAGIC, MARSHAL_VERSION, file_signature, load_records, paused_gc, temp_path_for
+
+# Bumped if the layout of the .idx file changes, so old ones get rebuilt
+INDEX_VERSION = 1
+# Ticket numbers past this many slots beyond the ticket count go in the overflow map instead of the table
+SPARE_SLOTS = 10000
+
+class MappedTickets:
+    """
+    Tickets kept one JSON line each in the tickets file, read through mmap. A table indexed by
+    ticket number holds each line's offset and length (saved next to the file as tickets.idx),
+    so opening one ticket decodes just that line instead of parsing the whole file.
+
+    Changes are appended to the same journal CollectionJournal uses, and the changed records are
+    kept in memory on top of the file (the overlay) until compact writes a new file. It has the
+    same methods as CollectionJournal, so JsonBackend can use either for the tickets.
+    """
+    key_fields = ["id", "ticket_number"]
+
+    def __init__(self, snapshot_path: Path, journal_path: Path, index_path: Path,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES, data_lock: Optional[DataLock] = None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.index_path = index_path
+        self.compact_bytes = compact_bytes
+        self.data_lock = data_lock # Held by compact_in_background's thread, other callers already hold it
+        # The file's lines, by ticket number: offsets[n] and lengths[n], -1 where there's no ticket n
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self.ids: dict[str, int] = {} # ticket id -> ticket number, for tickets in the file
+        self.overflow: dict[str, tuple[int, int]] = {} # ticket id -> (offset, length) for numbers that don't fit the table
+        self.overlay: dict[str, Optional[dict]] = {} # ticket id -> record changed since the file was written, None if deleted
+        self.overlay_numbers: dict[int, str] = {}
+        self.records: Optional[list[dict]] = None # Every record, only built if load() is called
+        self._positions: dict[str, int] = {} # ticket id -> position in records
+        self._mm: Optional[mmap.mmap] = None
+        self._snapshot_signature: Optional[tuple] = None
+        self._journal_offset = 0
+        self._loaded = False
+        self._compacting = False
+        self._lock = threading.RLock()
+
+    def load(self) -> list[dict]:
+        """Every ticket. This parses the whole file the first time, so lookups should use get."""
+        with self._lock:
+            self._refresh()
+            if self.records is None:
+                self._build_records()
+            return self.records # type: ignore[return-value]
+
+    def iter_records(self) -> Iterator[dict]:
+        """Every ticket, decoded one line at a time, so exporting them doesn't hold them all in memory."""
+        with self._lock:
+            self._refresh()
+            # Our own map of the file as it is now, which stays readable if it's replaced while we go
+            overlay = dict(self.overlay)
+            with self.snapshot_path.open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else None
+        seen = set()
+        if mm is not None:
+            with mm:
+                for line in iter(mm.readline, b""):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["id"] in overlay:
+                        seen.add(record["id"])
+                        record = overlay[record["id"]]
+                    if record is not None:
+                        yield record
+        for id, record in overlay.items():
+            if id not in seen and record is not None:
+                yield record # Added since the file was written
+
+    def get(self, id: str) -> Optional[dict]:
+        return self.lookup("id", id)
+
+    def lookup(self, field: str, value) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            if field == "id":
+                return self._current(value)
+            if field == "ticket_number":
+                number = int(value)
+                if number in self.overlay_numbers:
+                    return self.overlay.get(self.overlay_numbers[number])
+                record = self._read_number(number)
+                if record is not None and record["id"] in self.overlay:
+                    return None # Changed to another number or deleted since the file was written
+                return record
+            raise ValueError(f"Can't look up tickets by {field}")
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: list[dict]) -> None:
+        """Append several entries with one write."""
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        with self._lock:
+            self._refresh() # Pick up anything another process added first
+            with self.journal_path.open("a", encoding="utf-8") as f:
+                f.write(lines)
+            record_io(written=len(lines))
+            self._refresh() # Applies our own line, in order with any others
+            journal_size = self._journal_offset
+        if journal_size >= self.compact_bytes:
+            self.compact_in_background()
+
+    def replace_all(self, records: list[dict]) -> None:
+        """Write a whole new file and start an empty journal."""
+        with self._lock:
+            self._write(records)
+            self.journal_path.write_text("", encoding="utf-8")
+            self._journal_offset = 0
+            self._loaded = True
+
+    def compact(self) -> int:
+        """
+        Write the overlay into a new file. Returns the number of journal bytes folded in.
+        Only safe with the data lock held exclusively, like CollectionJournal.compact.
+        """
+        with self._lock:
+            self._refresh()
+            folded_offset = self._journal_offset
+            if folded_offset == 0:
+                return 0
+            records = list(self.load())
+            with self.journal_path.open("rb") as f:
+                f.seek(folded_offset)
+                tail = f.read()
+            self._write(records)
+            temp_journal = temp_path_for(self.journal_path)
+            temp_journal.write_bytes(tail) # Lines another process added since our last read
+            os.replace(temp_journal, self.journal_path)
+            self._journal_offset = 0
+            self._refresh()
+            record_changes([{"collection": "tickets", "op": "compact"}])
+        return folded_offset
+
+    def compact_in_background(self) -> None:
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                with self.data_lock.hold() if self.data_lock else nullcontext():
+                    self.compact()
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, name=f"compact-{self.snapshot_path.stem}", daemon=True).start()
+
+    def journal_size(self) -> int:
+        signature = file_signature(self.journal_path)
+        return signature[1] if signature else 0
+
+    def _refresh(self) -> None:
+        snapshot_signature = file_signature(self.snapshot_path)
+        journal_size = self.journal_size()
+        if (not self._loaded
+                or snapshot_signature != self._snapshot_signature
+                or journal_size < self._journal_offset):
+            # First read, or someone else compacted or rewrote the file: start over from it
+            self._open()
+            self._journal_offset = 0
+            self._loaded = True
+        if journal_size > self._journal_offset:
+            self._replay_from(self._journal_offset)
+
+    def _open(self) -> None:
+        self.overlay = {}
+        self.overlay_numbers = {}
+        self.records = None
+        if not self.snapshot_path.exists():
+            self._write([])
+            return
+        with self.snapshot_path.open("rb") as f:
+            head = f.read(64)
+        if head.startswith(BINARY_MAGIC) or head.lstrip()[:1] == b"[":
+            # Written by the json backend in another format, turn it into JSON lines once
+            self._write(load_records(self.snapshot_path))
+            return
+        self._map()
+        if not self._load_index():
+            self._scan()
+
+    def _map(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        with self.snapshot_path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._snapshot_signature = file_signature(self.snapshot_path)
+
+    def _write(self, records: list[dict]) -> None:
+        """Write records as the new file, building its table as the lines are laid out."""
+        temp_path = temp_path_for(self.snapshot_path)
+        entries = []
+        offset = 0
+        with temp_path.open("wb") as f:
+            for record in records:
+                line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                entries.append((record["id"], int(record["ticket_number"]), offset, len(line)))
+                offset += len(line)
+        record_io(written=offset, scanned=len(entries))
+        os.replace(temp_path, self.snapshot_path)
+        self.overlay = {}
+        self.overlay_numbers = {}
+        self.records = None
+        self._map()
+        self._set_table(entries)
+        self._save_index()
+
+    def _scan(self) -> None:
+        """Build the table by reading every line, for a file written by something else."""
+        entries = []
+        if self._mm is not None:
+            offset = 0
+            with paused_gc():
+                for line in iter(self._mm.readline, b""):
+                    if line.strip():
+                        record = json.loads(line)
+                        entries.append((record["id"], int(record["ticket_number"]), offset, len(line)))
+                    offset += len(line)
+            self._mm.seek(0)
+            record_io(read=offset, scanned=len(entries))
+        self._set_table(entries)
+        self._save_index()
+
+    def _set_table(self, entries: list[tuple[str, int, int, int]]) -> None:
+        size = 0
+        for id, number, offset, length in entries:
+            if 0 <= number < len(entries) + SPARE_SLOTS:
+                size = max(size, number + 1)
+        self.offsets = array("q", [-1]) * size
+        self.lengths = array("q", [-1]) * size
+        self.ids = {}
+        self.overflow = {}
+        for id, number, offset, length in entries:
+            if number < size and number >= 0 and self.offsets[number] == -1:
+                self.offsets[number] = offset
+                self.lengths[number] = length
+                self.ids[id] = number
+            else:
+                # Duplicate or far out ticket numbers still need to be found by id
+                self.overflow[id] = (offset, length)
+
+    def _save_index(self) -> None:
+        data = (INDEX_VERSION, self._snapshot_signature, self.offsets.tobytes(), self.lengths.tobytes(),
+                self.ids, self.overflow)
+        temp_path = temp_path_for(self.index_path)
+        temp_path.write_bytes(marshal.dumps(data, MARSHAL_VERSION))
+        os.replace(temp_path, self.index_path)
+
+    def _load_index(self) -> bool:
+        """Use the saved table if it was built from the file as it is now."""
+        try:
+            data = marshal.loads(self.index_path.read_bytes())
+        except (FileNotFoundError, ValueError, EOFError, TypeError):
+            return False
+        if not isinstance(data, tuple) or len(data) != 6 or data[0] != INDEX_VERSION:
+            return False
+        if data[1] != self._snapshot_signature:
+            return False
+        self.offsets = array("q")
+        self.offsets.frombytes(data[2])
+        self.lengths = array("q")
+        self.lengths.frombytes(data[3])
+        self.ids = data[4]
+        self.overflow = data[5]
+        return True
+
+    def _current(self, id: str) -> Optional[dict]:
+        if id in self.overlay:
+            return self.overlay[id]
+        return self._read_base(id)
+
+    def _read_base(self, id: str) -> Optional[dict]:
+        number = self.ids.get(id)
+        if number is not None:
+            return self._decode(self.offsets[number], self.lengths[number])
+        if id in self.overflow:
+            return self._decode(*self.overflow[id])
+        return None
+
+    def _read_number(self, number: int) -> Optional[dict]:
+        if 0 <= number < len(self.offsets) and self.offsets[number] != -1:
+            return self._decode(self.offsets[number], self.lengths[number])
+        for id, (offset, length) in self.overflow.items():
+            record = self._decode(offset, length)
+            if record is not None and record["ticket_number"] == number:
+                return record
+        return None
+
+    def _decode(self, offset: int, length: int) -> Optional[dict]:
+        if self._mm is None:
+            return None
+        record_io(read=length, scanned=1)
+        return json.loads(self._mm[offset:offset + length])
+
+    def _replay_from(self, offset: int) -> None:
+        with self.journal_path.open("rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1 # A line still being written by another process waits for the next read
+        lines = [line for line in data[:end].splitlines() if line.strip()]
+        for line in lines:
+            self._apply(json.loads(line))
+        record_io(read=len(data), scanned=len(lines))
+        self._journal_offset = offset + end
+
+    def _apply(self, entry: dict) -> None:
+        op = entry["op"]
+        if op == "delete":
+            for id in entry["ids"]:
+                if self._current(id) is not None:
+                    self._put(id, None)
+            return
+        id = entry["id"]
+        current = self._current(id)
+        if op == "upsert":
+            self._put(id, entry["record"])
+        elif op == "patch" and current is not None:
+            self._put(id, {**current, **entry["fields"]})
+        elif op == "append" and current is not None:
+            # Journals from before notes had their own store
+            items = current.get(entry["field"]) or []
+            value = entry["value"]
+            if isinstance(value, dict) and "id" in value and any(item.get("id") == value["id"] for item in items):
+                return # Already applied
+            self._put(id, {**current, entry["field"]: [*items, value]})
+
+    def _put(self, id: str, record: Optional[dict]) -> None:
+        old = self.overlay.get(id)
+        if old is not None and self.overlay_numbers.get(old["ticket_number"]) == id:
+            del self.overlay_numbers[old["ticket_number"]]
+        self.overlay[id] = record
+        if record is not None:
+            self.overlay_numbers[record["ticket_number"]] = id
+        if self.records is None:
+            return
+        # Keep the full list in step once someone has asked for it
+        if record is None:
+            if id in self._positions:
+                self.records = [item for item in self.records if item["id"] != id]
+                self._positions = {item["id"]: position for position, item in enumerate(self.records)}
+        elif id in self._positions:
+            self.records[self._positions[id]] = record
+        else:
+            self._positions[id] = len(self.records)
+            self.records.append(record)
+
+    def _build_records(self) -> None:
+        records = []
+        seen = set()
+        if self._mm is not None:
+            # Changed records stay where they are in the file, like the journal store and iter_records keep them
+            for record in load_records(self.snapshot_path):
+                id = record["id"]
+                if id in self.overlay:
+                    seen.add(id)
+                    record = self.overlay[id]
+                if record is not None:
+                    records.append(record)
+        # Added records go at the end, in the order they were added
+        records.extend(record for id, record in self.overlay.items() if id not in seen and record is not None)
+        self.records = records
+        self._positions = {record["id"]: position for position, record in enumerate(records)}
@@ -3,6 +3,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Optional
 import uuid
+from core.codecs import add_codec
 
 class TicketState(Enum):
     OPEN = "open"
@@ -11,7 +12,8 @@ class TicketState(Enum):
     WAITING_FOR_CUSTOMER = "waiting for customer"
     CLOSED = "closed"
 
-@dataclass
+@add_codec
+@dataclass(slots=True)
 class Customer:
     # Internal ID (UUID, never shown to humans)
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -27,14 +29,19 @@ class Customer:
     # True if business, False if individual
     is_business: bool = False
 
-@dataclass
+    # Goes up by one on every update, so saving over someone else's changes can be caught
+    version: int = 0
+
+@add_codec
+@dataclass(slots=True)
 class Equipment:
     eq_type: str = ""
     model: str = ""
     serial_number: str = ""
     notes: str = ""
 
-@dataclass
+@add_codec
+@dataclass(slots=True)
 class TicketNote:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     technician: str = ""
@@ -43,7 +50,8 @@ class TicketNote:
     ticket_time: float = 0 # amount of time spent on work
     mileage: int = 0 # for onsite mileage reimbursement
 
-@dataclass
+@add_codec
+@dataclass(slots=True)
 class Ticket:
     # Internal ID (UUID)
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -72,7 +80,61 @@ class Ticket:
     equipment_list: List[Equipment] = field(default_factory=list)
     notes_list: List[TicketNote] = field(default_factory=list)
 
-@dataclass
+    version: int = 0 # Goes up by one on every update
+
+class LazyTicket(Ticket):
+    """
+    A Ticket loaded from storage. The equipment and notes stay as the stored dicts until
+    equipment_list or notes_list is first used, so loading a ticket with hundreds of notes
+    doesn't build hundreds of TicketNote objects nobody looks at.
+    """
+    __slots__ = ("_equipment_dicts", "_note_dicts", "_equipment_list", "_notes_list")
+
+    def __init__(self, ticket_dict: dict):
+        fields = dict(ticket_dict)
+        equipment_dicts = fields.pop("equipment_list", [])
+        note_dicts = fields.pop("notes_list", [])
+        super().__init__(**Ticket.decode_fields(fields))
+        self._equipment_dicts = equipment_dicts
+        self._note_dicts = note_dicts
+        self._equipment_list = None
+        self._notes_list = None
+
+    @property
+    def equipment_list(self) -> List[Equipment]: # type: ignore[override]
+        if self._equipment_list is None:
+            self._equipment_list = [Equipment.from_dict(eq) for eq in self._equipment_dicts]
+        return self._equipment_list
+
+    @equipment_list.setter
+    def equipment_list(self, value: List[Equipment]) -> None:
+        self._equipment_list = value
+
+    @property
+    def notes_list(self) -> List[TicketNote]: # type: ignore[override]
+        if self._notes_list is None:
+            self._notes_list = [TicketNote.from_dict(note) for note in self._note_dicts]
+        return self._notes_list
+
+    @notes_list.setter
+    def notes_list(self, value: List[TicketNote]) -> None:
+        self._notes_list = value
+
+@add_codec
+@dataclass(slots=True)
+class TicketSummary:
+    """The few ticket fields search results show, without the equipment and notes."""
+    id: str = ""
+    ticket_number: int = 0
+    customer_id: str = ""
+    customer_code: str = ""
+    ticket_state: TicketState = TicketState.OPEN
+    ticket_type: str = ""
+    priority: int = 0
+    description: str = ""
+
+@add_codec
+@dataclass(slots=True)
 class Technician:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
@@ -81,3 +143,5 @@ class Technician:
     email: str = ""
 
     is_active: bool = True
+
+    version: int = 0 # Goes up by one on every update
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterator, Optional
+from core.instrumentation import record_io
+
+class NotesStore:
+    """
+    Append-only file of ticket notes, one line per note: the ticket id, a tab, then the note as JSON.
+    Adding a note appends one line, however many notes there already are. An index of line offsets
+    per ticket is built by scanning the file once, then kept up to date by scanning only the lines
+    added since, so reading a ticket's notes only reads that ticket's lines.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.offsets: dict[str, array] = {} # ticket id -> offsets of its lines, oldest first
+        self._scanned = 0 # Everything before this offset is in offsets
+        self._inode: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def append(self, ticket_id: str, note: dict) -> None:
+        self.extend([(ticket_id, note)])
+
+    def extend(self, notes: list[tuple[str, dict]]) -> None:
+        """Append (ticket id, note) pairs in one write."""
+        data = "".join(note_line(ticket_id, note) for ticket_id, note in notes).encode("utf-8")
+        with self._lock:
+            self._refresh() # Pick up anything another process added first
+            with self.path.open("ab") as f:
+                f.write(data)
+            record_io(written=len(data))
+            self._refresh() # Indexes our own lines, in order with any others
+
+    def get(self, ticket_id: str) -> list[dict]:
+        """A ticket's notes, oldest first."""
+        with self._lock:
+            self._refresh()
+            offsets = self.offsets.get(ticket_id)
+            if not offsets:
+                return []
+            notes = []
+            read = 0
+            with self.path.open("rb") as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    line = f.readline()
+                    read += len(line)
+                    notes.append(parse_line(line)[1])
+            record_io(read=read, scanned=len(notes))
+            return notes
+
+    def count(self, ticket_id: str) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.offsets.get(ticket_id, ()))
+
+    def ticket_ids(self) -> list[str]:
+        """Tickets that have at least one note."""
+        with self._lock:
+            self._refresh()
+            return list(self.offsets)
+
+    def scan(self) -> Iterator[tuple[str, dict]]:
+        """Every (ticket id, note) in the order they were added, read front to back."""
+        with self._lock:
+            self._refresh()
+            end = self._scanned
+        if not end:
+            return
+        position = 0
+        scanned = 0
+        try:
+            with self.path.open("rb") as f:
+                for line in f: # A line at a time, so scanning millions of notes doesn't read them all in at once
+                    position += len(line)
+                    if position > end:
+                        break # Added since the refresh, maybe only partly written
+                    if line.strip():
+                        scanned += 1
+                        yield parse_line(line)
+        finally:
+            record_io(read=min(position, end), scanned=scanned)
+
+    def rewrite(self, notes: list[tuple[str, dict]]) -> None:
+        """Replace the whole file with these (ticket id, note) pairs."""
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            f.write("".join(note_line(ticket_id, note) for ticket_id, note in notes))
+        with self._lock:
+            os.replace(temp_path, self.path)
+            self._refresh()
+
+    def size(self) -> int:
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _refresh(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.offsets = {}
+            self._scanned = 0
+            self._inode = None
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._scanned:
+            # First read, or the file was rewritten: index it again from the start
+            self.offsets = {}
+            self._scanned = 0
+            self._inode = stat.st_ino
+        if stat.st_size > self._scanned:
+            self._scan_from(self._scanned)
+
+    def _scan_from(self, start: int) -> None:
+        with self.path.open("rb") as f:
+            f.seek(start)
+            data = f.read()
+        record_io(read=len(data))
+        end = data.rfind(b"\n") + 1 # A line still being written by another process waits for the next read
+        position = start
+        for line in data[:end].splitlines(keepends=True):
+            tab = line.find(b"\t")
+            if tab > 0:
+                # Only the ticket id is read here, the note itself is parsed when it's asked for
+                ticket_id = line[:tab].decode("utf-8")
+                offsets = self.offsets.get(ticket_id)
+                if offsets is None:
+                    offsets = self.offsets[ticket_id] = array("q")
+                offsets.append(position)
+            position += len(line)
+        self._scanned = start + end
+
+def note_line(ticket_id: str, note: dict) -> str:
+    # json.dumps escapes tabs and newlines inside the note, so they can't break up the line
+    return f"{ticket_id}\t{json.dumps(note, separators=(',', ':'), ensure_ascii=False)}\n"
+
+def parse_line(line: bytes) -> tuple[str, dict]:
+    ticket_id, _, note = line.partition(b"\t")
+    return ticket_id.decode("utf-8"), json.loads(note)
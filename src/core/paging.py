@@ -0,0 +1,38 @@
+import base64
+import bisect
+import json
+from typing import Optional
+
+# How many results a search page holds unless the caller asks for a different limit
+PAGE_SIZE = 50
+
+def encode_cursor(key: tuple) -> str:
+    """Turn the sort key of the last result on a page into an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid search cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid search cursor")
+    return tuple(key)
+
+def page(keys: list[tuple], limit: int, cursor: Optional[str] = None) -> tuple[list[tuple], Optional[str]]:
+    """
+    One page of sorted sort keys: up to limit keys that come after cursor.
+    Also returns the cursor for the next page, or None if this is the last page.
+    The cursor remembers the last key rather than a position, so records added or removed
+    between pages don't make the next page skip or repeat results.
+    """
+    if limit < 1:
+        raise ValueError("Page limit must be at least 1")
+    start = 0
+    if cursor:
+        start = bisect.bisect_right(keys, decode_cursor(cursor))
+    page_keys = keys[start:start + limit]
+    next_cursor = None
+    if start + limit < len(keys):
+        next_cursor = encode_cursor(page_keys[-1])
+    return page_keys, next_cursor
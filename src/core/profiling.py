@@ -0,0 +1,100 @@
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from core.constants import PROFILES_DIR, PROFILE_TOP_FUNCTIONS
+
+class ProfileCapture:
+    """
+    Context manager that profiles what runs inside it and then writes the profile out. path is
+    set once it's written, even if the code inside raised. If another profile is already
+    running (only one can be at a time) nothing is captured and path stays None.
+    """
+    def __init__(self, profiler: "ActionProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.path: Optional[Path] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    def __enter__(self) -> "ProfileCapture":
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError: # Another profiler is active
+            return self
+        self._profile = profile
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._profile is None:
+            return
+        self._profile.disable()
+        seconds = time.perf_counter() - self._started
+        self.path = self.profiler.write(self._profile, self.name, seconds, failed=exc_info[0] is not None)
+        self._profile = None
+
+class ActionProfiler:
+    """
+    Profiles the next action once armed, so a slow search or save can be captured where it
+    happens and handed over. Each capture is written to directory as <time>-<action>.prof,
+    for pstats or snakeviz, plus <time>-<action>.txt with the top functions by cumulative time.
+    Since Python 3.12 a profile sees every thread, so a capture of a worker thread's call
+    also shows what the UI was doing meanwhile.
+    """
+    def __init__(self, directory: Path = PROFILES_DIR, top: int = PROFILE_TOP_FUNCTIONS):
+        self.directory = directory
+        self.top = top
+        self.armed = False
+        self._lock = threading.Lock()
+
+    def arm(self) -> None:
+        with self._lock:
+            self.armed = True
+
+    def disarm(self) -> None:
+        with self._lock:
+            self.armed = False
+
+    def take(self) -> bool:
+        """True for the first caller after arm(), which should then profile its action."""
+        with self._lock:
+            armed = self.armed
+            self.armed = False
+            return armed
+
+    def capture(self, name: str) -> ProfileCapture:
+        return ProfileCapture(self, name)
+
+    def write(self, profile: cProfile.Profile, name: str, seconds: float, failed: bool = False) -> Path:
+        """Write profile as a .prof and a .txt summary. Returns the .prof path."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        started = datetime.now()
+        # Milliseconds too, so two captures of the same action in one second don't overwrite each other
+        stem = f"{started:%Y%m%d-%H%M%S}-{started.microsecond // 1000:03d}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}"
+        path = self.directory / f"{stem}.prof"
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        summary.write(f"{name} at {started:%Y-%m-%d %H:%M:%S}, {seconds * 1000:.1f} ms{' (raised an error)' if failed else ''}\n")
+        summary.write(f"Top {self.top} functions by cumulative time. Open {path.name} with pstats or snakeviz for the rest.\n")
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        path.with_suffix(".txt").write_text(summary.getvalue(), encoding="utf-8")
+        return path
+
+_profiler: Optional[ActionProfiler] = None
+_profiler_lock = threading.Lock()
+
+def get_profiler() -> ActionProfiler:
+    """The process-wide action profiler."""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = ActionProfiler()
+    return _profiler
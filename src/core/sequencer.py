@@ -0,0 +1,85 @@
+import atexit
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from core.constants import COUNTER_FILE, TICKET_BLOCK_SIZE
+from core.locking import file_lock, lock_path
+
+class TicketSequencer:
+    """
+    Hands out ticket numbers from the counter file (maxticket.txt, the last number reserved).
+    Numbers are reserved block_size at a time while holding an exclusive lock, so processes
+    creating tickets at the same time never get the same number, and most tickets don't touch
+    the file at all. Unused numbers are given back by release() if nobody reserved after us,
+    otherwise they're skipped.
+    """
+    def __init__(self, path: Path = COUNTER_FILE, block_size: int = TICKET_BLOCK_SIZE):
+        if block_size < 1:
+            raise ValueError("Ticket number blocks need at least one number")
+        self.path = path
+        self.block_size = block_size
+        self._next = 0 # The next number to hand out, 0 when there's no block
+        self._end = 0 # The last number in our block
+        self._lock = threading.Lock()
+
+    def next_number(self) -> int:
+        with self._lock:
+            if self._next == 0 or self._next > self._end:
+                self._next, self._end = self._reserve(self.block_size)
+            number = self._next
+            self._next += 1
+            return number
+
+    def reserve(self, count: int) -> range:
+        """A run of count numbers in a row, e.g. for a bulk import. They're the caller's to use."""
+        if count < 1:
+            return range(0)
+        with self._lock:
+            start, end = self._reserve(count)
+            return range(start, end + 1)
+
+    def release(self) -> None:
+        """Give back what's left of our block, if no one has reserved numbers since."""
+        with self._lock:
+            if self._next == 0 or self._next > self._end:
+                return
+            with file_lock(lock_path(self.path)):
+                if read_counter(self.path) == self._end:
+                    write_counter(self.path, self._next - 1)
+            self._next = self._end = 0
+
+    def _reserve(self, count: int) -> tuple[int, int]:
+        with file_lock(lock_path(self.path)):
+            start = read_counter(self.path) + 1
+            end = start + count - 1
+            write_counter(self.path, end)
+        return start, end
+
+def read_counter(path: Path) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def write_counter(path: Path, value: int) -> None:
+    # Written to a temp file and renamed over the old one, so a crash can't leave a half-written number
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(str(value))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+_sequencer: Optional[TicketSequencer] = None
+_sequencer_lock = threading.Lock() # Worker threads may ask for the sequencer at the same time
+
+def get_sequencer() -> TicketSequencer:
+    """The process-wide ticket sequencer. Its unused numbers are released when the process exits."""
+    global _sequencer
+    with _sequencer_lock:
+        if _sequencer is None:
+            _sequencer = TicketSequencer()
+            atexit.register(_sequencer.release)
+    return _sequencer
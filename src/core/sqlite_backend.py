@@ -0,0 +1,442 @@
+import sqlite3
+import threading
+from typing import Iterator, Optional
+from core.changes import record_changes
+from core.constants import DATA_DIR, DATA_LOCK_FILE, SQLITE_FILE
+from core.instrumentation import record_io
+from core.locking import DataLock
+from core.storage import DuplicateKey, StorageBackend, VersionConflict, check_version, plain_value, writes
+
+# Columns stored for each collection. Tickets keep equipment and notes in child tables.
+COLUMNS = {
+    "customers": ["id", "code", "name", "phone", "email", "address", "is_business", "version"],
+    "technicians": ["id", "name", "username", "email", "is_active", "version"],
+    "tickets": ["id", "ticket_number", "date_created", "created_by", "ticket_state",
+                "date_started", "date_completed", "ticket_type", "customer_id",
+                "contact_name", "contact_phone", "priority", "description", "version"],
+}
+EQUIPMENT_COLUMNS = ["eq_type", "model", "serial_number", "notes"]
+NOTE_COLUMNS = ["id", "technician", "date_created", "notes", "ticket_time", "mileage"]
+
+# SQLite has no boolean type, these get converted back from 0/1 on the way out
+BOOL_FIELDS = {"is_business", "is_active"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    name TEXT,
+    phone TEXT,
+    email TEXT,
+    address TEXT,
+    is_business INTEGER,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_customers_code ON customers(code);
+
+CREATE TABLE IF NOT EXISTS technicians (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    username TEXT,
+    email TEXT,
+    is_active INTEGER,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_technicians_username ON technicians(username);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id TEXT PRIMARY KEY,
+    ticket_number INTEGER,
+    date_created TEXT,
+    created_by TEXT,
+    ticket_state TEXT,
+    date_started TEXT,
+    date_completed TEXT,
+    ticket_type TEXT,
+    customer_id TEXT,
+    contact_name TEXT,
+    contact_phone TEXT,
+    priority INTEGER,
+    description TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_number ON tickets(ticket_number);
+CREATE INDEX IF NOT EXISTS idx_tickets_customer ON tickets(customer_id);
+
+CREATE TABLE IF NOT EXISTS equipment (
+    ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    eq_type TEXT,
+    model TEXT,
+    serial_number TEXT,
+    notes TEXT,
+    PRIMARY KEY (ticket_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS ticket_notes (
+    id TEXT PRIMARY KEY,
+    ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    technician TEXT,
+    date_created TEXT,
+    notes TEXT,
+    ticket_time REAL,
+    mileage INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_ticket_notes_ticket ON ticket_notes(ticket_id, position);
+
+-- Bumped by every write so other code can tell when a collection changed
+CREATE TABLE IF NOT EXISTS collection_versions (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+class SqliteBackend(StorageBackend):
+    """
+    Stores every collection in one SQLite database so reads and writes only touch the rows involved.
+    Writes also hold the data directory lock exclusively, so their changes go into the change feed
+    after the commit but still in commit order with other sessions' writes.
+    """
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.data_lock = DataLock(DATA_LOCK_FILE)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock() # One connection is shared, so only one thread uses it at a time
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            DATA_DIR.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, skips an fsync per commit
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._add_version_columns()
+        return self._conn
+
+    def initialize(self) -> None:
+        with self._lock:
+            self.conn # Opening the connection creates the schema
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def count(self, collection: str) -> int:
+        self._check_collection(collection)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {collection}").fetchone()[0]
+
+    def load_all(self, collection: str) -> list[dict]:
+        self._check_collection(collection)
+        with self._lock:
+            rows = self.conn.execute(f"SELECT * FROM {collection}").fetchall()
+            record_io(scanned=len(rows)) # SQLite doesn't say how many bytes it read, so just the rows
+            records = [self._row_to_record(row) for row in rows]
+            if collection == "tickets":
+                self._attach_children(records, whole_table=True, notes=False)
+            return records
+
+    def iter_records(self, collection: str) -> Iterator[dict]:
+        self._check_collection(collection)
+        last_id = ""
+        while True:
+            # A page at a time, picking up after the last id, so memory stays flat however many rows there are
+            with self._lock:
+                rows = self.conn.execute(f"SELECT * FROM {collection} WHERE id > ? ORDER BY id LIMIT 500",
+                                         (last_id,)).fetchall()
+                records = [self._row_to_record(row) for row in rows]
+                if collection == "tickets":
+                    self._attach_children(records, notes=False)
+            if not records:
+                return
+            yield from records
+            last_id = records[-1]["id"]
+
+    @writes
+    def save_all(self, collection: str, records: list[dict]) -> None:
+        self._check_collection(collection)
+        with self._lock:
+            with self.conn:
+                if collection == "tickets":
+                    # Deleting the tickets deletes their notes too, so keep them for tickets saved without a notes_list
+                    kept: dict[str, list] = {}
+                    for ticket_id, note in self.iter_notes():
+                        kept.setdefault(ticket_id, []).append(note)
+                    records = [record if "notes_list" in record else {**record, "notes_list": kept.get(record["id"], [])}
+                               for record in records]
+                self.conn.execute(f"DELETE FROM {collection}")
+                for record in records:
+                    self._insert_row(collection, record)
+                self._bump_version(collection)
+            record_changes([{"collection": collection, "op": "reset"}])
+
+    def get(self, collection: str, id: str) -> Optional[dict]:
+        records = self._select(collection, "id", id)
+        return records[0] if records else None
+
+    def find(self, collection: str, field: str, value) -> list[dict]:
+        return self._select(collection, field, value)
+
+    def get_fields(self, collection: str, ids, fields: list[str]) -> list[dict]:
+        self._check_collection(collection)
+        for field in fields:
+            if field not in COLUMNS[collection]:
+                raise ValueError(f"Unknown field {field} for {collection}")
+        ids = list(ids)
+        columns = ", ".join(dict.fromkeys(["id", *fields]))
+        by_id = {}
+        with self._lock:
+            for start in range(0, len(ids), 500): # Stay well under SQLite's bound parameter limit
+                chunk = ids[start:start + 500]
+                rows = self.conn.execute(f"SELECT {columns} FROM {collection} "
+                                         f"WHERE id IN ({', '.join('?' for _ in chunk)})", chunk).fetchall()
+                record_io(scanned=len(rows))
+                for row in rows:
+                    by_id[row["id"]] = self._row_to_record(row)
+        return [by_id[id] for id in ids if id in by_id]
+
+    def insert(self, collection: str, record: dict, unique: Optional[str] = None) -> None:
+        self.insert_many(collection, [record], unique)
+
+    @writes
+    def insert_many(self, collection: str, records: list[dict], unique: Optional[str] = None) -> None:
+        self._check_collection(collection)
+        if not records:
+            return
+        with self._lock:
+            with self.conn: # One transaction, so one commit for the lot
+                changes, notes = [], []
+                for record in records:
+                    if unique: # Checked row by row, so it sees the batch's earlier rows too
+                        self._check_unique(collection, unique, record.get(unique), record["id"])
+                    self._insert_row(collection, record)
+                    record = plain_value(record)
+                    notes.extend({"collection": "tickets", "op": "note", "id": record["id"], "note": note}
+                                 for note in record.pop("notes_list", None) or [])
+                    changes.append({"collection": collection, "op": "insert", "id": record["id"], "new": {"version": 0, **record}})
+                self._bump_version(collection)
+            # Recorded once committed, the data lock keeps the feed in commit order
+            record_changes(changes + notes)
+
+    @writes
+    def update(self, collection: str, id: str, fields: dict, expected_version: Optional[int] = None,
+               unique: Optional[str] = None) -> bool:
+        self._check_collection(collection)
+        fields = plain_value(fields)
+        columns = [column for column in fields if column in COLUMNS[collection] and column not in ("id", "version")]
+        with self._lock:
+            with self.conn:
+                if unique and unique in fields:
+                    self._check_unique(collection, unique, fields[unique], id)
+                found = self._select(collection, "id", id)
+                if not found:
+                    return False
+                old = found[0]
+                old.pop("notes_list", None)
+                row = {"version": old.get("version", 0)}
+                check_version(collection, row, expected_version)
+                assignments = ", ".join([*(f"{column} = ?" for column in columns), "version = version + 1"])
+                values = [self._to_column(fields[column]) for column in columns]
+                # Matching the version too means another process saving since the SELECT is caught here
+                changed = self.conn.execute(f"UPDATE {collection} SET {assignments} WHERE id = ? AND version = ?",
+                                            (*values, id, row["version"])).rowcount
+                if not changed:
+                    raise VersionConflict(f"This {collection.rstrip('s')} was changed by someone else while it was being saved. "
+                                          "Open it again to see their changes, then make yours.")
+                if collection == "tickets":
+                    if "equipment_list" in fields:
+                        self.conn.execute("DELETE FROM equipment WHERE ticket_id = ?", (id,))
+                        self._insert_equipment(id, fields["equipment_list"])
+                    if "notes_list" in fields:
+                        self.conn.execute("DELETE FROM ticket_notes WHERE ticket_id = ?", (id,))
+                        self._insert_notes(id, fields["notes_list"])
+                self._bump_version(collection)
+                new = {**old, **{key: value for key, value in fields.items() if key != "notes_list"},
+                       "version": row["version"] + 1}
+                changes = [{"collection": collection, "op": "update", "id": id, "old": old, "new": new}]
+                if "notes_list" in fields:
+                    changes.insert(0, {"collection": collection, "op": "reset"})
+            record_changes(changes)
+            return True
+
+    @writes
+    def remove(self, collection: str, ids: list[str]) -> int:
+        self._check_collection(collection)
+        ids = list(ids)
+        removed = 0
+        with self._lock:
+            with self.conn:
+                old = [record for id in ids for record in self._select(collection, "id", id)]
+                for start in range(0, len(ids), 500): # Stay well under SQLite's bound parameter limit
+                    chunk = ids[start:start + 500]
+                    # Equipment and notes go with their ticket (ON DELETE CASCADE)
+                    removed += self.conn.execute(f"DELETE FROM {collection} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                                                 chunk).rowcount
+                if removed:
+                    self._bump_version(collection)
+            if removed:
+                for record in old:
+                    record.pop("notes_list", None)
+                record_changes([{"collection": collection, "op": "remove", "id": record["id"], "old": record} for record in old])
+        return removed
+
+    @writes
+    def append_note(self, ticket_id: str, note: dict) -> bool:
+        with self._lock:
+            with self.conn:
+                exists = self.conn.execute("SELECT 1 FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+                if not exists:
+                    return False
+                position = self.conn.execute("SELECT COUNT(*) FROM ticket_notes WHERE ticket_id = ?",
+                                             (ticket_id,)).fetchone()[0]
+                self._insert_notes(ticket_id, [note], start=position)
+                self._bump_version("tickets")
+            record_changes([{"collection": "tickets", "op": "note", "id": ticket_id, "note": plain_value(note)}])
+            return True
+
+    def get_notes(self, ticket_id: str) -> Optional[list[dict]]:
+        with self._lock:
+            exists = self.conn.execute("SELECT 1 FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+            if not exists:
+                return None
+            rows = self.conn.execute("SELECT * FROM ticket_notes WHERE ticket_id = ? ORDER BY position",
+                                     (ticket_id,)).fetchall()
+            record_io(scanned=len(rows))
+            return [self._note_from_row(row) for row in rows]
+
+    def iter_notes(self) -> Iterator[tuple[str, dict]]:
+        last = ("", -1)
+        while True:
+            # Paged like iter_records, along the (ticket_id, position) index
+            with self._lock:
+                rows = self.conn.execute("SELECT * FROM ticket_notes WHERE (ticket_id, position) > (?, ?) "
+                                         "ORDER BY ticket_id, position LIMIT 500", last).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row["ticket_id"], self._note_from_row(row)
+            last = (rows[-1]["ticket_id"], rows[-1]["position"])
+
+    def version(self, collection: str) -> str:
+        self._check_collection(collection)
+        with self._lock:
+            row = self.conn.execute("SELECT version FROM collection_versions WHERE collection = ?",
+                                    (collection,)).fetchone()
+            return str(row[0] if row else 0)
+
+    def _bump_version(self, collection: str) -> None:
+        self.conn.execute("INSERT INTO collection_versions (collection, version) VALUES (?, 1) "
+                          "ON CONFLICT(collection) DO UPDATE SET version = version + 1", (collection,))
+
+    def _check_unique(self, collection: str, field: str, value, id: str) -> None:
+        """
+        Raise DuplicateKey if another record has value in field. Starts the transaction first if it
+        isn't already, taking SQLite's write lock, so no other process can add the value before
+        this transaction's write is committed.
+        """
+        if field not in COLUMNS[collection]:
+            raise ValueError(f"Unknown field {field} for {collection}")
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        taken = self.conn.execute(f"SELECT 1 FROM {collection} WHERE {field} = ? AND id != ? LIMIT 1",
+                                  (self._to_column(value), id)).fetchone()
+        if taken:
+            raise DuplicateKey(collection, field, value)
+
+    def _check_collection(self, collection: str) -> None:
+        # Table and column names can't be bound as parameters, so only known names are allowed
+        if collection not in COLUMNS:
+            raise ValueError(f"Unknown collection: {collection}")
+
+    def _select(self, collection: str, field: str, value) -> list[dict]:
+        self._check_collection(collection)
+        if field not in COLUMNS[collection]:
+            raise ValueError(f"Unknown field {field} for {collection}")
+        with self._lock:
+            rows = self.conn.execute(f"SELECT * FROM {collection} WHERE {field} = ?",
+                                     (self._to_column(value),)).fetchall()
+            record_io(scanned=len(rows))
+            records = [self._row_to_record(row) for row in rows]
+            if collection == "tickets":
+                self._attach_children(records)
+            return records
+
+    def _insert_row(self, collection: str, record: dict) -> None:
+        record = plain_value(record)
+        record.setdefault("version", 0) # Records saved before versions start at 0
+        columns = COLUMNS[collection]
+        placeholders = ", ".join("?" for _ in columns)
+        values = [self._to_column(record.get(column)) for column in columns]
+        self.conn.execute(f"INSERT INTO {collection} ({', '.join(columns)}) VALUES ({placeholders})", values)
+        if collection == "tickets":
+            self._insert_equipment(record["id"], record.get("equipment_list", []))
+            self._insert_notes(record["id"], record.get("notes_list", []))
+
+    def _insert_equipment(self, ticket_id: str, equipment_list: list) -> None:
+        rows = []
+        for position, equipment in enumerate(plain_value(equipment_list)):
+            rows.append((ticket_id, position, *[equipment.get(column, "") for column in EQUIPMENT_COLUMNS]))
+        self.conn.executemany("INSERT INTO equipment (ticket_id, position, eq_type, model, serial_number, notes) "
+                              "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _insert_notes(self, ticket_id: str, notes_list: list, start: int = 0) -> None:
+        rows = []
+        for position, note in enumerate(plain_value(notes_list), start=start):
+            rows.append((note["id"], ticket_id, position, *[note.get(column) for column in NOTE_COLUMNS[1:]]))
+        self.conn.executemany("INSERT INTO ticket_notes (id, ticket_id, position, technician, date_created, notes, "
+                              "ticket_time, mileage) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _attach_children(self, tickets: list[dict], whole_table: bool = False, notes: bool = True) -> None:
+        """Fill in equipment_list and notes_list (unless notes is False) for tickets loaded from the tickets table."""
+        by_id = {ticket["id"]: ticket for ticket in tickets}
+        for ticket in tickets:
+            ticket["equipment_list"] = []
+            if notes:
+                ticket["notes_list"] = []
+        if whole_table:
+            # Loading every ticket, one pass over each child table is cheaper than a lookup per ticket
+            batches = [("", ())]
+        else:
+            ids = list(by_id)
+            batches = []
+            for start in range(0, len(ids), 500): # Stay well under SQLite's bound parameter limit
+                chunk = tuple(ids[start:start + 500])
+                batches.append((f"WHERE ticket_id IN ({', '.join('?' for _ in chunk)})", chunk))
+        for where, params in batches:
+            for row in self.conn.execute(f"SELECT * FROM equipment {where} ORDER BY ticket_id, position", params):
+                if row["ticket_id"] in by_id:
+                    by_id[row["ticket_id"]]["equipment_list"].append({column: row[column] for column in EQUIPMENT_COLUMNS})
+            if not notes:
+                continue
+            for row in self.conn.execute(f"SELECT * FROM ticket_notes {where} ORDER BY ticket_id, position", params):
+                if row["ticket_id"] in by_id:
+                    by_id[row["ticket_id"]]["notes_list"].append(self._note_from_row(row))
+
+    def _note_from_row(self, row: sqlite3.Row) -> dict:
+        return {column: row[column] for column in NOTE_COLUMNS}
+
+    def _add_version_columns(self) -> None:
+        """Databases made before records had versions get the column, every record starting at 0."""
+        for collection in COLUMNS:
+            columns = [row["name"] for row in self._conn.execute(f"PRAGMA table_info({collection})")] # type: ignore[union-attr]
+            if "version" not in columns:
+                self._conn.execute(f"ALTER TABLE {collection} ADD COLUMN version INTEGER NOT NULL DEFAULT 0") # type: ignore[union-attr]
+
+    def _row_to_record(self, row: sqlite3.Row) -> dict:
+        record = dict(row)
+        for field in BOOL_FIELDS:
+            if field in record:
+                record[field] = bool(record[field])
+        return record
+
+    def _to_column(self, value):
+        value = plain_value(value)
+        if isinstance(value, bool):
+            return int(value)
+        return value
@@ -1,9 +1,23 @@
+import gc
 import json
+import marshal
+import os
+import struct
+import threading
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from dataclasses import asdict, is_dataclass
+from dataclasses import is_dataclass
+from functools import wraps
 from enum import Enum
 from datetime import datetime
-from core.constants import DATA_DIR, FILE_MAP, COUNTER_FILE
+from typing import Iterator, Optional
+from core.constants import (DATA_DIR, FILE_MAP, COUNTER_FILE, NOTES_FILE, STORAGE_BACKEND, DATA_FORMAT, DATA_FORMATS,
+                            JOURNALED_COLLECTIONS, JOURNAL_COMPACT_BYTES, UNIQUE_KEYS, TICKET_STORE, DATA_LOCK_FILE,
+                            INSTRUMENTATION)
+from core.changes import record_changes
+from core.instrumentation import record_io, timed
+from core.locking import DataLock
+from core.notes_store import NotesStore
 
 class EnhancedJSONEncoder(json.JSONEncoder):
     def default(self, o):
@@ -12,32 +26,892 @@ class EnhancedJSONEncoder(json.JSONEncoder):
         if isinstance(o, datetime):
             return o.isoformat()
         if is_dataclass(o):
-            return asdict(o) # type: ignore[arg-type]
+            return o.to_dict() # type: ignore[union-attr]
         return super().default(o)
-    
-def initialize_files():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    for data_type in FILE_MAP:
-        if not FILE_MAP[data_type].exists():
-            save_json(FILE_MAP[data_type], [])
-    if not COUNTER_FILE.exists():
-        with COUNTER_FILE.open("w", encoding="utf-8") as f:
-            f.write("0")
+def plain_value(value):
+    """Convert a value into something that can be stored as-is (str, int, float, bool, None, list, dict)."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if is_dataclass(value):
+        return value.to_dict() # type: ignore[union-attr] # The models' codecs already give plain values
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain_value(item) for item in value]
+    return value
 
-def load_json(path: Path) -> list[dict]:
-    if not path.exists():
-        return []
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+def to_record(obj) -> dict:
+    """Turn a model object into the plain dict shape stored in the data files."""
+    return obj.to_dict()
+
+class CollectionCache:
+    """
+    Keeps each parsed data file in memory and only re-reads it when the file on disk changes.
+    A file counts as changed when its mtime, size or inode differ from when it was cached, so an
+    unchanged read costs one stat() instead of a json.load.
+    The cached lists are shared, so callers must not change them unless they save them back.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[Path, tuple[tuple, list[dict]]] = {}
+        self._lock = threading.RLock()
+
+    def load(self, path: Path, loader) -> list[dict]:
+        with self._lock:
+            signature = file_signature(path)
+            entry = self._entries.get(path)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            data = loader(path)
+            if signature is not None:
+                self._entries[path] = (signature, data)
+            return data
+
+    def store(self, path: Path, data: list[dict]) -> None:
+        """Write-through: remember data we just saved so the next read doesn't parse it again."""
+        with self._lock:
+            signature = file_signature(path)
+            if signature is None:
+                self._entries.pop(path, None)
+            else:
+                self._entries[path] = (signature, data)
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached_files": len(self._entries)}
+
+def temp_path_for(path: Path) -> Path:
+    """Where to write a new copy of path before replacing it. Named for this process, so two processes never write the same one."""
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+def file_signature(path: Path) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+collection_cache = CollectionCache()
+
+def cache_stats() -> dict:
+    """Hit/miss counters for the in-memory collection cache."""
+    return collection_cache.stats()
+
+class KeyIndex:
+    """
+    Hash indexes from key fields to records, e.g. id -> customer or username -> technician.
+    Built once from a loaded collection and then kept in step with every add and replace.
+    When two records share a key the first one wins, the same as a front to back scan.
+    """
+    def __init__(self, fields: list[str], records: Optional[list[dict]] = None):
+        self.fields = fields
+        self.maps: dict[str, dict] = {field: {} for field in fields}
+        self.positions: dict[str, int] = {} # id -> position in the collection list
+        self.size = 0
+        for record in records or []:
+            self.add(record)
+
+    def get(self, field: str, value) -> Optional[dict]:
+        return self.maps[field].get(value)
+
+    def position(self, id: str) -> Optional[int]:
+        return self.positions.get(id)
+
+    def add(self, record: dict) -> None:
+        self.positions.setdefault(record["id"], self.size)
+        self.size += 1
+        for field in self.fields:
+            self.maps[field].setdefault(record.get(field), record)
+
+    def replace(self, old: dict, new: dict) -> None:
+        """Swap a record for a new version of itself, which keeps its position."""
+        for field in self.fields:
+            index = self.maps[field]
+            if index.get(old.get(field)) is old:
+                del index[old.get(field)]
+            index.setdefault(new.get(field), new)
+
+def key_fields(collection: str) -> list[str]:
+    return ["id", *UNIQUE_KEYS.get(collection, [])]
+
+class CollectionJournal:
+    """
+    Log-structured storage for one collection: the last snapshot (the normal JSON file) plus an
+    append-only journal with one JSON line per change. Writes only append a line, so their cost
+    doesn't grow with the collection. Reads replay the journal on top of the snapshot, and after
+    the first read only the lines added since are replayed.
+
+    Journal entries:
+        {"op": "upsert", "id": ..., "record": {...}}  add or replace a whole record
+        {"op": "patch", "id": ..., "fields": {...}}   change some fields of a record
+        {"op": "append", "id": ..., "field": ..., "value": {...}}  add an item to a list field
+        {"op": "delete", "ids": [...]}                 remove records
+    Replaying an entry twice gives the same result, so a crash partway through compact is harmless.
+    """
+    def __init__(self, collection: str, snapshot_path: Path, journal_path: Path,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES, data_lock: Optional[DataLock] = None):
+        self.collection = collection
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_bytes = compact_bytes
+        self.data_lock = data_lock # Held by compact_in_background's thread, other callers already hold it
+        self.records: list[dict] = []
+        self.key_fields = key_fields(collection)
+        self.keys = KeyIndex(self.key_fields)
+        self._snapshot_signature: Optional[tuple] = None
+        self._journal_offset = 0
+        self._loaded = False
+        self._compacting = False
+        self._lock = threading.RLock()
+
+    def load(self) -> list[dict]:
+        """The current records. Shared with the journal, so don't change them."""
+        with self._lock:
+            self._refresh()
+            return self.records
+
+    def get(self, id: str) -> Optional[dict]:
+        return self.lookup("id", id)
+
+    def lookup(self, field: str, value) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self.keys.get(field, value)
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: list[dict]) -> None:
+        """Append several entries with one write."""
+        lines = "".join(json.dumps(entry, cls=EnhancedJSONEncoder, separators=(",", ":")) + "\n" for entry in entries)
+        with self._lock:
+            self._refresh() # Pick up anything another process added first
+            with self.journal_path.open("a", encoding="utf-8") as f:
+                f.write(lines)
+            record_io(written=len(lines))
+            self._refresh() # Applies our own line, in order with any others
+            journal_size = self._journal_offset
+        if journal_size >= self.compact_bytes:
+            self.compact_in_background()
+
+    def iter_records(self) -> Iterator[dict]:
+        # The records are in memory anyway, and the list is replaced rather than changed, so a copy is stable
+        return iter(list(self.load()))
+
+    def replace_all(self, records: list[dict]) -> None:
+        """Write a whole new snapshot and start an empty journal."""
+        with self._lock:
+            self._write_snapshot(records)
+            self.journal_path.write_text("", encoding="utf-8")
+            self._reset(records)
+            self._snapshot_signature = file_signature(self.snapshot_path)
+            self._journal_offset = 0
+            self._loaded = True
+
+    def compact(self) -> int:
+        """
+        Fold the journal into a new snapshot. The snapshot is written without holding the lock, so
+        reads in this process keep going while it runs; lines appended meanwhile are carried over
+        to the new journal. Returns the number of journal bytes folded in.
+        Only safe with the data lock held exclusively: another process appending between the tail
+        being read and the journal being replaced would lose its line. JsonBackend.compact and
+        compact_in_background both take it.
+        """
+        with self._lock:
+            self._refresh()
+            records = list(self.records) # Records are replaced rather than changed in place, so a copy of the list is a stable snapshot
+            folded_offset = self._journal_offset
+            snapshot_signature = self._snapshot_signature
+        if folded_offset == 0:
+            return 0
+
+        temp_path = temp_path_for(self.snapshot_path)
+        save_records(temp_path, records)
+
+        with self._lock:
+            if file_signature(self.snapshot_path) != snapshot_signature:
+                # The snapshot was replaced while we were writing ours, so ours is already stale
+                temp_path.unlink(missing_ok=True)
+                return 0
+            with self.journal_path.open("r", encoding="utf-8") as f:
+                f.seek(folded_offset)
+                tail = f.read()
+            temp_journal = temp_path_for(self.journal_path)
+            temp_journal.write_text(tail, encoding="utf-8")
+            os.replace(temp_path, self.snapshot_path)
+            os.replace(temp_journal, self.journal_path)
+            self._snapshot_signature = file_signature(self.snapshot_path)
+            self._journal_offset = 0
+            self._refresh() # Re-applies the carried over lines, which is harmless
+            record_changes([{"collection": self.collection, "op": "compact"}])
+        return folded_offset
+
+    def compact_in_background(self) -> None:
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                with self.data_lock.hold() if self.data_lock else nullcontext():
+                    self.compact()
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, name=f"compact-{self.snapshot_path.stem}", daemon=True).start()
+
+    def journal_size(self) -> int:
+        signature = file_signature(self.journal_path)
+        return signature[1] if signature else 0
+
+    def _refresh(self) -> None:
+        snapshot_signature = file_signature(self.snapshot_path)
+        journal_size = self.journal_size()
+        if (not self._loaded
+                or snapshot_signature != self._snapshot_signature
+                or journal_size < self._journal_offset):
+            # First read, or someone else compacted or rewrote the file: start over from the snapshot
+            self._reset(load_records(self.snapshot_path))
+            self._snapshot_signature = snapshot_signature
+            self._journal_offset = 0
+            self._loaded = True
+        if journal_size > self._journal_offset:
+            self._replay_from(self._journal_offset)
+
+    def _replay_from(self, offset: int) -> None:
+        with self.journal_path.open("rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1 # A line still being written by another process waits for the next read
+        lines = [line for line in data[:end].splitlines() if line.strip()]
+        for line in lines:
+            self._apply(json.loads(line))
+        record_io(read=len(data), scanned=len(lines))
+        self._journal_offset = offset + end
+
+    def _apply(self, entry: dict) -> None:
+        op = entry["op"]
+        if op == "delete":
+            ids = set(entry["ids"])
+            if any(self.keys.get("id", id) is not None for id in ids):
+                # Positions after the removed records shift, so the key index is rebuilt
+                self._reset([record for record in self.records if record["id"] not in ids])
+            return
+        id = entry["id"]
+        current = self.keys.get("id", id)
+        if op == "upsert":
+            self._put(entry["record"])
+        elif op == "patch" and current is not None:
+            self._put({**current, **entry["fields"]})
+        elif op == "append" and current is not None:
+            items = current.get(entry["field"]) or []
+            value = entry["value"]
+            if isinstance(value, dict) and "id" in value and any(item.get("id") == value["id"] for item in items):
+                return # Already applied
+            self._put({**current, entry["field"]: [*items, value]})
+
+    def _put(self, record: dict) -> None:
+        # Swap in a new dict instead of editing the old one, compact relies on this
+        current = self.keys.get("id", record["id"])
+        if current is None:
+            self.records.append(record)
+            self.keys.add(record)
+        else:
+            self.records[self.keys.position(record["id"])] = record # type: ignore[index]
+            self.keys.replace(current, record)
+
+    def _reset(self, records: list[dict]) -> None:
+        self.records = records
+        self.keys = KeyIndex(key_fields(self.collection), records)
+
+    def _write_snapshot(self, records: list[dict]) -> None:
+        temp_path = temp_path_for(self.snapshot_path)
+        save_records(temp_path, records)
+        os.replace(temp_path, self.snapshot_path)
+
+class VersionConflict(ValueError):
+    """A record changed between being read and being saved, so saving would undo someone else's changes."""
+
+class DuplicateKey(ValueError):
+    """Another record already has the value a unique field is being set to."""
+    def __init__(self, collection: str, field: str, value):
+        super().__init__(f"{collection.rstrip('s').capitalize()} {field} {value} already exists.")
+        self.field = field
+        self.value = value
+
+def check_version(collection: str, record: dict, expected_version: Optional[int]) -> None:
+    if expected_version is not None and record.get("version", 0) != expected_version:
+        raise VersionConflict(f"This {collection.rstrip('s')} was changed by someone else since you opened it. "
+                              "Open it again to see their changes, then make yours.")
+
+def reads(method):
+    """Method decorator for JsonBackend: run while holding the shared data directory lock."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.data_lock.hold(shared=True):
+            return method(self, *args, **kwargs)
+    return locked
+
+def writes(method):
+    """Method decorator for JsonBackend and SqliteBackend: run while holding the exclusive data directory lock."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.data_lock.hold():
+            return method(self, *args, **kwargs)
+    return locked
+
+class StorageBackend:
+    """
+    Interface for the storage engines behind load_data/save_data.
+    Records are plain dicts shaped exactly like the entries in the JSON files.
+    Tickets from load_all leave out notes_list, use iter_notes or get_notes for those. get() gives
+    the whole ticket. Tickets passed to save_all keep the notes they have unless they carry a notes_list.
+    """
+    data_lock: DataLock # Held exclusively by writes, and by jobs like archiving that span several calls
+
+    def initialize(self) -> None:
+        raise NotImplementedError
+
+    def load_all(self, collection: str) -> list[dict]:
+        raise NotImplementedError
+
+    def iter_records(self, collection: str) -> Iterator[dict]:
+        """Every record, like load_all, for backends that can hand them over without holding them all at once."""
+        yield from self.load_all(collection)
+
+    def save_all(self, collection: str, records: list[dict]) -> None:
+        raise NotImplementedError
+
+    def get(self, collection: str, id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def find(self, collection: str, field: str, value) -> list[dict]:
+        raise NotImplementedError
+
+    def get_fields(self, collection: str, ids, fields: list[str]) -> list[dict]:
+        """
+        Just the named fields (plus id) of the records with these ids, in the same order,
+        skipping ids that don't exist. Used to list records without loading everything in them.
+        """
+        records = []
+        for id in ids:
+            record = self.get(collection, id)
+            if record is not None:
+                records.append({"id": id, **{field: record.get(field) for field in fields}})
+        return records
+
+    def insert(self, collection: str, record: dict, unique: Optional[str] = None) -> None:
+        """
+        With unique (a field name), raises DuplicateKey if another record already has the same
+        value in it. It's checked in the same write as the insert, so two sessions can't both pass.
+        """
+        raise NotImplementedError
+
+    def insert_many(self, collection: str, records: list[dict], unique: Optional[str] = None) -> None:
+        """
+        Insert several records, as one write where the backend can. Used by bulk imports.
+        unique is as for insert, two of the records sharing a value count too. Where the backend
+        writes them as one, a DuplicateKey means none of them were written.
+        """
+        for record in records:
+            self.insert(collection, record, unique)
+
+    def update(self, collection: str, id: str, fields: dict, expected_version: Optional[int] = None,
+               unique: Optional[str] = None) -> bool:
+        """
+        Apply fields to the record with this id and bump its version. Returns False if the id
+        doesn't exist. With expected_version, raises VersionConflict if the record's version is
+        different, i.e. someone else changed it since the caller read it. unique is as for insert.
+        """
+        raise NotImplementedError
+
+    def remove(self, collection: str, ids: list[str]) -> int:
+        """Delete the records with these ids (and a ticket's notes). Returns how many existed."""
+        raise NotImplementedError
+
+    def append_note(self, ticket_id: str, note: dict) -> bool:
+        """Add a note to a ticket. Returns False if the ticket doesn't exist."""
+        raise NotImplementedError
+
+    def get_notes(self, ticket_id: str) -> Optional[list[dict]]:
+        raise NotImplementedError
+
+    def iter_notes(self) -> Iterator[tuple[str, dict]]:
+        """Every note as (ticket id, note)."""
+        raise NotImplementedError
+
+    def version(self, collection: str) -> str:
+        """A token that changes whenever the collection changes, used to tell if derived data is stale."""
+        raise NotImplementedError
+
+class JsonBackend(StorageBackend):
+    """
+    The original storage: one JSON file per collection, rewritten on every change.
+    Collections listed in JOURNALED_COLLECTIONS append changes to a journal instead.
+    Ticket notes live in their own append-only NotesStore rather than in tickets.json.
+    With TICKET_STORE set to "mmap" the tickets use MappedTickets instead of CollectionJournal.
+    Reads hold a shared lock on the data directory and writes an exclusive one, so several
+    copies of Tavern can share it without a write landing in the middle of someone's read.
+    """
+    def __init__(self):
+        self.data_lock = DataLock(DATA_LOCK_FILE)
+        self.journals = {collection: open_journal(collection, self.data_lock) for collection in JOURNALED_COLLECTIONS}
+        self.notes = NotesStore(NOTES_FILE)
+        self._notes_moved = False
+        self._key_indexes: dict[str, KeyIndex] = {}
+        self._indexed_lists: dict[str, list[dict]] = {} # The loaded list each key index was built from
+        self._lock = threading.RLock()
+
+    @writes
+    def initialize(self) -> None:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+        for data_type in FILE_MAP:
+            if not FILE_MAP[data_type].exists():
+                save_records(FILE_MAP[data_type], [])
+        if not COUNTER_FILE.exists():
+            with COUNTER_FILE.open("w", encoding="utf-8") as f:
+                f.write("0")
+
+    @reads
+    def load_all(self, collection: str) -> list[dict]:
+        if collection == "tickets":
+            self._move_old_notes()
+        if collection in self.journals:
+            return self.journals[collection].load()
+        return collection_cache.load(FILE_MAP[collection], load_records)
+
+    def iter_records(self, collection: str) -> Iterator[dict]:
+        if collection not in self.journals:
+            return iter(list(self.load_all(collection)))
+        if collection == "tickets":
+            self._move_old_notes()
+        return self.journals[collection].iter_records()
+
+    @writes
+    def save_all(self, collection: str, records: list[dict]) -> None:
+        self._write_all(collection, records)
+        record_changes([{"collection": collection, "op": "reset"}])
+
+    def _write_all(self, collection: str, records: list[dict]) -> None:
+        if collection == "tickets":
+            records = self._save_ticket_notes(records)
+        if collection in self.journals:
+            self.journals[collection].replace_all(records)
+            return
+        path = FILE_MAP[collection]
+        try:
+            save_records(path, records)
+        except Exception:
+            # The cached list may already hold the unsaved change, so drop it and re-read next time
+            collection_cache.invalidate(path)
+            raise
+        collection_cache.store(path, records)
+
+    @reads
+    def get(self, collection: str, id: str) -> Optional[dict]:
+        record = self.lookup(collection, "id", id)
+        if collection == "tickets" and record is not None:
+            return {**record, "notes_list": self.notes.get(id)}
+        return record
+
+    @reads
+    def get_fields(self, collection: str, ids, fields: list[str]) -> list[dict]:
+        # Same as the default, except tickets' notes are only read if they're asked for
+        records = []
+        for id in ids:
+            record = self.get(collection, id) if "notes_list" in fields else self.lookup(collection, "id", id)
+            if record is not None:
+                records.append({"id": id, **{field: record.get(field) for field in fields}})
+        return records
+
+    @reads
+    def lookup(self, collection: str, field: str, value) -> Optional[dict]:
+        """O(1) lookup on a key field listed by key_fields() (or the journal's key_fields)."""
+        if collection == "tickets":
+            self._move_old_notes()
+        if collection in self.journals:
+            return self.journals[collection].lookup(field, value)
+        with self._lock:
+            return self._key_index(collection).get(field, value)
+
+    @reads
+    def find(self, collection: str, field: str, value) -> list[dict]:
+        fields = self.journals[collection].key_fields if collection in self.journals else key_fields(collection)
+        if field in fields:
+            record = self.lookup(collection, field, value)
+            return [record] if record is not None else []
+        return [record for record in self.load_all(collection) if record.get(field) == value]
+
+    def insert(self, collection: str, record: dict, unique: Optional[str] = None) -> None:
+        self.insert_many(collection, [record], unique)
+
+    @writes
+    def insert_many(self, collection: str, records: list[dict], unique: Optional[str] = None) -> None:
+        if not records:
+            return
+        if unique:
+            self._check_unique(collection, unique, records)
+        notes = []
+        if collection == "tickets":
+            records = [dict(record) for record in records]
+            for record in records:
+                notes.extend((record["id"], note) for note in record.pop("notes_list", None) or [])
+            self.notes.extend(notes)
+        if collection in self.journals:
+            self.journals[collection].extend([{"op": "upsert", "id": record["id"], "record": record} for record in records])
+        else:
+            with self._lock:
+                keys = self._key_index(collection)
+                all_records = self.load_all(collection)
+                all_records.extend(records)
+                self._write_all(collection, all_records)
+                for record in records:
+                    keys.add(record)
+        record_changes([{"collection": collection, "op": "insert", "id": record["id"], "new": plain_value(record)}
+                        for record in records]
+                       + [{"collection": "tickets", "op": "note", "id": ticket_id, "note": plain_value(note)}
+                          for ticket_id, note in notes])
+
+    @writes
+    def update(self, collection: str, id: str, fields: dict, expected_version: Optional[int] = None,
+               unique: Optional[str] = None) -> bool:
+        current = self.lookup(collection, "id", id)
+        if current is None:
+            return False
+        check_version(collection, current, expected_version)
+        if unique and unique in fields:
+            self._check_unique(collection, unique, [{"id": id, unique: fields[unique]}])
+        fields = {**fields, "version": current.get("version", 0) + 1}
+        changes = []
+        if collection == "tickets" and "notes_list" in fields:
+            self._replace_notes({id: fields.pop("notes_list")})
+            changes.append({"collection": collection, "op": "reset"}) # Rare, not worth a change type of its own
+        if collection in self.journals:
+            self.journals[collection].append({"op": "patch", "id": id, "fields": plain_value(fields)})
+        else:
+            with self._lock:
+                keys = self._key_index(collection)
+                records = self.load_all(collection)
+                updated = {**current, **fields}
+                records[keys.position(id)] = updated # type: ignore[index]
+                self._write_all(collection, records)
+                keys.replace(current, updated)
+        changes.append({"collection": collection, "op": "update", "id": id,
+                        "old": plain_value(current), "new": plain_value({**current, **fields})})
+        record_changes(changes)
+        return True
+
+    @writes
+    def remove(self, collection: str, ids: list[str]) -> int:
+        found = [record for record in (self.lookup(collection, "id", id) for id in ids) if record is not None]
+        if not found:
+            return 0
+        found_ids = [record["id"] for record in found]
+        if collection == "tickets":
+            self._replace_notes({id: [] for id in found_ids})
+        if collection in self.journals:
+            self.journals[collection].append({"op": "delete", "ids": found_ids})
+        else:
+            with self._lock:
+                removed = set(found_ids)
+                self._write_all(collection, [record for record in self.load_all(collection) if record["id"] not in removed])
+        record_changes([{"collection": collection, "op": "remove", "id": record["id"], "old": record} for record in found])
+        return len(found)
+
+    def _check_unique(self, collection: str, field: str, records: list[dict]) -> None:
+        """Raise DuplicateKey if one of records has the same value in field as another record, stored or not."""
+        ids = set(record["id"] for record in records)
+        if len(records) == 1:
+            taken = set(record.get(field) for record in self.find(collection, field, records[0].get(field))
+                        if record["id"] not in ids)
+        else:
+            taken = set(record.get(field) for record in self.load_all(collection) if record["id"] not in ids)
+        for record in records:
+            if record.get(field) in taken:
+                raise DuplicateKey(collection, field, record.get(field))
+            taken.add(record.get(field))
+
+    def _key_index(self, collection: str) -> KeyIndex:
+        """The key index for a cached collection, rebuilt only when the file was re-read."""
+        records = self.load_all(collection)
+        if self._indexed_lists.get(collection) is not records:
+            self._key_indexes[collection] = KeyIndex(key_fields(collection), records)
+            self._indexed_lists[collection] = records
+        return self._key_indexes[collection]
+
+    @writes
+    def append_note(self, ticket_id: str, note: dict) -> bool:
+        if self.lookup("tickets", "id", ticket_id) is None:
+            return False
+        self.notes.append(ticket_id, note)
+        record_changes([{"collection": "tickets", "op": "note", "id": ticket_id, "note": note}])
+        return True
+
+    @reads
+    def get_notes(self, ticket_id: str) -> Optional[list[dict]]:
+        if self.lookup("tickets", "id", ticket_id) is None:
+            return None
+        return self.notes.get(ticket_id)
+
+    @reads
+    def iter_notes(self) -> Iterator[tuple[str, dict]]:
+        self._move_old_notes()
+        return self.notes.scan()
+
+    @reads
+    def version(self, collection: str) -> str:
+        version = str(file_signature(FILE_MAP[collection]))
+        if collection in self.journals:
+            version += f":{self.journals[collection].journal_size()}"
+        if collection == "tickets":
+            # Adding a note changes the tickets (and their full text) without touching tickets.json
+            version += f":{self.notes.size()}"
+        return version
+
+    def _save_ticket_notes(self, records: list[dict]) -> list[dict]:
+        """Move the notes of tickets being saved into the notes store, returning the tickets without them."""
+        notes = {record["id"]: record["notes_list"] for record in records if "notes_list" in record}
+        ids = set(record["id"] for record in records)
+        # Notes of tickets that are no longer saved go too
+        for ticket_id in self.notes.ticket_ids():
+            if ticket_id not in ids:
+                notes[ticket_id] = []
+        if notes:
+            self._replace_notes(notes)
+        return [{key: value for key, value in record.items() if key != "notes_list"} for record in records]
+
+    def _replace_notes(self, notes: dict[str, list]) -> None:
+        """
+        Swap in new notes for some tickets. The store is append-only, so this rewrites it,
+        which is fine for the rare whole-ticket saves that need it.
+        """
+        with self._lock:
+            kept = [(ticket_id, note) for ticket_id, note in self.notes.scan() if ticket_id not in notes]
+            added = [(ticket_id, note) for ticket_id, ticket_notes in notes.items() for note in ticket_notes]
+            self.notes.rewrite(kept + added)
+
+    def _move_old_notes(self) -> None:
+        """Tickets saved before the notes store carry their notes in notes_list, move those out once."""
+        if self._notes_moved:
+            return
+        with self._lock:
+            if self._notes_moved:
+                return
+            self._notes_moved = True
+            if self.notes.path.exists():
+                return # Already checked, so the tickets don't need reading again
+            if "tickets" in self.journals:
+                records = self.journals["tickets"].load()
+            else:
+                records = collection_cache.load(FILE_MAP["tickets"], load_records)
+            if any("notes_list" in record for record in records):
+                self.save_all("tickets", records)
+            else:
+                self.notes.path.touch()
+
+    @writes
+    def compact(self, collection: str) -> int:
+        """Fold a collection's journal into its snapshot. Returns the number of journal bytes folded in."""
+        if collection not in self.journals:
+            return 0
+        return self.journals[collection].compact()
+
+def journal_path(collection: str) -> Path:
+    return DATA_DIR / f"{collection}.journal"
+
+def open_journal(collection: str, data_lock: Optional[DataLock] = None):
+    """The journal for a collection: a CollectionJournal, or MappedTickets for the tickets in mmap mode."""
+    if collection == "tickets" and TICKET_STORE == "mmap":
+        from core.mapped import MappedTickets # Imported here since it imports from this module
+        return MappedTickets(FILE_MAP[collection], journal_path(collection), DATA_DIR / "tickets.idx", data_lock=data_lock)
+    return CollectionJournal(collection, FILE_MAP[collection], journal_path(collection), data_lock=data_lock)
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock() # Worker threads may ask for the backend at the same time
+
+def create_backend(name: str) -> StorageBackend:
+    if name == "json":
+        return JsonBackend()
+    if name == "sqlite":
+        from core.sqlite_backend import SqliteBackend # Imported here so the json backend never touches sqlite3
+        return SqliteBackend()
+    raise ValueError(f"Unknown storage backend: {name}")
+
+def get_backend() -> StorageBackend:
+    """The process-wide storage backend picked by STORAGE_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(STORAGE_BACKEND)
+    return _backend
+
+def initialize_files():
+    get_backend().initialize()
 
 def save_json(path: Path, data: list[dict]) -> None:
     with path.open("w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, cls=EnhancedJSONEncoder)
 
+# Binary data files start with this, then each record is its length followed by marshal bytes
+BINARY_MAGIC = b"TAVERNB1"
+RECORD_LENGTH = struct.Struct("<I")
+# Pinned so files written by one Python version load in another
+MARSHAL_VERSION = 4
+
+def load_records(path: Path) -> list[dict]:
+    """Load a data file in any of the DATA_FORMATS, telling them apart by the first bytes."""
+    if not path.exists():
+        return []
+    data = path.read_bytes()
+    with paused_gc():
+        if data.startswith(BINARY_MAGIC):
+            records = decode_binary(data, path)
+        elif not data.lstrip()[:1]:
+            records = []
+        elif data.lstrip()[:1] == b"[":
+            records = json.loads(data)
+        else:
+            # Parse all the lines as one array, much faster than a json.loads per line
+            lines = [line for line in data.splitlines() if line.strip()]
+            records = json.loads(b"[" + b",".join(lines) + b"]")
+    record_io(read=len(data), scanned=len(records))
+    return records
+
+@contextmanager
+def paused_gc():
+    """
+    Turn off the garbage collector while loading a data file. Building thousands of record
+    dicts sets off collections that can't find anything (records have no cycles) but can take
+    a third of the load time.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def save_records(path: Path, records: list[dict], data_format: Optional[str] = None) -> None:
+    """Write a data file in data_format, DATA_FORMAT if not given."""
+    data_format = data_format or DATA_FORMAT
+    if data_format == "json":
+        save_json(path, records)
+    elif data_format == "jsonl":
+        lines = [json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n" for record in records]
+        with path.open("w", encoding="utf-8") as f:
+            f.write("".join(lines))
+    elif data_format == "binary":
+        with path.open("wb") as f:
+            f.write(encode_binary(records))
+    else:
+        raise ValueError(f"Unknown data format: {data_format}")
+    if INSTRUMENTATION: # The stat is only worth it when someone's looking
+        record_io(written=path.stat().st_size, scanned=len(records))
+
+def encode_binary(records: list[dict]) -> bytes:
+    chunks = [BINARY_MAGIC]
+    for record in records:
+        blob = marshal.dumps(record, MARSHAL_VERSION)
+        chunks.append(RECORD_LENGTH.pack(len(blob)))
+        chunks.append(blob)
+    return b"".join(chunks)
+
+def decode_binary(data: bytes, path: Path) -> list[dict]:
+    # marshal isn't safe for untrusted input, but these files are only ever written by Tavern
+    records = []
+    view = memoryview(data)
+    offset = len(BINARY_MAGIC)
+    while offset < len(data):
+        if offset + RECORD_LENGTH.size > len(data):
+            raise ValueError(f"{path.name} is truncated")
+        (length,) = RECORD_LENGTH.unpack_from(data, offset)
+        offset += RECORD_LENGTH.size
+        if offset + length > len(data):
+            raise ValueError(f"{path.name} is truncated")
+        records.append(marshal.loads(view[offset:offset + length]))
+        offset += length
+    return records
+
+@timed()
 def load_data(data_type: str) -> list[dict]:
-    return load_json(FILE_MAP[data_type])
+    return get_backend().load_all(data_type)
 
+@timed()
 def save_data(data_type: str, data: list[dict]) -> None:
-    save_json(FILE_MAP[data_type], data)
+    get_backend().save_all(data_type, data)
+
+def compact_journals() -> dict:
+    """Compact every journaled collection. Returns the journal bytes folded in per collection."""
+    backend = get_backend()
+    if not isinstance(backend, JsonBackend):
+        return {}
+    return {collection: backend.compact(collection) for collection in backend.journals}
+
+def convert_data_files(data_format: str) -> dict:
+    """
+    Rewrite every data file in data_format. Each file is checked to load back exactly the same
+    before it replaces the old one. Returns (old size, new size) in bytes per collection.
+    """
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown data format: {data_format}")
+    sizes = {}
+    for collection, path in FILE_MAP.items():
+        if not path.exists():
+            continue
+        records = load_records(path)
+        temp_path = temp_path_for(path)
+        save_records(temp_path, records, data_format)
+        if load_records(temp_path) != records:
+            temp_path.unlink()
+            raise ValueError(f"{collection} didn't convert to {data_format} exactly, so it was left as it was")
+        old_size = path.stat().st_size
+        os.replace(temp_path, path)
+        sizes[collection] = (old_size, path.stat().st_size)
+    collection_cache.invalidate()
+    return sizes
+
+def migrate_json_to_sqlite(force: bool = False) -> dict:
+    """
+    One-shot copy of the JSON data files into the SQLite database.
+    Returns the number of records copied per collection.
+    """
+    from core.sqlite_backend import SqliteBackend
+    source = JsonBackend()
+    target = SqliteBackend()
+    target.initialize()
+
+    if not force:
+        for collection in FILE_MAP:
+            if target.count(collection):
+                raise ValueError(f"The SQLite database already has {collection}. Use force to overwrite it.")
+
+    notes: dict[str, list] = {}
+    for ticket_id, note in source.iter_notes():
+        notes.setdefault(ticket_id, []).append(note)
 
+    counts = {}
+    for collection in FILE_MAP:
+        records = source.load_all(collection)
+        if collection == "tickets":
+            records = [{**record, "notes_list": notes.get(record["id"], [])} for record in records]
+        target.save_all(collection, [plain_value(record) for record in records])
+        counts[collection] = len(records)
+    target.close()
+    return counts
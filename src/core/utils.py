@@ -1,19 +1,24 @@
-from core.models import Ticket, Equipment, TicketNote
+from core.models import Ticket, TicketSummary, TicketState, LazyTicket
 from datetime import datetime
 
+# Ticket fields copied into a TicketSummary, customer_code comes from the customer
+SUMMARY_FIELDS = ["ticket_number", "customer_id", "ticket_state", "ticket_type", "priority", "description"]
+
 def hydrate_ticket(ticket_dict: dict) -> Ticket:
     """Convert a raw ticket dictionary (from JSON) into a proper Ticket object."""
-    equipment_list = [Equipment(**eq) for eq in ticket_dict.get("equipment_list", [])]
-    notes_list = [TicketNote(**note) for note in ticket_dict.get("notes_list", [])]
+    # Equipment and notes become objects the first time they're used
+    return LazyTicket(ticket_dict)
 
-    # Rebuild the ticket with nested objects
-    return Ticket(
-        **{
-            **ticket_dict,
-            "equipment_list": equipment_list,
-            "notes_list": notes_list,
-        }
-    )
+def summarize_ticket(ticket_dict: dict, customer_code: str = "") -> TicketSummary:
+    """Convert a raw ticket dictionary (only SUMMARY_FIELDS are needed) into a TicketSummary."""
+    return TicketSummary(id=ticket_dict["id"],
+                         ticket_number=ticket_dict["ticket_number"],
+                         customer_id=ticket_dict["customer_id"],
+                         customer_code=customer_code,
+                         ticket_state=TicketState(ticket_dict["ticket_state"]),
+                         ticket_type=ticket_dict["ticket_type"],
+                         priority=ticket_dict["priority"],
+                         description=ticket_dict["description"])
 
 def format_date(date_value):
     if isinstance(date_value, datetime):
@@ -1,6 +1,9 @@
 from textual.app import App
 from textual.reactive import reactive
+from panels.changes import DataChanged
 from panels.home import HomeScreen
+from core.changes import SESSION_ID, get_feed
+from core.constants import CHANGE_POLL_SECONDS
 from core.manager import TicketSystemManager
 
 class TicketRPGApp(App):
@@ -13,6 +16,26 @@ class TicketRPGApp(App):
         self.sub_title = "A simple ticket management system"
         self.theme = "monokai"
         self.push_screen(HomeScreen())
+        # Other copies of Tavern sharing the data directory show up in the change feed
+        self.change_seq = get_feed().last_seq()
+        self.set_interval(CHANGE_POLL_SECONDS, self.check_for_changes)
+
+    def check_for_changes(self) -> None:
+        """Tell the open screens about changes made by other sessions since the last check."""
+        feed = get_feed()
+        if feed.last_seq() == self.change_seq: # Just a stat of the feed file when nothing changed
+            return
+        changes = feed.since(self.change_seq)
+        if changes is None:
+            # Fell too far behind to know what changed, so treat everything as changed
+            self.change_seq = feed.last_seq()
+            changes = [{"collection": collection, "op": "reset"} for collection in ("customers", "tickets", "technicians")]
+        elif changes:
+            self.change_seq = changes[-1]["seq"]
+            changes = [change for change in changes if change.get("session") != SESSION_ID]
+        if changes:
+            for screen in self.screen_stack:
+                screen.post_message(DataChanged(changes))
     
     def login_user(self, technician):
         self.current_technician = technician
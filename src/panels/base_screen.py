@@ -5,19 +5,29 @@ from textual.screen import Screen
 from textual.app import ComposeResult
 from textual.reactive import reactive
 from textual.widgets import Header, Footer
+from core.profiling import get_profiler
 from panels.sidebar import Sidebar
+from panels.workers import ManagerWorkers
 
 if TYPE_CHECKING:
     from main import TicketRPGApp
 
-class BaseScreen(Screen):
+class BaseScreen(ManagerWorkers, Screen):
     @property
     def app(self) -> "TicketRPGApp":
         """Get the app instance with proper typing"""
         return super().app  # type: ignore
     
     show_sidebar = reactive(False)
-    BINDINGS = [("s", "toggle_sidebar", "Toggle Sidebar")]
+    BINDINGS = [("s", "toggle_sidebar", "Toggle Sidebar"),
+                ("f9", "profile_next_action", "Profile next action")]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Opening a screen counts as an action: profile building it until it's first shown
+        self.open_capture = get_profiler().capture(f"{type(self).__name__}.open") if get_profiler().take() else None
+        if self.open_capture is not None:
+            self.open_capture.__enter__()
     
     def compose(self) -> ComposeResult:
         yield Header()
@@ -25,6 +35,26 @@ class BaseScreen(Screen):
         yield Footer()
         # Subclasses add their content
     
+    def on_mount(self) -> None:
+        # Runs after the subclass's on_mount, the profile stops once the screen has been drawn
+        if self.open_capture is not None:
+            self.call_after_refresh(self.finish_open_capture)
+
+    def finish_open_capture(self) -> None:
+        if self.open_capture is not None:
+            self.open_capture.__exit__(None, None, None)
+            self.profile_saved(self.open_capture)
+            self.open_capture = None
+
+    def action_profile_next_action(self) -> None:
+        profiler = get_profiler()
+        if profiler.armed:
+            profiler.disarm()
+            self.notify("Profiling cancelled.")
+        else:
+            profiler.arm()
+            self.notify("The next search, save or screen opened will be profiled.", title="Profiler armed")
+
     def action_toggle_sidebar(self) -> None:
         self.show_sidebar = not self.show_sidebar
     
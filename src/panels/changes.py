@@ -0,0 +1,21 @@
+from textual.message import Message
+
+class DataChanged(Message):
+    """
+    Another copy of Tavern sharing the data directory changed something. Posted by the app to
+    every open screen, changes are the change feed entries (see core.changes.ChangeFeed).
+    """
+    bubble = False # Each screen gets its own, it shouldn't carry on to the app
+
+    def __init__(self, changes: list[dict]) -> None:
+        super().__init__()
+        self.changes = changes
+
+    def touches(self, collection: str, id: str = "", ops: tuple = ("insert", "update", "remove", "note", "reset")) -> bool:
+        """Whether any change is one of ops in collection (to the record with this id, if given). A reset touches every record."""
+        for change in self.changes:
+            if change["collection"] != collection or change["op"] not in ops:
+                continue
+            if not id or change["op"] == "reset" or change.get("id") == id:
+                return True
+        return False
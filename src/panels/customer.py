@@ -1,10 +1,11 @@
 from textual import on
 from textual.app import ComposeResult
-from textual.widgets import Input, Button, Label, Rule, ListView, ListItem, Checkbox, Select
+from textual.widgets import Input, Button, Label, Rule, Checkbox, Select
 from textual.containers import Vertical, Horizontal
 from panels.base_screen import BaseScreen
-from panels.popup import PopupScreen, PopupType
+from panels.popup import PopupScreen, PopupType, SEARCH_DEBOUNCE
 from core.manager import SearchType
+from panels.results import ResultsList
 
 class CustomerScreen(BaseScreen):
     BINDINGS = [("escape", "app.pop_screen", "Close screen")]
@@ -68,11 +69,9 @@ class NewCustomerScreen(BaseScreen):
         email = self.query_one("#email-input", Input).value
         address = self.query_one("#address-input", Input).value
         is_business = self.query_one("#is_business", Checkbox).value
-        try:
-            self.app.manager.customers.create_customer(code, name, phone, email, address, is_business)
-            self.app.push_screen(PopupScreen(f"Customer {name} created!", PopupType.SUCCESS))
-        except Exception as e:
-            self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        self.call_manager(lambda: self.app.manager.customers.create_customer(code, name, phone, email, address, is_business),
+                          on_done=lambda _: self.app.push_screen(PopupScreen(f"Customer {name} created!", PopupType.SUCCESS)),
+                          loading=self.query_one("#form-content", Vertical))
         
 
     @on(Button.Pressed, "#cancel")
@@ -102,8 +101,8 @@ class EditCustomerScreen(BaseScreen):
             
             # Results section
             with Vertical(id="results-section"):
-                yield Label("Search Results")
-                yield ListView(id="customer-results")
+                yield Label("Search Results", id="results-label")
+                yield ResultsList(self.customer_row, group="customer-search", id="customer-results")
             
             # Edit form section
             with Vertical(id="edit-form-section"):
@@ -124,21 +123,43 @@ class EditCustomerScreen(BaseScreen):
     
     def on_mount(self) -> None:
         self.current_customer_id = None
+        self.current_customer_version = None # The version the form was filled from
+        self.search_timer = None
         self.query_one("#edit-form-section", Vertical).disabled = True
     
-    def search_customers(self):
+    def search_customers(self, as_you_type: bool = False):
         """Search for customers that match query and load matches in to list"""
-        results_list = self.query_one("#customer-results", ListView)
-        results_list.clear()
+        if self.search_timer:
+            self.search_timer.stop()
         query = self.query_one("#search-input", Input).value
-        search_type = self.query_one("#search-type", Select).value
-        customers = self.app.manager.customers.search_customers(query, SearchType(search_type))
+        search_type = SearchType(self.query_one("#search-type", Select).value)
+        results = self.query_one("#customer-results", ResultsList)
+        self.query_one("#results-label", Label).update("Search Results")
+        if as_you_type and not query:
+            results.clear()
+            return
+        customers = self.app.manager.customers
+        if as_you_type:
+            # Just the first matches alphabetically, Enter runs the full search
+            results.start(lambda cursor: (customers.prefix_search(query, search_type), None), show_loading=False)
+        else:
+            results.start(lambda cursor: customers.search_customers_page(query, search_type, cursor=cursor),
+                          count=lambda: customers.count_customers(query, search_type), on_count=self.show_count)
+
+    def customer_row(self, customer) -> tuple[str, str]:
+        """The text shown for a search result, and the customer id it selects."""
+        return f"{customer.name} ({customer.code})", customer.id
 
-        for customer in customers:
-            item = ListItem(Label(f"{customer.name} ({customer.code})"))
-            item.customer_id = customer.id # type: ignore[attr-defined]
-            results_list.append(item)
+    def show_count(self, count: int) -> None:
+        self.query_one("#results-label", Label).update(f"Search Results ({count})")
     
+    @on(Input.Changed, "#search-input")
+    def queue_search(self):
+        # Wait for a pause in typing so every keystroke doesn't start a search
+        if self.search_timer:
+            self.search_timer.stop()
+        self.search_timer = self.set_timer(SEARCH_DEBOUNCE, lambda: self.search_customers(as_you_type=True))
+
     @on(Button.Pressed, "#search-btn")
     @on(Input.Submitted, "#search-input")
     def search(self):
@@ -154,22 +175,29 @@ class EditCustomerScreen(BaseScreen):
         email = self.query_one("#email-input", Input).value
         address = self.query_one("#address-input", Input).value
         is_business = self.query_one("#is_business", Checkbox).value
-        try:
-            self.app.manager.customers.update_customer(self.current_customer_id, code, name, phone, email, address, is_business)
-            self.app.push_screen(PopupScreen(f"Customer {name} saved!", PopupType.SUCCESS))
-        except Exception as e:
-            self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        customer_id = self.current_customer_id
+        version = self.current_customer_version
+        self.call_manager(lambda: self.app.manager.customers.update_customer(customer_id, code, name, phone, email, address, is_business, version),
+                          on_done=lambda new_version: self.customer_saved(name, new_version),
+                          loading=self.query_one("#edit-form-section", Vertical))
+
+    def customer_saved(self, name: str, version: int) -> None:
+        self.current_customer_version = version # Saving again from this form is fine, it has our changes
+        self.app.push_screen(PopupScreen(f"Customer {name} saved!", PopupType.SUCCESS))
     
-    @on(ListView.Selected, "#customer-results")
-    def select_customer(self, event: ListView.Selected) -> None:
+    @on(ResultsList.Selected, "#customer-results")
+    def select_customer(self, event: ResultsList.Selected) -> None:
         self.query_one("#edit-form-section", Vertical).disabled = False
-        selected_item = event.item
-        customer_id = selected_item.customer_id # type: ignore[attr-defined]
-
-        customer = self.app.manager.customers.find_by_id(customer_id)
+        customer_id = event.value
+        self.call_manager(lambda: self.app.manager.customers.find_by_id(customer_id),
+                          on_done=self.show_customer,
+                          loading=self.query_one("#edit-form-section", Vertical),
+                          group="customer-select", exclusive=True)
 
+    def show_customer(self, customer) -> None:
         if customer:
             self.current_customer_id = customer.id
+            self.current_customer_version = customer.version
             # Update the form fields
             self.query_one("#code-input", Input).value = customer.code
             self.query_one("#name-input", Input).value = customer.name
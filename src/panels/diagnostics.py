@@ -0,0 +1,90 @@
+from textual import on
+from textual.app import ComposeResult
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Button, DataTable, Label, Rule, Static
+from core.constants import INSTRUMENTATION
+from core.instrumentation import HISTOGRAM_BOUNDS_MS, stats
+from core.storage import cache_stats
+from panels.base_screen import BaseScreen
+
+# How often the tables are refreshed while the screen is open, in seconds
+REFRESH_SECONDS = 1.0
+
+def format_bytes(count: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024 # type: ignore[assignment]
+    return f"{count:.1f} GB"
+
+class DiagnosticsScreen(BaseScreen):
+    """Live call counts, timings and I/O for the manager methods and data files, from core.instrumentation."""
+    BINDINGS = [("escape", "app.pop_screen", "Close screen"),
+                ("r", "reset_stats", "Reset stats")]
+    CSS_PATH = "../style/diagnostics.tcss"
+
+    def compose(self) -> ComposeResult:
+        yield from super().compose()
+        with Vertical(id="diagnostics-container"):
+            yield Label("Diagnostics")
+            yield Rule(line_style="heavy")
+            yield Static(id="diagnostics-summary")
+            yield Label("Operations (most total time first)", classes="table-label")
+            yield DataTable(id="operations-table", cursor_type="row", zebra_stripes=True)
+            yield Label("Slowest recent calls", classes="table-label")
+            yield DataTable(id="slowest-table", cursor_type="row", zebra_stripes=True)
+            with Horizontal(id="diagnostics-buttons"):
+                yield Button("Reset", id="reset", variant="warning")
+                yield Button("Close", id="close", variant="error")
+
+    def on_mount(self) -> None:
+        buckets = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        self.query_one("#operations-table", DataTable).add_columns(
+            "Operation", "Calls", "Errors", "Total ms", "Mean ms", "Max ms", *buckets, "Read", "Written", "Scanned")
+        self.query_one("#slowest-table", DataTable).add_columns(
+            "ms", "Operation", "Finished", "Read", "Written", "Scanned", "Failed")
+        self.refresh_stats()
+        if INSTRUMENTATION:
+            self.set_interval(REFRESH_SECONDS, self.refresh_stats)
+
+    def refresh_stats(self) -> None:
+        """Fill the tables from the current stats, keeping each table's cursor where it was."""
+        cache = cache_stats()
+        summary = f"Collection cache: {cache['hits']} hits, {cache['misses']} misses, {cache['cached_files']} files cached."
+        if INSTRUMENTATION:
+            summary = f"Collecting since {stats.started:%Y-%m-%d %H:%M:%S}. {summary}"
+        else:
+            summary = f"Instrumentation is off, start Tavern with TAVERN_INSTRUMENT=1 to collect timings. {summary}"
+        self.query_one("#diagnostics-summary", Static).update(summary)
+
+        operations = self.query_one("#operations-table", DataTable)
+        row = operations.cursor_row
+        operations.clear()
+        for operation in stats.snapshot():
+            operations.add_row(operation.name, operation.calls, operation.errors,
+                               f"{operation.total_ms:.1f}", f"{operation.mean_ms:.2f}", f"{operation.max_ms:.1f}",
+                               *operation.histogram,
+                               format_bytes(operation.bytes_read), format_bytes(operation.bytes_written),
+                               operation.records_scanned)
+        operations.move_cursor(row=row)
+
+        slowest = self.query_one("#slowest-table", DataTable)
+        row = slowest.cursor_row
+        slowest.clear()
+        for call in stats.slowest():
+            slowest.add_row(f"{call.ms:.1f}", call.name, f"{call.finished:%H:%M:%S}",
+                            format_bytes(call.bytes_read), format_bytes(call.bytes_written), call.records_scanned,
+                            "yes" if call.failed else "")
+        slowest.move_cursor(row=row)
+
+    def action_reset_stats(self) -> None:
+        stats.reset()
+        self.refresh_stats()
+
+    @on(Button.Pressed, "#reset")
+    def reset_stats(self) -> None:
+        self.action_reset_stats()
+
+    @on(Button.Pressed, "#close")
+    def close_screen(self) -> None:
+        self.app.pop_screen()
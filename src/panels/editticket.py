@@ -1,10 +1,12 @@
 from textual import on
 from textual.app import ComposeResult
-from textual.widgets import Input, Button, Label, Rule, ListView, ListItem, Select, TextArea
+from textual.widgets import Input, Button, Label, Rule, ListView, ListItem, Select, TextArea, Checkbox
 from textual.containers import Vertical, Horizontal, Container
 from panels.base_screen import BaseScreen
+from panels.changes import DataChanged
+from panels.results import ResultsList
 from panels.popup import PopupScreen, PopupType
-from core.models import Equipment
+from core.models import Equipment, TicketSummary
 from core.manager import SearchType
 
 class EditTicketScreen(BaseScreen):
@@ -22,17 +24,19 @@ class EditTicketScreen(BaseScreen):
                     [("Ticket Number", "ticket_number"), 
                     ("Customer Name", "name"), 
                     ("Customer Code", "code"), 
-                    ("Phone", "phone")],
+                    ("Phone", "phone"),
+                    ("Full Text", "text")],
                     id="search-type",
                     prompt="Search Type"
                 )
                 yield Input(placeholder="Search...", id="search-input")
+                yield Checkbox("Include archived", id="include-archived")
                 yield Button("Search", id="search-btn", variant="primary")
         
             # Results section
             with Vertical(id="results-section"):
-                yield Label("Search Results")
-                yield ListView(id="search-results")
+                yield Label("Search Results", id="results-label")
+                yield ResultsList(self.ticket_row, group="ticket-search", id="search-results")
             with Container(id="ticket-fields-section"):
                 with Horizontal(classes="four-column"): 
                     with Vertical(classes="col-25"):  
@@ -99,47 +103,72 @@ class EditTicketScreen(BaseScreen):
             self.query_one(button, Button).can_focus = False
         self.query_one("#ticket-fields-section", Container).disabled = True
         self.current_ticket_id = ""
+        self.current_ticket_version = None # The version the form was filled from
     
     def search_tickets(self) -> None:
-        """Search for customers that match query and load matches in to list"""
-        results_list = self.query_one("#search-results", ListView)
-        results_list.clear()
+        """Search for tickets that match query and load the first page of matches in to list"""
         query = self.query_one("#search-input", Input).value
         search_type = self.query_one("#search-type", Select).value
 
         if str(search_type) == "Select.BLANK":
             self.app.push_screen(PopupScreen(f"Error: Must select a search type.", PopupType.ERROR))
             return 
-        tickets = self.app.manager.tickets.search_tickets(query, SearchType(search_type))
+        search_type = SearchType(search_type)
+        include_archived = self.query_one("#include-archived", Checkbox).value
+        tickets = self.app.manager.tickets
+        self.query_one("#results-label", Label).update("Search Results")
+        self.query_one("#search-results", ResultsList).start(
+            lambda cursor: tickets.search_tickets_page(query, search_type, cursor=cursor, include_archived=include_archived),
+            count=lambda: tickets.count_tickets(query, search_type, include_archived),
+            on_count=self.show_count)
 
-        for ticket in tickets:
-            customer_code = self.app.manager.customers.get_customer_code(ticket.customer_id)
-            if len(ticket.description) > 80:
-                item = ListItem(Label(f"{ticket.ticket_number} ({customer_code}) - {ticket.description[:80]}..."))
-            else:
-                item = ListItem(Label(f"{ticket.ticket_number} ({customer_code}) - {ticket.description}"))
-            item.ticket_id = ticket.id # type: ignore[attr-defined]
-            results_list.append(item)
+    def ticket_row(self, ticket: TicketSummary) -> tuple[str, str]:
+        """The text shown for a search result, and the ticket id it selects."""
+        if len(ticket.description) > 80:
+            return f"{ticket.ticket_number} ({ticket.customer_code}) - {ticket.description[:80]}...", ticket.id
+        return f"{ticket.ticket_number} ({ticket.customer_code}) - {ticket.description}", ticket.id
+
+    def show_count(self, count: int) -> None:
+        self.query_one("#results-label", Label).update(f"Search Results ({count})")
 
     @on(Button.Pressed, "#search-btn")
     @on(Input.Submitted, "#search-input")
     def search(self):
         self.search_tickets()
 
-    @on(ListView.Selected, "#search-results")
-    def select_ticket(self, event: ListView.Selected) -> None:
+    def on_data_changed(self, event: DataChanged) -> None:
+        if event.touches("tickets"):
+            self.query_one("#search-results", ResultsList).reload()
+        if self.current_ticket_id and event.touches("tickets", self.current_ticket_id, ("update", "remove", "reset")):
+            # Not reloaded into the form, that would throw away edits in progress
+            self.notify("This ticket was changed in another session. Select it again to see the changes before saving.",
+                        severity="warning")
+
+    @on(ResultsList.Selected, "#search-results")
+    def select_ticket(self, event: ResultsList.Selected) -> None:
         self.query_one("#ticket-fields-section", Container).disabled = False
-        selected_item = event.item
-        ticket_id = selected_item.ticket_id # type: ignore[attr-defined]
+        ticket_id = event.value
+
+        manager = self.app.manager
+
+        def load_ticket():
+            ticket = manager.tickets.search_by_id(ticket_id)
+            if ticket:
+                return ticket, manager.customers.get_customer_code(ticket.customer_id)
+            return None, None
+
+        self.call_manager(load_ticket, on_done=self.show_ticket,
+                          loading=self.query_one("#ticket-fields-section", Container),
+                          group="ticket-select", exclusive=True)
 
+    def show_ticket(self, result) -> None:
+        ticket, customer_code = result
         eq_list = self.query_one("#equipment-container", ListView)
         eq_list.clear()
 
-        ticket = self.app.manager.tickets.search_by_id(ticket_id)
-
         if ticket:
             self.current_ticket_id = ticket.id
-            customer_code = self.app.manager.customers.get_customer_code(ticket.customer_id)
+            self.current_ticket_version = ticket.version
             # Update the form fields
             self.query_one("#ticket-number", Input).value = str(ticket.ticket_number)
             self.query_one("#code-input", Input).value = customer_code # type: ignore[attr-defined]
@@ -205,12 +234,22 @@ class EditTicketScreen(BaseScreen):
             return
         
         data = self.gather_form_data()
-        if data:
-            try:
-                self.app.manager.tickets.update_ticket(**data)
-                self.app.push_screen(PopupScreen(f"Ticket updated!", PopupType.SUCCESS))
-            except Exception as e:
-                self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        code = data.pop("code")
+        manager = self.app.manager
+
+        def update_ticket():
+            customer_id = manager.customers.get_customer_id(code)
+            if not customer_id:
+                raise ValueError("Customer not found.")
+            return manager.tickets.update_ticket(customer_id=customer_id, **data)
+
+        self.call_manager(update_ticket,
+                          on_done=self.ticket_saved,
+                          loading=self.query_one("#ticket-fields-section", Container))
+
+    def ticket_saved(self, version: int) -> None:
+        self.current_ticket_version = version # Saving again from this form is fine, it has our changes
+        self.app.push_screen(PopupScreen(f"Ticket updated!", PopupType.SUCCESS))
 
     def validate_ticket_form(self) -> bool:
         """
@@ -230,11 +269,7 @@ class EditTicketScreen(BaseScreen):
     
     def gather_form_data(self) -> dict:
         """Extract all form data into a dict"""
-        code = self.query_one("#code-input", Input).value
-        customer_id = self.app.manager.customers.get_customer_id(code)
-        if not customer_id:
-            self.app.push_screen(PopupScreen(f"Error: Customer not found.", PopupType.ERROR))
-            return {}
+        code = self.query_one("#code-input", Input).value # Looked up as a customer id when saving
         priority = self.query_one("#priority-select", Select).value
         ticket_type = self.query_one("#ticket-type-select", Select).value
         name = self.query_one("#name-input", Input).value
@@ -245,13 +280,14 @@ class EditTicketScreen(BaseScreen):
         for item in eq_list.children:
             equipment_list_objects.append(item.equipment_object) # type: ignore[attr-defined]
         data = {"id":self.current_ticket_id,
-                "customer_id":customer_id,
+                "code":code,
                 "ticket_type":ticket_type,
                 "priority":priority,
                 "description":description,
                 "equipment_list":equipment_list_objects,
                 "contact_name":name,
-                "contact_phone":phone}
+                "contact_phone":phone,
+                "version":self.current_ticket_version}
         return data
         
     @on(Button.Pressed, "#cancel")
@@ -20,8 +20,11 @@ class LoginScreen(BaseScreen):
     @on(Input.Submitted, "#username-input")
     def handle_login(self):
         username = self.query_one("#username-input", Input).value
-        tech = self.app.manager.technicians.login(username)
-        
+        self.call_manager(lambda: self.app.manager.technicians.login(username),
+                          on_done=self.finish_login,
+                          loading=self.query_one("#form-content", Vertical))
+
+    def finish_login(self, tech):
         if tech and tech.is_active:
             self.app.login_user(tech)  # Pass the Technician object
             self.app.push_screen(PopupScreen("Login successful!", PopupType.SUCCESS))
@@ -132,12 +132,18 @@ class NewTicketScreen(BaseScreen):
             return
         
         data = self.gather_form_data()
-        if data:
-            try:
-                ticket = self.app.manager.tickets.create_ticket(**data)
-                self.app.push_screen(PopupScreen(f"Ticket {ticket} created!", PopupType.SUCCESS))
-            except Exception as e:
-                self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        code = data.pop("code")
+        manager = self.app.manager
+
+        def create_ticket():
+            customer_id = manager.customers.get_customer_id(code)
+            if not customer_id:
+                raise ValueError("Customer not found.")
+            return manager.tickets.create_ticket(customer_id=customer_id, **data)
+
+        self.call_manager(create_ticket,
+                          on_done=lambda ticket: self.app.push_screen(PopupScreen(f"Ticket {ticket} created!", PopupType.SUCCESS)),
+                          loading=self.query_one("#new-ticket-content", Vertical))
 
     def validate_ticket_form(self) -> bool:
         """
@@ -157,11 +163,7 @@ class NewTicketScreen(BaseScreen):
     
     def gather_form_data(self) -> dict:
         """Extract all form data into a dict"""
-        code = self.query_one("#code-input", Input).value
-        customer_id = self.app.manager.customers.get_customer_id(code)
-        if not customer_id:
-            self.app.push_screen(PopupScreen(f"Error: Customer not found.", PopupType.ERROR))
-            return {}
+        code = self.query_one("#code-input", Input).value # Looked up as a customer id when creating
         priority = self.query_one("#priority-select", Select).value
         ticket_type = self.query_one("#ticket-type-select", Select).value
         name = self.query_one("#name-input", Input).value
@@ -172,7 +174,7 @@ class NewTicketScreen(BaseScreen):
         eq_list = self.query_one("#equipment-container", ListView) # ListView of Equipment
         for item in eq_list.children:
             equipment_list_objects.append(item.equipment_object) # type: ignore[attr-defined]
-        data = {"customer_id":customer_id,
+        data = {"code":code,
                 "ticket_type":ticket_type,
                 "priority":priority,
                 "description":description,
@@ -3,8 +3,11 @@ from textual.app import ComposeResult
 from textual.widgets import Input, Button, Label, Rule, ListView, ListItem, Select, TextArea
 from textual.containers import Vertical, Horizontal, Container
 from panels.base_screen import BaseScreen
+from panels.changes import DataChanged
+from panels.results import ResultsList
 from panels.popup import PopupScreen, PopupType, NoteEntryPopup
 from core.manager import SearchType
+from core.models import TicketSummary
 
 class NotesEntryScreen(BaseScreen):
     BINDINGS = [("escape", "app.pop_screen", "Close screen")]
@@ -21,7 +24,8 @@ class NotesEntryScreen(BaseScreen):
                     [("Ticket Number", "ticket_number"), 
                     ("Customer Name", "name"), 
                     ("Customer Code", "code"), 
-                    ("Phone", "phone")],
+                    ("Phone", "phone"),
+                    ("Full Text", "text")],
                     id="search-type",
                     prompt="Search Type"
                 )
@@ -30,8 +34,8 @@ class NotesEntryScreen(BaseScreen):
         
             # Results section
             with Vertical(id="results-section"):
-                yield Label("Search Results")
-                yield ListView(id="search-results")
+                yield Label("Search Results", id="results-label")
+                yield ResultsList(self.ticket_row, group="ticket-search", id="search-results")
 
             with Container(id="ticket-fields-section"):
                 with Horizontal(classes="four-column"): 
@@ -82,44 +86,65 @@ class NotesEntryScreen(BaseScreen):
         self.query_one("#ticket-fields-section", Container).disabled = True
     
     def search_tickets(self) -> None:
-        """Search for customers that match query and load matches in to list"""
-        results_list = self.query_one("#search-results", ListView)
-        results_list.clear()
+        """Search for tickets that match query and load the first page of matches in to list"""
         query = self.query_one("#search-input", Input).value
         search_type = self.query_one("#search-type", Select).value
 
         if str(search_type) == "Select.BLANK":
             self.app.push_screen(PopupScreen(f"Error: Must select a search type.", PopupType.ERROR))
             return 
-        tickets = self.app.manager.tickets.search_tickets(query, SearchType(search_type))
+        search_type = SearchType(search_type)
+        tickets = self.app.manager.tickets
+        self.query_one("#results-label", Label).update("Search Results")
+        self.query_one("#search-results", ResultsList).start(
+            lambda cursor: tickets.search_tickets_page(query, search_type, cursor=cursor),
+            count=lambda: tickets.count_tickets(query, search_type),
+            on_count=self.show_count)
 
-        for ticket in tickets:
-            customer_code = self.app.manager.customers.get_customer_code(ticket.customer_id)
-            if len(ticket.description) > 80:
-                item = ListItem(Label(f"{ticket.ticket_number} ({customer_code}) - {ticket.description[:80]}..."))
-            else:
-                item = ListItem(Label(f"{ticket.ticket_number} ({customer_code}) - {ticket.description}"))
-            item.ticket_id = ticket.id # type: ignore[attr-defined]
-            results_list.append(item)
+    def ticket_row(self, ticket: TicketSummary) -> tuple[str, str]:
+        """The text shown for a search result, and the ticket id it selects."""
+        if len(ticket.description) > 80:
+            return f"{ticket.ticket_number} ({ticket.customer_code}) - {ticket.description[:80]}...", ticket.id
+        return f"{ticket.ticket_number} ({ticket.customer_code}) - {ticket.description}", ticket.id
+
+    def show_count(self, count: int) -> None:
+        self.query_one("#results-label", Label).update(f"Search Results ({count})")
 
     @on(Button.Pressed, "#search-btn")
     @on(Input.Submitted, "#search-input")
     def search(self):
         self.search_tickets()
 
-    @on(ListView.Selected, "#search-results")
-    def select_ticket(self, event: ListView.Selected) -> None:
-        selected_item = event.item
-        ticket_id = selected_item.ticket_id # type: ignore[attr-defined]
+    def on_data_changed(self, event: DataChanged) -> None:
+        if event.touches("tickets"):
+            self.query_one("#search-results", ResultsList).reload()
+        if self.current_ticket_id and event.touches("tickets", self.current_ticket_id, ("update", "reset")):
+            self.open_ticket(self.current_ticket_id) # Nothing is edited on this screen, so just show the new version
+
+    @on(ResultsList.Selected, "#search-results")
+    def select_ticket(self, event: ResultsList.Selected) -> None:
+        self.open_ticket(event.value)
+
+    def open_ticket(self, ticket_id: str) -> None:
+        manager = self.app.manager
 
+        def load_ticket():
+            ticket = manager.tickets.search_by_id(ticket_id)
+            if ticket:
+                return ticket, manager.customers.get_customer_code(ticket.customer_id)
+            return None, None
+
+        self.call_manager(load_ticket, on_done=self.show_ticket,
+                          loading=self.query_one("#ticket-fields-section", Container),
+                          group="ticket-select", exclusive=True)
+
+    def show_ticket(self, result) -> None:
+        ticket, customer_code = result
         eq_list = self.query_one("#equipment-container", ListView)
         eq_list.clear()
 
-        ticket = self.app.manager.tickets.search_by_id(ticket_id)
-
         if ticket:
             self.current_ticket_id = ticket.id
-            customer_code = self.app.manager.customers.get_customer_code(ticket.customer_id)
             # Update the form fields
             self.query_one("#ticket-number", Input).value = str(ticket.ticket_number)
             self.query_one("#code-input", Input).value = customer_code # type: ignore[attr-defined]
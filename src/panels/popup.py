@@ -2,10 +2,16 @@ from enum import Enum
 from core.utils import format_date
 from textual import on
 from textual.app import ComposeResult
-from textual.widgets import Button, Label, Input, Select, ListView, ListItem, Rule, TextArea
+from textual.widgets import Button, Label, Input, Select, Rule, TextArea
 from textual.containers import Vertical, Horizontal
 from textual.screen import ModalScreen
 from core.manager import SearchType
+from panels.changes import DataChanged
+from panels.results import ResultsList
+from panels.workers import ManagerWorkers
+
+# Seconds to wait after the last keystroke before searching
+SEARCH_DEBOUNCE = 0.25
 
 class PopupType(Enum):
     ERROR = "error"
@@ -32,7 +38,7 @@ class PopupScreen(ModalScreen):
         elif self.type == PopupType.ERROR:
             self.app.pop_screen() # Close only the modal
 
-class CustomerLookupScreen(ModalScreen):
+class CustomerLookupScreen(ManagerWorkers, ModalScreen):
     CSS_PATH = "../style/custlookup.tcss"
 
     def compose(self) -> ComposeResult:        
@@ -52,8 +58,8 @@ class CustomerLookupScreen(ModalScreen):
             
             # Results section
             with Vertical(id="results-section"):
-                yield Label("Search Results")
-                yield ListView(id="customer-results")
+                yield Label("Search Results", id="results-label")
+                yield ResultsList(self.customer_row, group="customer-search", id="customer-results")
             
             with Horizontal(id="bottom-btns"):
                 yield Button("Select Customer", id="select-btn", classes="bottom-btn", variant="success", disabled=True)
@@ -61,36 +67,57 @@ class CustomerLookupScreen(ModalScreen):
 
     def on_mount(self) -> None:
         self.current_customer_code = None
+        self.search_timer = None
     
     @on(Button.Pressed, "#cancel-btn")
     def close_screen(self):
         self.dismiss("")
     
-    def search_customers(self):
+    def search_customers(self, as_you_type: bool = False):
         """Search for customers that match query and load matches in to list"""
-        results_list = self.query_one("#customer-results", ListView)
-        results_list.clear()
+        if self.search_timer:
+            self.search_timer.stop()
         query = self.query_one("#search-input", Input).value
-        search_type = self.query_one("#search-type", Select).value
-        customers = self.app.manager.customers.search_customers(query, SearchType(search_type)) # type: ignore[attr-defined]
+        search_type = SearchType(self.query_one("#search-type", Select).value)
+        results = self.query_one("#customer-results", ResultsList)
+        self.query_one("#results-label", Label).update("Search Results")
+        if as_you_type and not query:
+            results.clear()
+            return
+        customers = self.app.manager.customers # type: ignore[attr-defined]
+        if as_you_type:
+            # Just the first matches alphabetically, Enter runs the full search
+            results.start(lambda cursor: (customers.prefix_search(query, search_type), None), show_loading=False)
+        else:
+            results.start(lambda cursor: customers.search_customers_page(query, search_type, cursor=cursor),
+                          count=lambda: customers.count_customers(query, search_type), on_count=self.show_count)
+
+    def customer_row(self, customer) -> tuple[str, str]:
+        """The text shown for a search result, and the customer id it selects."""
+        return f"{customer.name} ({customer.code})", customer.id
 
-        for customer in customers:
-            item = ListItem(Label(f"{customer.name} ({customer.code})"))
-            item.customer_id = customer.id # type: ignore[attr-defined]
-            results_list.append(item)
+    def show_count(self, count: int) -> None:
+        self.query_one("#results-label", Label).update(f"Search Results ({count})")
     
+    @on(Input.Changed, "#search-input")
+    def queue_search(self):
+        # Wait for a pause in typing so every keystroke doesn't start a search
+        if self.search_timer:
+            self.search_timer.stop()
+        self.search_timer = self.set_timer(SEARCH_DEBOUNCE, lambda: self.search_customers(as_you_type=True))
+
     @on(Button.Pressed, "#search-btn")
     @on(Input.Submitted, "#search-input")
     def search(self):
         self.search_customers()
     
-    @on(ListView.Selected, "#customer-results")
-    def select_customer(self, event: ListView.Selected) -> None:
-        selected_item = event.item
-        customer_id = selected_item.customer_id # type: ignore[attr-defined]
-
-        customer = self.app.manager.customers.find_by_id(customer_id) # type: ignore[attr-defined]
+    @on(ResultsList.Selected, "#customer-results")
+    def select_customer(self, event: ResultsList.Selected) -> None:
+        customer_id = event.value
+        self.call_manager(lambda: self.app.manager.customers.find_by_id(customer_id), # type: ignore[attr-defined]
+                          on_done=self.set_customer, group="customer-select", exclusive=True)
 
+    def set_customer(self, customer) -> None:
         if customer:
             self.query_one("#select-btn", Button).disabled = False
             self.current_customer_code = customer.code
@@ -99,7 +126,7 @@ class CustomerLookupScreen(ModalScreen):
     def return_customer(self):
         self.dismiss(self.current_customer_code)
 
-class NoteEntryPopup(ModalScreen):
+class NoteEntryPopup(ManagerWorkers, ModalScreen):
     CSS_PATH = "../style/noteentrypopup.tcss"
 
     def __init__(self, ticket_id: str):
@@ -111,7 +138,7 @@ class NoteEntryPopup(ModalScreen):
             yield Label("Note Entry")
             yield Rule(line_style="heavy")
             yield Label("Previous Notes")
-            yield ListView(id="previous-notes")
+            yield ResultsList(self.note_row, id="previous-notes")
             yield Rule(line_style="heavy")
             yield Label("Notes")
             yield TextArea(placeholder="Notes...", id="notes-input")
@@ -127,15 +154,22 @@ class NoteEntryPopup(ModalScreen):
                 yield Button("Cancel", id="cancel", variant="error")
     
     def on_mount(self) -> None:
-        notes_list_view = self.query_one("#previous-notes", ListView)
-        notes_list = self.app.manager.tickets.get_ticket_notes(self.ticket_id) # type: ignore[attr-defined]
-        for note in notes_list:
-            formatted_date = format_date(note["date_created"])
-            if len(note["notes"]) > 80:
-                item = ListItem(Label(f"{formatted_date} - {note["notes"][:80]}..."))
-            else:
-                item = ListItem(Label(f"{formatted_date} - {note["notes"]}"))
-            notes_list_view.append(item)
+        self.show_previous_notes()
+
+    def show_previous_notes(self) -> None:
+        tickets = self.app.manager.tickets # type: ignore[attr-defined]
+        # All the notes come in one page, the list only draws the ones on screen
+        self.query_one("#previous-notes", ResultsList).start(lambda cursor: (tickets.get_ticket_notes(self.ticket_id) or [], None))
+
+    def on_data_changed(self, event: DataChanged) -> None:
+        if event.touches("tickets", self.ticket_id, ("note", "reset")):
+            self.show_previous_notes() # Someone else added a note to this ticket
+
+    def note_row(self, note) -> tuple[str, str]:
+        formatted_date = format_date(note["date_created"])
+        if len(note["notes"]) > 80:
+            return f"{formatted_date} - {note["notes"][:80]}...", note["id"]
+        return f"{formatted_date} - {note["notes"]}", note["id"]
 
     @on(Input.Changed)
     @on(TextArea.Changed)
@@ -157,13 +191,16 @@ class NoteEntryPopup(ModalScreen):
             return
         
         data = self.gather_form_data()
-        if data:
-            try:
-                data["ticket_id"] = self.ticket_id
-                self.app.manager.tickets.add_time_entry(**data) # type: ignore[attr-defined]
-                self.app.push_screen(PopupScreen(f"Notes successfully entered!", PopupType.SUCCESS))
-            except Exception as e:
-                self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        current_tech = self.app.current_technician.username # type: ignore[attr-defined]
+        manager = self.app.manager # type: ignore[attr-defined]
+
+        def add_notes():
+            data["technician"] = manager.technicians.get_technician_id(current_tech)
+            manager.tickets.add_time_entry(**data)
+
+        self.call_manager(add_notes,
+                          on_done=lambda _: self.app.push_screen(PopupScreen(f"Notes successfully entered!", PopupType.SUCCESS)),
+                          loading=self.query_one("#note-entry-section", Vertical))
 
     def gather_form_data(self) -> dict:
         """Extract all form data into a dict"""
@@ -174,10 +211,7 @@ class NoteEntryPopup(ModalScreen):
             ticket_time = self.query_one("#hours-input", Input).value
         if self.query_one("#mileage-input", Input).value:
             mileage = self.query_one("#mileage-input", Input).value
-        current_tech = self.app.current_technician.username # type: ignore[attr-defined]
-        tech_id = self.app.manager.technicians.get_technician_id(current_tech) # type: ignore[attr-defined]
-        
-        data = {"technician":tech_id,
+        data = {"ticket_id":self.ticket_id,
                 "notes":notes,
                 "ticket_time":ticket_time,
                 "mileage":mileage}
@@ -0,0 +1,233 @@
+from typing import Callable, Optional
+from rich.cells import cell_len
+from rich.segment import Segment
+from textual import events
+from textual.binding import Binding
+from textual.geometry import Region, Size
+from textual.message import Message
+from textual.reactive import reactive
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from panels.workers import ManagerWorkers
+
+# Start loading the next page when the cursor or scroll position is within this many rows of the end
+LOAD_MORE_ROWS = 5
+
+class ResultsList(ManagerWorkers, ScrollView, can_focus=True):
+    """
+    A scrolling list of one line results that only draws the rows on screen, so showing
+    thousands of tickets or notes doesn't mount a widget per row.
+    Rows come from a provider, fetch(cursor) -> (rows, next cursor), which runs in a worker.
+    make_row(row) turns each one into (text, value), and value is what the Highlighted and
+    Selected messages carry (a ticket or customer id, for example).
+    The next page is fetched when the list is scrolled close to the end.
+    """
+    DEFAULT_CSS = """
+    ResultsList {
+        height: 10;
+    }
+    ResultsList > .results-list--cursor {
+        color: $block-cursor-blurred-foreground;
+        background: $block-cursor-blurred-background;
+        text-style: $block-cursor-blurred-text-style;
+    }
+    ResultsList:focus > .results-list--cursor {
+        color: $block-cursor-foreground;
+        background: $block-cursor-background;
+        text-style: $block-cursor-text-style;
+    }
+    """
+    COMPONENT_CLASSES = {"results-list--cursor"}
+    BINDINGS = [
+        Binding("up", "cursor_up", "Cursor Up", show=False),
+        Binding("down", "cursor_down", "Cursor Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "first", "First", show=False),
+        Binding("end", "last", "Last", show=False),
+        Binding("enter", "select", "Select", show=False),
+    ]
+
+    cursor: reactive[Optional[int]] = reactive(None)
+
+    class Highlighted(Message):
+        """The cursor moved to a row."""
+        def __init__(self, results_list: "ResultsList", index: int, value) -> None:
+            super().__init__()
+            self.results_list = results_list
+            self.index = index
+            self.value = value
+
+        @property
+        def control(self) -> "ResultsList":
+            return self.results_list
+
+    class Selected(Highlighted):
+        """A row was clicked or Enter was pressed on it."""
+
+    def __init__(self, make_row: Callable, group: str = "results", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.make_row = make_row
+        self.group = group
+        self.rows: list[tuple[str, object]] = [] # (text, value) for every row fetched so far
+        self.fetch: Optional[Callable] = None
+        self.count_fetch: Optional[Callable] = None # Kept with count_done so reload can count again
+        self.count_done: Optional[Callable] = None
+        self.next_cursor: Optional[str] = None
+        self.fetching = False
+        self.replacing = False # The old rows stay up until the new search's first page arrives
+        self.keep_cursor = False # Reloading puts the cursor back where it was
+        self.widest = 0
+
+    def start(self, fetch: Callable, on_count: Optional[Callable] = None, count: Optional[Callable] = None,
+              show_loading: bool = True) -> None:
+        """
+        Show the first page from a new provider, dropping the old rows.
+        If count is given it runs in its own worker and on_count(total) gets the result.
+        """
+        self.fetch = fetch
+        self.count_fetch = count
+        self.count_done = on_count
+        self.next_cursor = None
+        self.replacing = True
+        self.keep_cursor = False
+        self.workers.cancel_group(self, f"{self.group}-count")
+        if count is not None and on_count is not None:
+            self.call_manager(count, on_done=on_count, group=f"{self.group}-count")
+        self.load_page(show_loading)
+
+    def reload(self) -> None:
+        """Fetch the rows shown again, quietly, e.g. after another session changed them."""
+        if self.fetch is None:
+            return
+        self.start(self.fetch, self.count_done, self.count_fetch, show_loading=False)
+        self.keep_cursor = True
+
+    def clear(self) -> None:
+        self.fetch = None
+        self.count_fetch = None
+        self.count_done = None
+        self.next_cursor = None
+        self.fetching = False
+        self.replacing = False
+        self.workers.cancel_group(self, self.group)
+        self.workers.cancel_group(self, f"{self.group}-count")
+        self.set_rows([])
+
+    def load_page(self, show_loading: bool = False) -> None:
+        self.fetching = True
+        fetch = self.fetch
+        cursor = self.next_cursor
+        # exclusive=True drops a page still loading for an older search
+        self.call_manager(lambda: fetch(cursor), # type: ignore[misc]
+                          on_done=self.add_page,
+                          on_error=self.fetch_failed,
+                          loading=self if show_loading else None,
+                          group=self.group, exclusive=True)
+
+    def add_page(self, result) -> None:
+        rows, self.next_cursor = result
+        self.fetching = False
+        new_rows = [self.make_row(row) for row in rows]
+        if self.replacing:
+            self.replacing = False
+            cursor = self.cursor if self.keep_cursor else None
+            scroll_y = self.scroll_y
+            self.set_rows(new_rows)
+            if cursor is not None and cursor < len(new_rows):
+                self.cursor = cursor
+                self.scroll_to(0, scroll_y, animate=False)
+        else:
+            self.rows.extend(new_rows)
+            self.update_size(new_rows)
+        # If the page didn't fill the list, load another once the new size is laid out
+        self.call_after_refresh(self.check_load_more)
+
+    def fetch_failed(self, error: Exception) -> None:
+        self.fetching = False
+        self.next_cursor = None # Don't keep retrying a search that fails
+        self.show_error(error)
+
+    def set_rows(self, rows: list[tuple[str, object]]) -> None:
+        self.rows = rows
+        self.widest = 0
+        self.cursor = None
+        self.scroll_to(0, 0, animate=False)
+        self.update_size(rows)
+
+    def update_size(self, new_rows: list[tuple[str, object]]) -> None:
+        for text, value in new_rows:
+            self.widest = max(self.widest, cell_len(text))
+        self.virtual_size = Size(self.widest, len(self.rows))
+        self.refresh()
+
+    def load_more(self) -> None:
+        if self.fetch is None or self.next_cursor is None or self.fetching:
+            return # No provider, no more pages, or the next one is already on its way
+        self.load_page()
+
+    def check_load_more(self) -> None:
+        if self.scroll_y >= self.max_scroll_y - LOAD_MORE_ROWS:
+            self.load_more()
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        self.check_load_more()
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        index = scroll_y + y
+        width = self.size.width
+        if index >= len(self.rows):
+            return Strip.blank(width, self.rich_style)
+        style = self.rich_style
+        if index == self.cursor:
+            style = self.get_component_rich_style("results-list--cursor")
+        text = self.rows[index][0]
+        return Strip([Segment(text, style)]).crop_extend(scroll_x, scroll_x + width, style)
+
+    def watch_cursor(self, old_cursor: Optional[int], new_cursor: Optional[int]) -> None:
+        if old_cursor is not None:
+            self.refresh_line(old_cursor)
+        if new_cursor is None:
+            return
+        self.refresh_line(new_cursor)
+        self.scroll_to_region(Region(0, new_cursor, 1, 1), animate=False, force=True)
+        self.post_message(self.Highlighted(self, new_cursor, self.rows[new_cursor][1]))
+        if new_cursor >= len(self.rows) - LOAD_MORE_ROWS:
+            self.load_more()
+
+    def move_cursor(self, index: int) -> None:
+        if self.rows:
+            self.cursor = max(0, min(index, len(self.rows) - 1))
+
+    def action_cursor_up(self) -> None:
+        self.move_cursor(0 if self.cursor is None else self.cursor - 1)
+
+    def action_cursor_down(self) -> None:
+        self.move_cursor(0 if self.cursor is None else self.cursor + 1)
+
+    def action_page_up(self) -> None:
+        self.move_cursor((self.cursor or 0) - self.scrollable_content_region.height)
+
+    def action_page_down(self) -> None:
+        self.move_cursor((self.cursor or 0) + self.scrollable_content_region.height)
+
+    def action_first(self) -> None:
+        self.move_cursor(0)
+
+    def action_last(self) -> None:
+        self.move_cursor(len(self.rows) - 1)
+
+    def action_select(self) -> None:
+        if self.cursor is not None:
+            self.post_message(self.Selected(self, self.cursor, self.rows[self.cursor][1]))
+
+    def on_click(self, event: events.Click) -> None:
+        offset = event.get_content_offset(self)
+        if offset is None:
+            return
+        index = self.scroll_offset.y + offset.y
+        if index < len(self.rows):
+            self.cursor = index
+            self.action_select()
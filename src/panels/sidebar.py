@@ -11,6 +11,7 @@ class Sidebar(Widget):
             yield Button("Tickets", id="tickets", variant="primary")
             yield Button("Customers", id="customers", variant="primary")
             yield Button("Technicians", id="technicians", variant="primary")
+            yield Button("Diagnostics", id="diagnostics", variant="default")
             yield Button("Account", id="account", variant="success")
             yield Button("Exit", id="exit", variant="error")
     
@@ -52,6 +53,13 @@ class Sidebar(Widget):
         self.screen.show_sidebar = False  # type: ignore[attr-defined]
         self.app.push_screen(TechnicianScreen())
     
+    @on(Button.Pressed, "#diagnostics")
+    def push_diagnostics(self) -> None:
+        from panels.diagnostics import DiagnosticsScreen # Import here to avoid circular import issue.
+        # Comment on next line ignores pylance/vscode error since the code works
+        self.screen.show_sidebar = False  # type: ignore[attr-defined]
+        self.app.push_screen(DiagnosticsScreen())
+    
     @on(Button.Pressed, "#exit")
     def quit_button(self) -> None:
         self.app.exit()
\ No newline at end of file
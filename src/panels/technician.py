@@ -58,11 +58,9 @@ class NewTechnicianScreen(BaseScreen):
         name = self.query_one("#name-input", Input).value
         username = self.query_one("#username-input", Input).value
         email = self.query_one("#email-input", Input).value
-        try:
-            self.app.manager.technicians.create_technician(name, username, email)
-            self.app.push_screen(PopupScreen(f"Technician {name} created!", PopupType.SUCCESS))
-        except Exception as e:
-            self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
+        self.call_manager(lambda: self.app.manager.technicians.create_technician(name, username, email),
+                          on_done=lambda _: self.app.push_screen(PopupScreen(f"Technician {name} created!", PopupType.SUCCESS)),
+                          loading=self.query_one("#form-content", Vertical))
         
 
     @on(Button.Pressed, "#cancel")
@@ -98,12 +96,16 @@ class EditTechnicianScreen(BaseScreen):
     def on_mount(self) -> None:
         self.load_technicians()
         self.current_tech_id = None
+        self.current_tech_version = None # The version the form was filled from
     
     def load_technicians(self):
         """Load all technicians into the list"""
-        tech_list = self.query_one("#tech-list", ListView)
-        techs = self.app.manager.technicians.list_technicians()
+        self.call_manager(self.app.manager.technicians.list_technicians,
+                          on_done=self.show_technicians,
+                          loading=self.query_one("#tech-list", ListView))
 
+    def show_technicians(self, techs) -> None:
+        tech_list = self.query_one("#tech-list", ListView)
         for tech in techs:
             item = ListItem(Label(f"{tech.name} ({tech.username})"))
             item.tech_id = tech.id # type: ignore[attr-defined]
@@ -113,11 +115,15 @@ class EditTechnicianScreen(BaseScreen):
     def select_tech(self, event: ListView.Selected) -> None:
         selected_item = event.item
         tech_id = selected_item.tech_id # type: ignore[attr-defined]
+        self.call_manager(lambda: self.app.manager.technicians.find_by_id(tech_id),
+                          on_done=self.show_technician,
+                          loading=self.query_one("#tech-edit-form", Vertical),
+                          group="tech-select", exclusive=True)
 
-        tech = self.app.manager.technicians.find_by_id(tech_id)
-
+    def show_technician(self, tech) -> None:
         if tech:
             self.current_tech_id = tech.id
+            self.current_tech_version = tech.version
             # Update the form fields
             self.query_one("#tech-name", Input).value = tech.name
             self.query_one("#tech-username", Input).value = tech.username
@@ -137,9 +143,12 @@ class EditTechnicianScreen(BaseScreen):
         username = self.query_one("#tech-username", Input).value
         email = self.query_one("#tech-email", Input).value
         is_active = self.query_one("RadioSet #active", RadioButton).value
+        tech_id = self.current_tech_id
+        version = self.current_tech_version
+        self.call_manager(lambda: self.app.manager.technicians.update_technician(tech_id, name, username, email, is_active, version),
+                          on_done=lambda new_version: self.technician_saved(name, new_version),
+                          loading=self.query_one("#tech-edit-form", Vertical))
 
-        try:
-            self.app.manager.technicians.update_technician(self.current_tech_id, name, username, email, is_active)
-            self.app.push_screen(PopupScreen(f"Technician {name} updated!", PopupType.SUCCESS))
-        except Exception as e:
-            self.app.push_screen(PopupScreen(f"Error: {e}", PopupType.ERROR))
\ No newline at end of file
+    def technician_saved(self, name: str, version: int) -> None:
+        self.current_tech_version = version # Saving again from this form is fine, it has our changes
+        self.app.push_screen(PopupScreen(f"Technician {name} updated!", PopupType.SUCCESS))
\ No newline at end of file
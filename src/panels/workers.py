@@ -0,0 +1,95 @@
+from contextlib import nullcontext
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+from textual.widget import Widget
+from textual.worker import Worker, get_current_worker
+from core.constants import INSTRUMENTATION
+from core.instrumentation import timed
+from core.profiling import ProfileCapture, get_profiler
+
+# Calls running per loading widget, and whether the widget was disabled before the first of them.
+# Only touched on the UI thread.
+_loading_calls: "WeakKeyDictionary[Widget, tuple[int, bool]]" = WeakKeyDictionary()
+
+class ManagerWorkers:
+    """
+    Mixin for screens that runs manager calls on a worker thread, so a slow search or save
+    never freezes the terminal. The result is handed back on the UI thread.
+    """
+    def call_manager(self,
+                     call: Callable,
+                     on_done: Optional[Callable] = None,
+                     on_error: Optional[Callable] = None,
+                     loading: Optional[Widget] = None,
+                     group: str = "manager",
+                     exclusive: bool = False) -> Worker:
+        """
+        Run call() in a thread, then on_done(result) on the UI thread.
+        Errors go to on_error(error), or an error popup if there is no on_error.
+        While it runs, loading shows a loading indicator and is disabled so it can't be pressed twice.
+        exclusive=True cancels older calls in the same group, their results are dropped.
+        """
+        if loading is not None:
+            # An earlier call may still be running and already disabled it, so keep what the first one saw
+            running, disabled_before = _loading_calls.get(loading, (0, loading.disabled))
+            _loading_calls[loading] = (running + 1, disabled_before)
+            loading.loading = True
+            loading.disabled = True
+        if INSTRUMENTATION and on_done is not None:
+            # Showing the result (mounting rows and so on) is timed apart from the manager call itself
+            on_done = timed(f"{type(self).__name__}.{getattr(on_done, '__name__', 'on_done')}")(on_done)
+        # The profiler armed from BaseScreen captures the first call made after it
+        capture = get_profiler().capture(self.action_name(call, on_done, group)) if get_profiler().take() else None
+
+        def finish(worker: Worker, result, error: Optional[Exception]) -> None:
+            if loading is not None and loading in _loading_calls:
+                # Done even for a cancelled call, or its widget would be left loading
+                running, disabled_before = _loading_calls.pop(loading)
+                if running > 1:
+                    _loading_calls[loading] = (running - 1, disabled_before)
+                else:
+                    loading.loading = False
+                    loading.disabled = disabled_before
+            if worker.is_cancelled:
+                return # The screen closed or a newer call replaced this one, so its result is dropped
+            if error is not None:
+                if on_error:
+                    on_error(error)
+                else:
+                    self.show_error(error)
+            elif on_done:
+                on_done(result)
+
+        def run() -> None:
+            worker = get_current_worker()
+            result = None
+            error = None
+            try:
+                with capture or nullcontext():
+                    result = call()
+            except Exception as e:
+                error = e
+            if capture is not None:
+                self.app.call_from_thread(self.profile_saved, capture) # type: ignore[attr-defined]
+            self.app.call_from_thread(finish, worker, result, error) # type: ignore[attr-defined]
+
+        return self.run_worker(run, thread=True, group=group, exclusive=exclusive) # type: ignore[attr-defined]
+
+    def action_name(self, call: Callable, on_done: Optional[Callable], group: str) -> str:
+        """What to call a profile of this call, like EditTicketScreen.show_results."""
+        for function in (on_done, call):
+            name = getattr(function, "__name__", "")
+            if name and not name.startswith("<"): # Lambdas don't say anything useful
+                return f"{type(self).__name__}.{name}"
+        return f"{type(self).__name__}.{group}"
+
+    def profile_saved(self, capture: ProfileCapture) -> None:
+        if capture.path is None:
+            self.app.notify("Another profile was already running, so this action wasn't profiled.", # type: ignore[attr-defined]
+                            severity="warning")
+        else:
+            self.app.notify(f"Profile saved to {capture.path}", title="Profiled") # type: ignore[attr-defined]
+
+    def show_error(self, error: Exception) -> None:
+        from panels.popup import PopupScreen, PopupType # Imported here to avoid a circular import
+        self.app.push_screen(PopupScreen(f"Error: {error}", PopupType.ERROR)) # type: ignore[attr-defined]